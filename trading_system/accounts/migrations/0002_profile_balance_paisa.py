@@ -0,0 +1,16 @@
+from django.db import migrations
+
+import trading.money
+from trading.money import paisa_conversion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('trading', '0009_money_paisa'),
+    ]
+
+    operations = [
+        *paisa_conversion('accounts', 'profile', 'balance', 10, default=trading.money.Money(1000000)),
+    ]
@@ -1,9 +1,11 @@
 from django.db import models
 from django.contrib.auth.models import User
+from trading.money import Money, MoneyField
 
 class Profile(models.Model):
-    user = models.OneToOneField(User, on_delete=models.CASCADE)
-    balance = models.DecimalField(max_digits=10, decimal_places=2, default=10000.00)
+    # Unconstrained: with sharding the profile lives on the user's shard
+    user = models.OneToOneField(User, on_delete=models.CASCADE, db_constraint=False)
+    balance = MoneyField(default=Money.parse('10000.00'))
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -1,50 +1,51 @@
 import os
 import django
 import random
-from decimal import Decimal
+
 
 # Setup Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trading_system.settings')
 django.setup()
 
 from trading.models import Stock
+from trading.money import Money
 
 def populate_nepse():
     nepse_stocks = [
         # Commercial Banks
-        ('NABIL', 'Nabil Bank Ltd.', 1250.00),
-        ('NICA', 'NIC Asia Bank Ltd.', 780.50),
-        ('EBL', 'Everest Bank Ltd.', 540.00),
-        ('SCB', 'Standard Chartered Bank Nepal', 515.00),
-        ('GIME', 'Global IME Bank Ltd.', 198.00),
-        ('NBL', 'Nepal Bank Ltd.', 245.00),
+        ('NABIL', 'Nabil Bank Ltd.', 1250.00, 'Commercial Banks'),
+        ('NICA', 'NIC Asia Bank Ltd.', 780.50, 'Commercial Banks'),
+        ('EBL', 'Everest Bank Ltd.', 540.00, 'Commercial Banks'),
+        ('SCB', 'Standard Chartered Bank Nepal', 515.00, 'Commercial Banks'),
+        ('GIME', 'Global IME Bank Ltd.', 198.00, 'Commercial Banks'),
+        ('NBL', 'Nepal Bank Ltd.', 245.00, 'Commercial Banks'),
         
         # Development Banks
-        ('MNBBL', 'Muktinath Bikas Bank Ltd.', 340.00),
-        ('GBBL', 'Garima Bikas Bank Ltd.', 310.00),
+        ('MNBBL', 'Muktinath Bikas Bank Ltd.', 340.00, 'Development Banks'),
+        ('GBBL', 'Garima Bikas Bank Ltd.', 310.00, 'Development Banks'),
         
         # Hydropower
-        ('HIDCL', 'Hydroelectricity Investment & Dev. Co.', 185.00),
-        ('CHCL', 'Chilime Hydropower Company', 450.00),
-        ('API', 'Api Power Company Ltd.', 160.00),
-        ('UPPER', 'Upper Tamakoshi Hydropower', 210.00),
-        ('SHPC', 'Sanima Mai Hydropower', 320.00),
+        ('HIDCL', 'Hydroelectricity Investment & Dev. Co.', 185.00, 'Hydropower'),
+        ('CHCL', 'Chilime Hydropower Company', 450.00, 'Hydropower'),
+        ('API', 'Api Power Company Ltd.', 160.00, 'Hydropower'),
+        ('UPPER', 'Upper Tamakoshi Hydropower', 210.00, 'Hydropower'),
+        ('SHPC', 'Sanima Mai Hydropower', 320.00, 'Hydropower'),
         
         # Life Insurance
-        ('NLIC', 'Nepal Life Insurance Co. Ltd.', 650.00),
-        ('LICN', 'Life Insurance Co. Nepal', 1100.00),
-        ('ALICL', 'Asian Life Insurance Co.', 580.00),
+        ('NLIC', 'Nepal Life Insurance Co. Ltd.', 650.00, 'Life Insurance'),
+        ('LICN', 'Life Insurance Co. Nepal', 1100.00, 'Life Insurance'),
+        ('ALICL', 'Asian Life Insurance Co.', 580.00, 'Life Insurance'),
         
         # Non-Life Insurance
-        ('NIL', 'Neco Insurance Ltd.', 820.00),
-        ('SICL', 'Shikhar Insurance Co. Ltd.', 890.00),
+        ('NIL', 'Neco Insurance Ltd.', 820.00, 'Non-Life Insurance'),
+        ('SICL', 'Shikhar Insurance Co. Ltd.', 890.00, 'Non-Life Insurance'),
         
         # Others
-        ('NTC', 'Nepal Telecom', 880.00),
-        ('CIT', 'Citizen Investment Trust', 2200.00),
-        ('HDL', 'Himalayan Distillery Ltd.', 1450.00),
-        ('STC', 'Salt Trading Corporation', 4500.00),
-        ('UNL', 'Unilever Nepal Ltd.', 38000.00),
+        ('NTC', 'Nepal Telecom', 880.00, 'Others'),
+        ('CIT', 'Citizen Investment Trust', 2200.00, 'Others'),
+        ('HDL', 'Himalayan Distillery Ltd.', 1450.00, 'Others'),
+        ('STC', 'Salt Trading Corporation', 4500.00, 'Others'),
+        ('UNL', 'Unilever Nepal Ltd.', 38000.00, 'Others'),
     ]
 
     print("Populating NEPSE Stocks...")
@@ -53,16 +54,17 @@ def populate_nepse():
     # Stock.objects.all().delete() 
     
     count = 0
-    for symbol, name, price in nepse_stocks:
+    for symbol, name, price, sector in nepse_stocks:
         # Simulate a previous close as a baseline for daily changes
         # Use a consistent seeded random or just a slight variation
-        prev_close_price = Decimal(str(price)) * Decimal(str(random.uniform(0.98, 1.02)))
+        prev_close_price = Money.parse(price) * random.uniform(0.98, 1.02)
         
         stock, created = Stock.objects.get_or_create(
             symbol=symbol,
             defaults={
                 'name': name,
-                'current_price': Decimal(str(price)),
+                'sector': sector,
+                'current_price': Money.parse(price),
                 'previous_close': prev_close_price
             }
         )
@@ -72,7 +74,8 @@ def populate_nepse():
         else:
             # Update price just in case
             stock.name = name
-            stock.current_price = Decimal(str(price))
+            stock.sector = sector
+            stock.current_price = Money.parse(price)
             if stock.previous_close == 0:
                 stock.previous_close = prev_close_price
             stock.save()
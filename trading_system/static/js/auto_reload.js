@@ -0,0 +1,5 @@
+// Reload the page after data-reload-after milliseconds
+(function () {
+    var delay = parseInt(document.currentScript.dataset.reloadAfter, 10) || 10000;
+    setTimeout(function () { location.reload(); }, delay);
+})();
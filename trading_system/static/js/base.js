@@ -0,0 +1,8 @@
+// Auto-dismiss alerts after 5 seconds
+setTimeout(function () {
+    var alerts = document.querySelectorAll('.alert');
+    alerts.forEach(function (alert) {
+        var bsAlert = new bootstrap.Alert(alert);
+        bsAlert.close();
+    });
+}, 5000);
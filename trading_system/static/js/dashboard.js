@@ -0,0 +1,324 @@
+document.addEventListener('DOMContentLoaded', function () {
+    // Quick Trade Elements (server-side values arrive as data attributes on the select)
+    const quickStockSelect = document.getElementById('quickStockSelect');
+    const quickQuantity = document.getElementById('quickQuantity');
+    const stockPrice = document.getElementById('stockPrice');
+    const estimatedCost = document.getElementById('estimatedCost');
+    const executeBtn = document.getElementById('executeQuickTrade');
+    const balanceWarning = document.getElementById('balanceWarning');
+
+    // Get CSRF token
+    const csrfToken = document.querySelector('[name=csrfmiddlewaretoken]')?.value || quickStockSelect.dataset.csrfToken;
+
+    // State variables
+    let selectedStockId = null;
+    let selectedStockPrice = 0;
+    let selectedStockSymbol = '';
+    let userBalance = parseFloat(quickStockSelect.dataset.balance) || 0;
+
+    // Update when stock is selected
+    quickStockSelect.addEventListener('change', function () {
+        const selectedOption = this.options[this.selectedIndex];
+        selectedStockId = this.value;
+
+        if (selectedStockId) {
+            selectedStockPrice = parseFloat(selectedOption.dataset.price) || 0;
+            selectedStockSymbol = selectedOption.dataset.symbol || selectedOption.text.split(' - ')[0];
+            stockPrice.textContent = `Rs. ${selectedStockPrice.toFixed(2)}`;
+        } else {
+            selectedStockPrice = 0;
+            selectedStockSymbol = '';
+            stockPrice.textContent = 'Rs. 0.00';
+        }
+
+        updateEstimatedCost();
+    });
+
+    // Update estimated cost when quantity changes
+    quickQuantity.addEventListener('input', updateEstimatedCost);
+    quickQuantity.addEventListener('change', updateEstimatedCost);
+
+    // Quantity buttons
+    document.getElementById('increaseQty').addEventListener('click', function () {
+        const currentValue = parseInt(quickQuantity.value) || 1;
+        quickQuantity.value = currentValue + 1;
+        updateEstimatedCost();
+    });
+
+    document.getElementById('decreaseQty').addEventListener('click', function () {
+        const currentValue = parseInt(quickQuantity.value) || 2;
+        if (currentValue > 1) {
+            quickQuantity.value = currentValue - 1;
+            updateEstimatedCost();
+        }
+    });
+
+    // Update estimated cost
+    function updateEstimatedCost() {
+        const quantity = parseInt(quickQuantity.value) || 1;
+        const action = document.querySelector('input[name="quickAction"]:checked').value;
+        const cost = quantity * selectedStockPrice;
+
+        if (selectedStockId && quantity > 0) {
+            estimatedCost.textContent = `Rs. ${cost.toFixed(2)}`;
+
+            // Check balance for buy orders
+            if (action === 'BUY' && cost > userBalance) {
+                estimatedCost.classList.add('text-danger');
+                balanceWarning.style.display = 'block';
+                executeBtn.disabled = true;
+            } else {
+                estimatedCost.classList.remove('text-danger');
+                balanceWarning.style.display = 'none';
+                executeBtn.disabled = false;
+            }
+        } else {
+            estimatedCost.textContent = 'Rs. 0.00';
+            executeBtn.disabled = true;
+        }
+    }
+
+    // Update execute button state based on all conditions
+    function updateExecuteButton() {
+        const quantity = parseInt(quickQuantity.value) || 0;
+        const action = document.querySelector('input[name="quickAction"]:checked').value;
+        const cost = quantity * selectedStockPrice;
+
+        executeBtn.disabled = !selectedStockId ||
+            quantity < 1 ||
+            (action === 'BUY' && cost > userBalance);
+    }
+
+    // Execute quick trade button click
+    executeBtn.addEventListener('click', function () {
+        const action = document.querySelector('input[name="quickAction"]:checked').value;
+        const quantity = parseInt(quickQuantity.value) || 1;
+        const totalCost = quantity * selectedStockPrice;
+
+        // Show confirmation modal
+        const modal = new bootstrap.Modal(document.getElementById('quickTradeModal'));
+        const tradeDetails = document.getElementById('tradeDetails');
+
+        tradeDetails.innerHTML = `
+            <div class="text-center mb-3">
+                <div class="display-6 mb-2 ${action === 'BUY' ? 'text-success' : 'text-danger'}">
+                    ${action === 'BUY' ? 'BUY ORDER' : 'SELL ORDER'}
+                </div>
+                <h4 class="mb-3">${selectedStockSymbol}</h4>
+            </div>
+
+            <div class="card border-0 bg-light">
+                <div class="card-body">
+                    <div class="row text-center">
+                        <div class="col-6">
+                            <small class="text-muted">Quantity</small>
+                            <div class="fw-bold h5">${quantity} shares</div>
+                        </div>
+                        <div class="col-6">
+                            <small class="text-muted">Price per Share</small>
+                            <div class="fw-bold h5">Rs. ${selectedStockPrice.toFixed(2)}</div>
+                        </div>
+                    </div>
+                    <hr>
+                    <div class="text-center">
+                        <small class="text-muted">Total ${action === 'BUY' ? 'Cost' : 'Proceeds'}</small>
+                        <div class="fw-bold h3 ${action === 'BUY' ? 'text-success' : 'text-danger'}">
+                            Rs. ${totalCost.toFixed(2)}
+                        </div>
+                    </div>
+                </div>
+            </div>
+        `;
+
+        modal.show();
+    });
+
+    // Confirm quick trade
+    document.getElementById('confirmQuickTrade').addEventListener('click', function () {
+        const action = document.querySelector('input[name="quickAction"]:checked').value;
+        const quantity = parseInt(quickQuantity.value);
+
+        if (!selectedStockId || quantity < 1) {
+            showNotification('Invalid trade parameters', 'danger');
+            return;
+        }
+
+        // Show loading state
+        const confirmBtn = document.getElementById('confirmQuickTrade');
+        const originalText = confirmBtn.innerHTML;
+        confirmBtn.innerHTML = '<i class="fas fa-spinner fa-spin me-2"></i>Processing...';
+        confirmBtn.disabled = true;
+
+        fetch(quickStockSelect.dataset.quickTradeUrl, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': csrfToken
+            },
+            body: JSON.stringify({
+                stock_id: selectedStockId,
+                trade_type: action,
+                quantity: quantity,
+                price: selectedStockPrice
+            })
+        })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('Network response was not ok');
+                }
+                return response.json();
+            })
+            .then(data => {
+                const modal = bootstrap.Modal.getInstance(document.getElementById('quickTradeModal'));
+                if (modal) modal.hide();
+
+                if (data.success) {
+                    showNotification(data.message, 'success');
+
+                    // Update balance display
+                    if (data.new_balance) {
+                        userBalance = parseFloat(data.new_balance);
+                        document.querySelectorAll('.balance-display').forEach(el => {
+                            el.textContent = `Rs. ${userBalance.toFixed(2)}`;
+                        });
+                    }
+
+                    // Reload after 2 seconds
+                    setTimeout(() => location.reload(), 2000);
+                } else {
+                    showNotification(data.error || 'Trade failed', 'danger');
+                    confirmBtn.innerHTML = originalText;
+                    confirmBtn.disabled = false;
+                }
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                showNotification('Error executing trade. Please try again.', 'danger');
+                const modal = bootstrap.Modal.getInstance(document.getElementById('quickTradeModal'));
+                if (modal) modal.hide();
+                confirmBtn.innerHTML = originalText;
+                confirmBtn.disabled = false;
+            });
+    });
+
+    // Portfolio quick buy buttons
+    document.querySelectorAll('.btn-quick-buy').forEach(button => {
+        button.addEventListener('click', function () {
+            const stockId = this.dataset.stockId;
+            const stockSymbol = this.dataset.stockSymbol;
+            const stockPrice = this.dataset.stockPrice;
+
+            // Set values in quick trade form
+            quickStockSelect.value = stockId;
+
+            // Trigger change event to update price
+            const event = new Event('change');
+            quickStockSelect.dispatchEvent(event);
+
+            // Set to buy
+            document.getElementById('quickBuy').checked = true;
+            document.querySelectorAll('input[name="quickAction"]').forEach(r => r.dispatchEvent(new Event('change')));
+
+            // Scroll to quick trade
+            document.querySelector('.card.border-0.shadow-sm.mb-4').scrollIntoView({
+                behavior: 'smooth',
+                block: 'center'
+            });
+        });
+    });
+
+    // Portfolio quick sell buttons
+    document.querySelectorAll('.btn-quick-sell').forEach(button => {
+        button.addEventListener('click', function () {
+            const stockId = this.dataset.stockId;
+            const stockSymbol = this.dataset.stockSymbol;
+            const stockPrice = this.dataset.stockPrice;
+            const maxQuantity = parseInt(this.dataset.maxQuantity) || 1;
+
+            // Set values in quick trade form
+            quickStockSelect.value = stockId;
+
+            // Trigger change event to update price
+            const event = new Event('change');
+            quickStockSelect.dispatchEvent(event);
+
+            // Set to sell
+            document.getElementById('quickSell').checked = true;
+            document.querySelectorAll('input[name="quickAction"]').forEach(r => r.dispatchEvent(new Event('change')));
+
+            // Set quantity to max available
+            quickQuantity.value = maxQuantity;
+            updateEstimatedCost();
+
+            // Scroll to quick trade
+            document.querySelector('.card.border-0.shadow-sm.mb-4').scrollIntoView({
+                behavior: 'smooth',
+                block: 'center'
+            });
+        });
+    });
+
+    // Update estimated cost when action changes
+    document.querySelectorAll('input[name="quickAction"]').forEach(radio => {
+        radio.addEventListener('change', function () {
+            updateEstimatedCost();
+        });
+    });
+
+    // Notification function
+    function showNotification(message, type) {
+        // Remove existing notifications
+        document.querySelectorAll('.alert-notification').forEach(el => el.remove());
+
+        const alert = document.createElement('div');
+        alert.className = `alert alert-${type} alert-notification alert-dismissible fade show position-fixed`;
+        alert.style.cssText = 'top: 20px; right: 20px; z-index: 9999; max-width: 400px;';
+        alert.innerHTML = `
+            <div class="d-flex align-items-center">
+                <i class="fas fa-${type === 'success' ? 'check-circle' : 'exclamation-triangle'} me-2"></i>
+                <div>${message}</div>
+            </div>
+            <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
+        `;
+        document.body.appendChild(alert);
+
+        setTimeout(() => {
+            if (alert.parentNode) {
+                alert.remove();
+            }
+        }, 5000);
+    }
+
+    // Initialize button state
+    updateExecuteButton();
+
+    // Poll watchlist quotes; the browser revalidates with If-None-Match so
+    // unchanged prices come back as an empty 304
+    const watchlist = document.getElementById('watchlist');
+    if (watchlist) {
+        let lastEtag = null;
+        setInterval(function () {
+            fetch(watchlist.dataset.quotesUrl, { cache: 'no-cache', credentials: 'same-origin' })
+                .then(response => {
+                    const etag = response.headers.get('ETag');
+                    if (!response.ok || etag === lastEtag) return null;
+                    lastEtag = etag;
+                    return response.json();
+                })
+                .then(data => {
+                    if (!data) return;
+                    data.quotes.forEach(quote => {
+                        const row = watchlist.querySelector(`[data-symbol="${quote.symbol}"]`);
+                        if (!row) return;
+                        const change = parseFloat(quote.change);
+                        row.querySelector('.quote-price').textContent = `Rs. ${parseFloat(quote.price).toFixed(2)}`;
+                        const changeEl = row.querySelector('.quote-change');
+                        changeEl.textContent = change.toFixed(2);
+                        changeEl.classList.toggle('positive-value', change >= 0);
+                        changeEl.classList.toggle('negative-value', change < 0);
+                    });
+                })
+                .catch(error => console.error('Quote refresh failed:', error));
+        }, 15000);
+    }
+});
@@ -0,0 +1,22 @@
+(function () {
+    var loginUrl = document.currentScript.dataset.loginUrl;
+
+    // Auto-redirect after 10 seconds
+    var seconds = 10;
+    var countdown = document.getElementById('countdown');
+
+    var countdownInterval = setInterval(function() {
+        seconds--;
+        countdown.textContent = seconds;
+
+        if (seconds <= 0) {
+            clearInterval(countdownInterval);
+            window.location.href = loginUrl;
+        }
+    }, 1000);
+
+    // Optional: Redirect immediately if clicked anywhere
+    document.addEventListener('click', function() {
+        window.location.href = loginUrl;
+    });
+})();
@@ -0,0 +1,115 @@
+document.addEventListener('DOMContentLoaded', function () {
+    const stockInput = document.getElementById('id_stock');
+    const stockSearch = document.getElementById('stockSearch');
+    const searchResults = document.getElementById('stockSearchResults');
+    const quantityInput = document.getElementById('id_quantity');
+    const tradeTypeSelect = document.getElementById('id_trade_type');
+    const currentPriceLabel = document.getElementById('currentPrice');
+    const tradeCostLabel = document.getElementById('tradeCost');
+    const balance = parseFloat(stockSearch.dataset.balance);
+
+    function selectStock(stockId, symbol, name, price) {
+        stockInput.value = stockId;
+        stockSearch.value = `${symbol} - ${name}`;
+        searchResults.style.display = 'none';
+
+        document.querySelectorAll('.stock-row-premium').forEach(r => {
+            r.classList.toggle('active', r.dataset.stockId === String(stockId));
+        });
+
+        if (price !== undefined) {
+            currentPriceLabel.textContent = `Rs. ${price.toFixed(2)}`;
+            updateTradeCost();
+            return;
+        }
+        // Searched stocks are not on the page, so fetch their price
+        fetch(`${stockSearch.dataset.quotesUrl}?symbols=${encodeURIComponent(symbol)}`)
+            .then(response => response.json())
+            .then(data => {
+                if (data.quotes && data.quotes.length) {
+                    currentPriceLabel.textContent = `Rs. ${parseFloat(data.quotes[0].price).toFixed(2)}`;
+                    updateTradeCost();
+                }
+            });
+    }
+
+    // Stock selection from visual list
+    document.querySelectorAll('.stock-row-premium').forEach(row => {
+        row.addEventListener('click', function () {
+            selectStock(this.dataset.stockId, this.dataset.symbol, this.dataset.name, parseFloat(this.dataset.price));
+        });
+    });
+
+    // Autocomplete search
+    let searchTimer = null;
+    stockSearch.addEventListener('input', function () {
+        clearTimeout(searchTimer);
+        const query = this.value.trim();
+        if (!query) {
+            searchResults.style.display = 'none';
+            return;
+        }
+        searchTimer = setTimeout(function () {
+            fetch(`${stockSearch.dataset.searchUrl}?q=${encodeURIComponent(query)}`)
+                .then(response => response.json())
+                .then(data => {
+                    searchResults.innerHTML = '';
+                    data.results.forEach(result => {
+                        const item = document.createElement('button');
+                        item.type = 'button';
+                        item.className = 'list-group-item list-group-item-action';
+                        const symbol = document.createElement('strong');
+                        symbol.textContent = result.symbol;
+                        const name = document.createElement('span');
+                        name.className = 'text-muted small ms-2';
+                        name.textContent = result.name;
+                        item.append(symbol, name);
+                        item.addEventListener('click', () => selectStock(result.id, result.symbol, result.name));
+                        searchResults.appendChild(item);
+                    });
+                    searchResults.style.display = data.results.length ? 'block' : 'none';
+                });
+        }, 150);
+    });
+
+    function updateTradeCost() {
+        const priceText = currentPriceLabel.textContent.replace('Rs. ', '');
+        const price = parseFloat(priceText) || 0;
+        const quantity = parseInt(quantityInput.value) || 0;
+        const tradeType = tradeTypeSelect.value;
+        const cost = price * quantity;
+
+        if (cost > 0) {
+            tradeCostLabel.textContent = `Rs. ${cost.toLocaleString(undefined, { minimumFractionDigits: 2 })}`;
+
+            if (tradeType === 'BUY' && cost > balance) {
+                tradeCostLabel.classList.add('negative-value');
+            } else {
+                tradeCostLabel.classList.remove('negative-value');
+            }
+        } else {
+            tradeCostLabel.textContent = 'Rs. 0.00';
+        }
+    }
+
+    [quantityInput, tradeTypeSelect].forEach(el => {
+        el?.addEventListener('input', updateTradeCost);
+        el?.addEventListener('change', updateTradeCost);
+    });
+
+    // Initial selection
+    const initialRow = document.querySelector(`.stock-row-premium[data-stock-id="${stockInput.value}"]`) ||
+        (stockInput.value ? null : document.querySelector('.stock-row-premium'));
+    if (initialRow) {
+        initialRow.click();
+    } else if (stockInput.value) {
+        selectStock(stockInput.value, stockSearch.dataset.selectedSymbol, stockSearch.dataset.selectedName);
+    }
+
+    // Form feedback
+    document.getElementById('tradeForm').addEventListener('submit', function (e) {
+        const submitBtn = this.querySelector('button[type="submit"]');
+        submitBtn.innerHTML = '<span class="spinner-border spinner-border-sm me-2"></span>Executing...';
+        submitBtn.disabled = true;
+    });
+});
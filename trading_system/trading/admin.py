@@ -1,22 +1,116 @@
-from django.contrib import admin
-from .models import Stock, Trade, Portfolio
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from .models import Stock, Trade, Portfolio, CorporateAction, OutboxOffset, MarketSession, AuctionOrder, RecurringOrder, IPO, IPOApplication
+from .corporate_actions import apply_corporate_action
+from .changelist import LargeTableAdmin
+from .forms import StockPriceForm
 
 @admin.register(Stock)
 class StockAdmin(admin.ModelAdmin):
     list_display = ['symbol', 'name', 'current_price', 'last_updated']
-    list_editable = ['current_price']
     search_fields = ['symbol', 'name']
     list_filter = ['last_updated']
+    # Replaces list_editable, which saved (and reindexed) each edited row on its own
+    actions = ['edit_prices']
 
+    @admin.action(description='Edit prices of selected stocks')
+    def edit_prices(self, request, queryset):
+        stocks = list(queryset.order_by('symbol'))
+        form = StockPriceForm(stocks, request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            changed = form.changed_stocks()
+            now = timezone.now()
+            for stock in changed:
+                # bulk_update skips auto_now, so stamp it explicitly
+                stock.last_updated = now
+            Stock.objects.bulk_update(changed, ['current_price', 'last_updated'], batch_size=500)
+            self.message_user(request, f"Updated the price of {len(changed)} stocks")
+            return None
+        return TemplateResponse(request, 'admin/trading/stock/edit_prices.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Edit prices',
+            'opts': self.model._meta,
+            'form': form,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+            'selected': [stock.pk for stock in stocks],
+        })
+
+# Large tables: estimated counts, keyset paging and indexed prefix search.
+# No date_hierarchy, which reads every distinct date in the table.
 @admin.register(Trade)
-class TradeAdmin(admin.ModelAdmin):
+class TradeAdmin(LargeTableAdmin):
     list_display = ['user', 'stock', 'trade_type', 'quantity', 'price', 'timestamp']
     list_filter = ['trade_type', 'timestamp']
+    list_select_related = ['user', 'stock']
     search_fields = ['user__username', 'stock__symbol']
-    date_hierarchy = 'timestamp'
 
 @admin.register(Portfolio)
-class PortfolioAdmin(admin.ModelAdmin):
+class PortfolioAdmin(LargeTableAdmin):
     list_display = ['user', 'stock', 'quantity', 'average_buy_price', 'last_updated']
+    list_select_related = ['user', 'stock']
+    search_fields = ['user__username', 'stock__symbol']
+    list_filter = ['last_updated']
+
+@admin.register(CorporateAction)
+class CorporateActionAdmin(admin.ModelAdmin):
+    list_display = ['stock', 'action_type', 'ratio_new', 'ratio_held', 'ex_date', 'applied_at', 'holders_adjusted']
+    list_filter = ['action_type', 'applied_at']
+    search_fields = ['stock__symbol']
+    list_select_related = ['stock']
+    readonly_fields = ['factor_numerator', 'factor_denominator', 'holders_adjusted', 'applied_at']
+    actions = ['apply_actions']
+
+    @admin.action(description='Apply selected corporate actions now')
+    def apply_actions(self, request, queryset):
+        pending = queryset.filter(applied_at__isnull=True)
+        # Holdings and back-adjusted history must switch basis on the same day: the ex-date
+        early = pending.filter(ex_date__gt=timezone.localdate())
+        for action in early:
+            self.message_user(request, f"{action}: not applied before its ex-date", messages.WARNING)
+        for action in pending.exclude(pk__in=early).order_by('ex_date', 'id'):
+            try:
+                holders = apply_corporate_action(action)
+            except ValueError as e:
+                self.message_user(request, f"{action}: {e}", messages.ERROR)
+            else:
+                self.message_user(request, f"{action}: {holders} holdings adjusted")
+
+@admin.register(OutboxOffset)
+class OutboxOffsetAdmin(admin.ModelAdmin):
+    list_display = ['consumer', 'last_event_id', 'updated_at']
+    search_fields = ['consumer']
+
+@admin.register(MarketSession)
+class MarketSessionAdmin(admin.ModelAdmin):
+    list_display = ['trading_date', 'phase', 'auction_at', 'auction_symbols', 'auction_fills']
+    list_filter = ['phase']
+
+@admin.register(AuctionOrder)
+class AuctionOrderAdmin(admin.ModelAdmin):
+    list_display = ['session', 'user', 'stock', 'trade_type', 'quantity', 'limit_price', 'status', 'filled_quantity', 'fill_price']
+    list_filter = ['status', 'trade_type', 'session']
+    list_select_related = ['session', 'user', 'stock']
+    search_fields = ['user__username', 'stock__symbol']
+
+@admin.register(RecurringOrder)
+class RecurringOrderAdmin(admin.ModelAdmin):
+    list_display = ['user', 'stock', 'amount', 'frequency', 'next_run_date', 'is_active', 'last_status', 'last_quantity']
+    list_filter = ['frequency', 'is_active', 'last_status']
+    list_select_related = ['user', 'stock']
     search_fields = ['user__username', 'stock__symbol']
-    list_filter = ['last_updated']
\ No newline at end of file
+
+@admin.register(IPO)
+class IPOAdmin(admin.ModelAdmin):
+    list_display = ['stock', 'issue_price', 'total_units', 'opens_at', 'closes_at', 'status', 'applicants', 'allottees']
+    list_filter = ['status']
+    list_select_related = ['stock']
+    readonly_fields = ['seed', 'input_digest', 'result_digest', 'applicants', 'allottees', 'allotted_at']
+
+@admin.register(IPOApplication)
+class IPOApplicationAdmin(admin.ModelAdmin):
+    list_display = ['ipo', 'user', 'units', 'amount_held', 'status', 'units_allotted', 'refund']
+    list_filter = ['status', 'ipo']
+    list_select_related = ['ipo__stock', 'user']
+    search_fields = ['user__username']
@@ -0,0 +1,160 @@
+"""
+Price alert evaluation.
+
+For every stock the engine keeps two threshold arrays ordered so that the
+alerts a price move can fire always sit at the tail:
+
+  ABOVE alerts fire when price >= threshold; keys are -threshold, ascending.
+  BELOW alerts fire when price <= threshold; keys are threshold, ascending.
+
+A tick is one bisect per side plus slicing off the fired tail, so it costs
+O(log n + k) for k fired alerts. Thresholds are held as integer paisa in
+compact arrays to keep a million alerts cheap in memory.
+"""
+from array import array
+from bisect import bisect_left, insort
+from collections import defaultdict
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PriceAlert
+from .money import Money
+
+FLUSH_BATCH_SIZE = 900
+
+
+def to_paisa(value):
+    return Money.parse(value).paisa
+
+
+class AlertBook:
+    __slots__ = ('above_keys', 'above_ids', 'below_keys', 'below_ids')
+
+    def __init__(self):
+        self.above_keys, self.above_ids = array('q'), array('q')
+        self.below_keys, self.below_ids = array('q'), array('q')
+
+    def __len__(self):
+        return len(self.above_ids) + len(self.below_ids)
+
+    def side(self, direction):
+        if direction == 'ABOVE':
+            return self.above_keys, self.above_ids
+        return self.below_keys, self.below_ids
+
+    @staticmethod
+    def key(direction, paisa):
+        return -paisa if direction == 'ABOVE' else paisa
+
+    def add(self, alert_id, direction, paisa):
+        keys, ids = self.side(direction)
+        key = self.key(direction, paisa)
+        i = bisect_left(keys, key)
+        keys.insert(i, key)
+        ids.insert(i, alert_id)
+
+    def remove(self, alert_id, direction, paisa):
+        keys, ids = self.side(direction)
+        key = self.key(direction, paisa)
+        i = bisect_left(keys, key)
+        while i < len(keys) and keys[i] == key:
+            if ids[i] == alert_id:
+                del keys[i]
+                del ids[i]
+                return True
+            i += 1
+        return False
+
+    def fire(self, paisa):
+        """Remove and return the ids of every alert the price satisfies"""
+        fired = []
+        # ABOVE: -threshold >= -price  <=>  threshold <= price
+        i = bisect_left(self.above_keys, -paisa)
+        if i < len(self.above_keys):
+            fired.extend(self.above_ids[i:])
+            del self.above_keys[i:]
+            del self.above_ids[i:]
+        # BELOW: threshold >= price
+        i = bisect_left(self.below_keys, paisa)
+        if i < len(self.below_keys):
+            fired.extend(self.below_ids[i:])
+            del self.below_keys[i:]
+            del self.below_ids[i:]
+        return fired
+
+
+class PriceAlertEngine:
+    def __init__(self):
+        self.books = defaultdict(AlertBook)
+        self.pending = []          # (alert_id, stock_id, price_paisa)
+        self.last_alert_id = 0
+
+    def __len__(self):
+        return sum(len(book) for book in self.books.values())
+
+    def load(self, rows):
+        """Bulk load (alert_id, stock_id, direction, threshold) rows, sorting each side once"""
+        sides = defaultdict(list)
+        for alert_id, stock_id, direction, threshold in rows:
+            paisa = to_paisa(threshold)
+            sides[stock_id, direction].append((AlertBook.key(direction, paisa), alert_id))
+            self.last_alert_id = max(self.last_alert_id, alert_id)
+        for (stock_id, direction), entries in sides.items():
+            book = self.books[stock_id]
+            keys, ids = book.side(direction)
+            entries.extend(zip(keys, ids))
+            entries.sort()
+            keys[:] = array('q', (key for key, _ in entries))
+            ids[:] = array('q', (alert_id for _, alert_id in entries))
+
+    def add(self, alert_id, stock_id, direction, threshold):
+        self.books[stock_id].add(alert_id, direction, to_paisa(threshold))
+        self.last_alert_id = max(self.last_alert_id, alert_id)
+
+    def remove(self, alert_id, stock_id, direction, threshold):
+        book = self.books.get(stock_id)
+        return bool(book) and book.remove(alert_id, direction, to_paisa(threshold))
+
+    def on_price(self, stock_id, price):
+        """Evaluate a price tick; fired alerts are queued for flush()"""
+        book = self.books.get(stock_id)
+        if not book:
+            return []
+        paisa = to_paisa(price)
+        fired = book.fire(paisa)
+        self.pending.extend((alert_id, stock_id, paisa) for alert_id in fired)
+        return fired
+
+    def sync(self):
+        """Pick up alerts created since the last sync"""
+        self.load(
+            PriceAlert.objects.filter(is_active=True, id__gt=self.last_alert_id)
+            .values_list('id', 'stock_id', 'direction', 'threshold')
+            .iterator()
+        )
+
+    def flush(self, batch_size=FLUSH_BATCH_SIZE):
+        """Persist fired alerts, one UPDATE per (price, batch)"""
+        if not self.pending:
+            return 0
+        by_price = defaultdict(list)
+        for alert_id, _, paisa in self.pending:
+            by_price[paisa].append(alert_id)
+        now = timezone.now()
+        updated = 0
+        with transaction.atomic():
+            for paisa, alert_ids in by_price.items():
+                price = Money(paisa)
+                for start in range(0, len(alert_ids), batch_size):
+                    # is_active guards against alerts cancelled after they were loaded
+                    updated += PriceAlert.objects.filter(
+                        id__in=alert_ids[start:start + batch_size], is_active=True
+                    ).update(is_active=False, triggered_at=now, triggered_price=price)
+        self.pending = []
+        return updated
+
+    @classmethod
+    def from_database(cls):
+        engine = cls()
+        engine.sync()
+        return engine
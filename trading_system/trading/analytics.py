@@ -0,0 +1,174 @@
+"""
+Per-user analytics, precomputed off the request path.
+
+Each user has one AnalyticsSnapshot row. Trades (and the worker's schedule)
+stamp requested_at; a refresh recomputes the figures and stamps computed_at
+with the time the computation started, so a trade landing mid-refresh
+leaves the snapshot stale for the next pass.
+
+ANALYTICS_QUEUE selects how refreshes run:
+  'db'    - the snapshot table is the queue; run_analytics_worker drains it
+  'local' - submitted straight to an in-process ProcessPoolExecutor
+  'sync'  - computed inline (development and tests)
+"""
+import json
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .archive import lifetime_trade_stats, lifetime_most_traded
+from .corporate_actions import PriceAdjuster
+from .models import Trade, Portfolio, AnalyticsSnapshot
+from .money import Money, ZERO, total_value
+from trading_system.db_routers import primary_reads, user_shard
+
+MONEY_FIELDS = ['total_profit', 'profit_loss', 'total_current']
+
+
+def compute_user_analytics(user):
+    """All heavy analytics figures for one user, as a JSON-ready dict"""
+    trades = Trade.objects.filter(user=user).order_by('-timestamp')
+
+    # Calculate basic stats (lifetime: hot table plus archived summaries)
+    stats = lifetime_trade_stats(user, trades)
+
+    # Calculate profit/loss from sells
+    profitable_trades = 0
+    hot_sells = 0
+    total_profit = ZERO
+
+    # Buy prices are restated onto the sell's basis if a bonus or split came in between
+    # (ids fetched first: trades may be on a user shard, actions are on the primary)
+    adjuster = PriceAdjuster.for_stocks(set(trades.values_list('stock_id', flat=True)))
+
+    # Per-trade matching only sees the hot table; archived sells are not re-read
+    for trade in trades.filter(trade_type='SELL'):
+        hot_sells += 1
+        # Find corresponding buy (simplified)
+        buy_trade = Trade.objects.filter(
+            user=user,
+            stock_id=trade.stock_id,
+            trade_type='BUY',
+            timestamp__lt=trade.timestamp
+        ).order_by('-timestamp').first()
+
+        if buy_trade:
+            buy_price = adjuster.price(trade.stock_id, buy_trade.timestamp, buy_trade.price, as_of=trade.timestamp)
+            profit = (trade.price - buy_price) * trade.quantity
+            total_profit += profit
+            if profit > 0:
+                profitable_trades += 1
+
+    # Portfolio performance
+    portfolio_items = Portfolio.objects.filter(user=user).prefetch_related('stock')
+    total_invested = total_value((item.quantity, item.average_buy_price) for item in portfolio_items)
+    total_current = total_value((item.quantity, item.stock.current_price) for item in portfolio_items)
+    portfolio_return = total_current - total_invested
+
+    data = {
+        'total_trades': stats['total'],
+        'buy_trades': stats['buys'],
+        'sell_trades': stats['sells'],
+        'win_rate': (profitable_trades / hot_sells * 100) if hot_sells > 0 else 0,
+        'total_profit': str(total_profit),
+        'profit_loss': str(portfolio_return),
+        'profit_loss_percentage': (portfolio_return / total_invested * 100) if total_invested > 0 else 0,
+        'total_current': str(total_current),
+        'most_traded': lifetime_most_traded(user, trades),
+    }
+    # Round-trip through JSON so callers see exactly what a stored snapshot holds
+    return json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+
+def load_analytics(data):
+    """Snapshot JSON back into the types the template expects"""
+    data = dict(data)
+    for field in MONEY_FIELDS:
+        data[field] = Money.parse(data[field])
+    # Snapshots written before amounts moved to Money hold the percentage as a string
+    data['profit_loss_percentage'] = float(data['profit_loss_percentage'])
+    return data
+
+def refresh_user_analytics(user_id):
+    """Recompute and store one user's snapshot; safe to run in a worker process"""
+    started_at = timezone.now()
+    # computed_at vouches for the data, so never compute from a lagging replica
+    with primary_reads():
+        user = User.objects.get(pk=user_id)
+        with user_shard(user_id):
+            data = compute_user_analytics(user)
+    # get_or_create underneath retries the lookup when a concurrent refresh inserts the row first
+    AnalyticsSnapshot.objects.update_or_create(user_id=user_id, defaults={'data': data, 'computed_at': started_at})
+    return data
+
+
+def init_worker():
+    """ProcessPoolExecutor initializer: a usable Django in the child, with no inherited DB handles"""
+    django.setup()
+    connections.close_all()
+
+_local_executor = None
+_local_lock = threading.Lock()
+_in_flight = set()
+
+def get_local_executor():
+    global _local_executor
+    with _local_lock:
+        if _local_executor is None:
+            # Inherited connections must not be shared with the children
+            connections.close_all()
+            _local_executor = ProcessPoolExecutor(
+                max_workers=settings.ANALYTICS_WORKERS, initializer=init_worker
+            )
+        return _local_executor
+
+def submit_local(user_id):
+    with _local_lock:
+        if user_id in _in_flight:
+            return
+        _in_flight.add(user_id)
+    future = get_local_executor().submit(refresh_user_analytics, user_id)
+    future.add_done_callback(lambda f: _in_flight.discard(user_id))
+
+def request_analytics_refresh(user_id):
+    """Mark a user's analytics stale and hand it to the configured queue"""
+    request_analytics_refreshes([user_id])
+
+def request_analytics_refreshes(user_ids):
+    """request_analytics_refresh for many users at once, as the bulk settlement paths need"""
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+    now = timezone.now()
+    AnalyticsSnapshot.objects.filter(user_id__in=user_ids).update(requested_at=now)
+    # Users without a snapshot yet; the ones just updated conflict and are skipped
+    AnalyticsSnapshot.objects.bulk_create(
+        [AnalyticsSnapshot(user_id=user_id, requested_at=now) for user_id in user_ids],
+        ignore_conflicts=True, batch_size=500,
+    )
+
+    queue = settings.ANALYTICS_QUEUE
+    for user_id in user_ids:
+        if queue == 'sync':
+            refresh_user_analytics(user_id)
+        elif queue == 'local':
+            submit_local(user_id)
+
+def mark_outdated_snapshots(max_age):
+    """Schedule a refresh for every snapshot computed more than max_age ago"""
+    now = timezone.now()
+    return AnalyticsSnapshot.objects.filter(computed_at__lt=now - max_age).update(requested_at=now)
+
+def stale_user_ids(limit):
+    """Users whose snapshot was requested after it was last computed"""
+    return list(
+        AnalyticsSnapshot.objects.filter(
+            Q(computed_at__isnull=True) | Q(requested_at__gt=F('computed_at'))
+        ).order_by('requested_at').values_list('user_id', flat=True)[:limit]
+    )
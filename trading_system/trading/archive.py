@@ -0,0 +1,177 @@
+import gzip
+import json
+import os
+
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Sum, Count
+
+from .models import Trade, TradeArchiveSummary, TradeArchiveFile
+from .money import Money, ZERO
+from trading_system.db_routers import PRIMARY_DB, data_aliases
+
+ARCHIVE_COLUMNS = ['id', 'user_id', 'stock_id', 'trade_type', 'quantity', 'price', 'timestamp']
+# Ids per DELETE, under SQLite's bound-parameter limit
+ARCHIVE_DELETE_BATCH_SIZE = 900
+
+
+def write_archive_file(path, rows):
+    """Write trade rows as gzip-compressed JSON, one array per column"""
+    columns = {name: [] for name in ARCHIVE_COLUMNS}
+    for row in rows:
+        for name, value in zip(ARCHIVE_COLUMNS, row):
+            columns[name].append(value)
+    columns['price'] = [str(price) for price in columns['price']]
+    columns['timestamp'] = [ts.isoformat() for ts in columns['timestamp']]
+
+    tmp_path = path + '.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump({'version': 1, 'rows': len(rows), 'columns': columns}, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+def read_archive_file(path):
+    """Yield archived trades from a file as dicts"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        data = json.load(f)
+    columns = data['columns']
+    for i in range(data['rows']):
+        row = {name: columns[name][i] for name in ARCHIVE_COLUMNS}
+        row['price'] = Money.parse(row['price'])
+        yield row
+
+def summarize_rows(rows):
+    """Fold trade rows into per-(user, stock) summary deltas"""
+    summaries = {}
+    for trade_id, user_id, stock_id, trade_type, quantity, price, timestamp in rows:
+        s = summaries.setdefault((user_id, stock_id), {
+            'trade_count': 0, 'buy_count': 0, 'sell_count': 0,
+            'buy_quantity': 0, 'sell_quantity': 0,
+            'buy_value': ZERO, 'sell_value': ZERO,
+            'first_trade_at': timestamp, 'last_trade_at': timestamp,
+        })
+        s['trade_count'] += 1
+        if trade_type == 'BUY':
+            s['buy_count'] += 1
+            s['buy_quantity'] += quantity
+            s['buy_value'] += quantity * price
+        else:
+            s['sell_count'] += 1
+            s['sell_quantity'] += quantity
+            s['sell_value'] += quantity * price
+        s['first_trade_at'] = min(s['first_trade_at'], timestamp)
+        s['last_trade_at'] = max(s['last_trade_at'], timestamp)
+    return summaries
+
+def apply_summaries(summaries):
+    """Add summary deltas onto the stored TradeArchiveSummary rows"""
+    user_ids = {user_id for user_id, _ in summaries}
+    stock_ids = {stock_id for _, stock_id in summaries}
+    existing = {
+        (s.user_id, s.stock_id): s
+        for s in TradeArchiveSummary.objects.filter(user_id__in=user_ids, stock_id__in=stock_ids)
+    }
+    to_create = []
+    for key, delta in summaries.items():
+        summary = existing.get(key)
+        if summary is None:
+            to_create.append(TradeArchiveSummary(user_id=key[0], stock_id=key[1], **delta))
+            continue
+        TradeArchiveSummary.objects.filter(pk=summary.pk).update(
+            trade_count=F('trade_count') + delta['trade_count'],
+            buy_count=F('buy_count') + delta['buy_count'],
+            sell_count=F('sell_count') + delta['sell_count'],
+            buy_quantity=F('buy_quantity') + delta['buy_quantity'],
+            sell_quantity=F('sell_quantity') + delta['sell_quantity'],
+            # Column arithmetic runs on the stored paisa
+            buy_value=F('buy_value') + delta['buy_value'].paisa,
+            sell_value=F('sell_value') + delta['sell_value'].paisa,
+            first_trade_at=min(filter(None, [summary.first_trade_at, delta['first_trade_at']])),
+            last_trade_at=max(filter(None, [summary.last_trade_at, delta['last_trade_at']])),
+        )
+    TradeArchiveSummary.objects.bulk_create(to_create)
+
+def purge_archived(archive_file, archive_dir, ids=None):
+    """Delete a recorded file's trades from its database, then mark it purged; safe to repeat"""
+    if ids is None:
+        ids = [row['id'] for row in read_archive_file(os.path.join(archive_dir, archive_file.file_name))]
+    with transaction.atomic(using=archive_file.database):
+        for start in range(0, len(ids), ARCHIVE_DELETE_BATCH_SIZE):
+            Trade.objects.using(archive_file.database).filter(id__in=ids[start:start + ARCHIVE_DELETE_BATCH_SIZE]).delete()
+    TradeArchiveFile.objects.filter(pk=archive_file.pk).update(purged=True)
+
+def archive_trades(cutoff, archive_dir=None, chunk_size=None):
+    """
+    Move trades older than cutoff into compressed archive files.
+    Each chunk is written to disk, then recorded and summarised on the primary
+    in one transaction, then deleted from its database. A run that stops
+    after the record first finishes those deletes when run again, so no trade
+    is summarised or archived twice.
+    Returns the number of trades archived.
+    """
+    archive_dir = archive_dir or settings.TRADE_ARCHIVE_DIR
+    chunk_size = chunk_size or settings.TRADE_ARCHIVE_CHUNK_SIZE
+    os.makedirs(archive_dir, exist_ok=True)
+
+    archived = 0
+    # Trade ids are per database: each user shard is archived on its own
+    for alias in data_aliases():
+        for archive_file in TradeArchiveFile.objects.filter(database=alias, purged=False).order_by('first_trade_id'):
+            purge_archived(archive_file, archive_dir)
+
+        prefix = 'trades' if alias == PRIMARY_DB else f'trades_{alias}'
+        last_id = 0
+        while True:
+            rows = list(
+                Trade.objects.using(alias).filter(timestamp__lt=cutoff, id__gt=last_id)
+                .order_by('id')
+                .values_list(*ARCHIVE_COLUMNS)[:chunk_size]
+            )
+            if not rows:
+                break
+            first_id, last_id = rows[0][0], rows[-1][0]
+            file_name = f"{prefix}_{first_id:012d}_{last_id:012d}.json.gz"
+            write_archive_file(os.path.join(archive_dir, file_name), rows)
+
+            with transaction.atomic():
+                apply_summaries(summarize_rows(rows))
+                archive_file = TradeArchiveFile.objects.create(
+                    file_name=file_name,
+                    database=alias,
+                    cutoff=cutoff,
+                    trade_count=len(rows),
+                    first_trade_id=first_id,
+                    last_trade_id=last_id,
+                    purged=False,
+                )
+            purge_archived(archive_file, archive_dir, [row[0] for row in rows])
+            archived += len(rows)
+    return archived
+
+def lifetime_trade_stats(user, trades=None):
+    """Combine hot Trade counts with archived summaries for a user"""
+    trades = trades if trades is not None else Trade.objects.filter(user=user)
+    hot = trades.aggregate(
+        total=Count('id'),
+        buys=Count('id', filter=Q(trade_type='BUY')),
+        sells=Count('id', filter=Q(trade_type='SELL')),
+    )
+    cold = TradeArchiveSummary.objects.filter(user=user).aggregate(
+        total=Sum('trade_count'),
+        buys=Sum('buy_count'),
+        sells=Sum('sell_count'),
+    )
+    return {key: hot[key] + (cold[key] or 0) for key in hot}
+
+def lifetime_most_traded(user, trades=None, limit=5):
+    """Most traded symbols over hot and archived trades"""
+    trades = trades if trades is not None else Trade.objects.filter(user=user)
+    totals = {}
+    for row in trades.values('stock__symbol').annotate(count=Count('id'), total_volume=Sum('quantity')).order_by():
+        totals[row['stock__symbol']] = {'count': row['count'], 'total_volume': row['total_volume']}
+    for row in TradeArchiveSummary.objects.filter(user=user).values('stock__symbol', 'trade_count', 'buy_quantity', 'sell_quantity'):
+        entry = totals.setdefault(row['stock__symbol'], {'count': 0, 'total_volume': 0})
+        entry['count'] += row['trade_count']
+        entry['total_volume'] += row['buy_quantity'] + row['sell_quantity']
+    ranked = sorted(totals.items(), key=lambda item: item[1]['count'], reverse=True)[:limit]
+    return [{'stock__symbol': symbol, **values} for symbol, values in ranked]
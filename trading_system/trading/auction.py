@@ -0,0 +1,317 @@
+"""
+Market sessions and the opening call auction.
+
+`python manage.py run_market_sessions` moves each trading day through
+MARKET_SCHEDULE (times in MARKET_TIME_ZONE):
+
+  PRE_OPEN    orders are queued as AuctionOrder rows instead of filling
+  CONTINUOUS  the opening auction has run; orders fill at current_price
+  CLOSED      orders are refused
+
+At the open every symbol with queued orders is uncrossed once: the auction
+price is the one that executes the most shares (then leaves the smallest
+surplus, then sits nearest the previous close, then is lowest), clipped to
+the circuit band around the previous close. Market orders bid the ceiling or
+offer the floor. Fills go by price then time priority, and everything filled
+is written in one transaction per database with bulk statements: balances,
+holdings, trades and their outbox events on each user shard, order results
+and opening prices on the primary.
+
+Before uncrossing, orders are screened in arrival order against the cash and
+shares each user has left, buys reserved at their limit (market buys at the
+ceiling), so no fill can overdraw an account. Books are uncrossed in a
+process pool (AUCTION_WORKERS) once there are enough of them to be worth it.
+
+Until the scheduler has created a session the market is treated as
+continuous, as it was before sessions existed.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from datetime import time as clock_time
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .analytics import request_analytics_refreshes
+from .models import Stock, MarketSession, AuctionOrder
+from .money import Money
+from .settlement import Fill, load_accounts, settle_fills
+from .simulator import DEFAULT_CIRCUIT_LIMIT
+from trading_system.db_routers import PRIMARY_DB, data_aliases
+
+# Fewer books than this are uncrossed inline: forking workers costs more
+MIN_PARALLEL_BOOKS = 64
+
+
+def market_time_zone():
+    return ZoneInfo(settings.MARKET_TIME_ZONE)
+
+def market_now(now=None):
+    return timezone.localtime(now or timezone.now(), market_time_zone())
+
+def scheduled_phase(now=None):
+    """Phase MARKET_SCHEDULE puts the market in at a moment"""
+    local = market_now(now)
+    schedule = settings.MARKET_SCHEDULE
+    if local.weekday() not in schedule['days']:
+        return 'CLOSED'
+    current = local.time()
+    if current < clock_time.fromisoformat(schedule['pre_open']) or current >= clock_time.fromisoformat(schedule['close']):
+        return 'CLOSED'
+    if current < clock_time.fromisoformat(schedule['open']):
+        return 'PRE_OPEN'
+    return 'CONTINUOUS'
+
+def market_phase(now=None):
+    """Phase orders are handled in right now, from today's MarketSession"""
+    session = MarketSession.objects.order_by('-trading_date').first()
+    if session is None:
+        # No scheduler running: orders fill at any hour
+        return 'CONTINUOUS'
+    if session.trading_date != market_now(now).date():
+        return 'CLOSED'
+    return session.phase
+
+def price_band(stock):
+    """(reference, floor, ceiling) in paisa: the circuit band around the previous close"""
+    reference = (stock.previous_close or stock.current_price).paisa
+    width = int(round(reference * DEFAULT_CIRCUIT_LIMIT))
+    return reference, reference - width, reference + width
+
+def queue_auction_order(user, stock, trade_type, quantity, limit_price=None):
+    """Queue an order for today's opening auction; returns (success, message, order)"""
+    session = MarketSession.objects.filter(trading_date=market_now().date(), phase='PRE_OPEN').first()
+    if session is None:
+        return False, "The market is not in pre-open", None
+    limit_price = Money.parse(limit_price)
+    if limit_price is not None:
+        _, floor, ceiling = price_band(stock)
+        if not floor <= limit_price.paisa <= ceiling:
+            return False, f"Limit must be within Rs.{Money(floor):.2f} - Rs.{Money(ceiling):.2f}", None
+    order = AuctionOrder.objects.create(
+        session=session,
+        user=user,
+        stock=stock,
+        trade_type=trade_type,
+        quantity=quantity,
+        limit_price=limit_price,
+    )
+    at = f"limit Rs.{limit_price:.2f}" if limit_price is not None else "market"
+    message = f"Queued {trade_type.lower()} of {quantity} {stock.symbol} ({at}) for the opening auction"
+    return True, message, order
+
+
+def uncross(buy_limits, buy_quantities, sell_limits, sell_quantities, reference):
+    """
+    Equilibrium of one call auction over paisa limits (market orders already
+    at the band edge). Returns (price, volume); (None, 0) when nothing crosses.
+    """
+    buy_limits = np.asarray(buy_limits, dtype=np.int64)
+    sell_limits = np.asarray(sell_limits, dtype=np.int64)
+    if not len(buy_limits) or not len(sell_limits):
+        return None, 0
+    buy_quantities = np.asarray(buy_quantities, dtype=np.int64)
+    sell_quantities = np.asarray(sell_quantities, dtype=np.int64)
+
+    candidates = np.unique(np.concatenate([buy_limits, sell_limits, [reference]]))
+    buy_order = np.argsort(buy_limits, kind='stable')
+    sell_order = np.argsort(sell_limits, kind='stable')
+    buy_cum = np.concatenate([[0], np.cumsum(buy_quantities[buy_order])])
+    sell_cum = np.concatenate([[0], np.cumsum(sell_quantities[sell_order])])
+    # Demand at p: buys bidding p or more; supply at p: sells offering p or less
+    demand = buy_cum[-1] - buy_cum[np.searchsorted(buy_limits[buy_order], candidates, 'left')]
+    supply = sell_cum[np.searchsorted(sell_limits[sell_order], candidates, 'right')]
+    volume = np.minimum(demand, supply)
+    if not volume.max():
+        return None, 0
+
+    # lexsort keys run last-to-first: most volume, least surplus, nearest reference, lowest
+    best = np.lexsort((candidates, np.abs(candidates - reference), np.abs(demand - supply), -volume))[0]
+    return int(candidates[best]), int(volume[best])
+
+def allocate(ids, limits, quantities, volume, buy):
+    """Split volume over one side by price then time priority; fills align with the inputs"""
+    ids = np.asarray(ids, dtype=np.int64)
+    limits = np.asarray(limits, dtype=np.int64)
+    quantities = np.asarray(quantities, dtype=np.int64)
+    # Best price first (highest bid, lowest offer), earliest order within a price.
+    # Orders that do not cross sort after the volume is used up and get nothing
+    order = np.lexsort((ids, -limits if buy else limits))
+    ranked = quantities[order]
+    fills = np.empty_like(quantities)
+    fills[order] = np.clip(volume - (np.cumsum(ranked) - ranked), 0, ranked)
+    return fills
+
+def uncross_book(book):
+    """Worker: uncross one symbol's book; returns (stock_id, price, buy fills, sell fills)"""
+    price, volume = uncross(
+        book['buy_limits'], book['buy_quantities'], book['sell_limits'], book['sell_quantities'], book['reference']
+    )
+    if price is None:
+        return book['stock_id'], None, [0] * len(book['buy_ids']), [0] * len(book['sell_ids'])
+    return (
+        book['stock_id'],
+        price,
+        allocate(book['buy_ids'], book['buy_limits'], book['buy_quantities'], volume, buy=True).tolist(),
+        allocate(book['sell_ids'], book['sell_limits'], book['sell_quantities'], volume, buy=False).tolist(),
+    )
+
+def uncross_books(books, workers=None, min_parallel=MIN_PARALLEL_BOOKS):
+    """uncross_book over every book, across a process pool when there are enough"""
+    workers = settings.AUCTION_WORKERS if workers is None else workers
+    if workers <= 1 or len(books) < min_parallel:
+        return [uncross_book(book) for book in books]
+    # Workers only do arithmetic on the books they are sent and never touch
+    # the database, so the caller's open transactions stay with the parent
+    chunksize = max(1, len(books) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(uncross_book, books, chunksize=chunksize))
+
+
+def screen_orders(orders, stocks, accounts, holdings):
+    """
+    Reject, in arrival order, orders the user could not settle if every
+    earlier order filled in full. Returns {stock_id: book} for the rest.
+    """
+    cash = {user_id: profile.balance.paisa for user_id, profile in accounts.items()}
+    shares = {key: item.quantity for key, item in holdings.items()}
+    bands = {stock_id: price_band(stock) for stock_id, stock in stocks.items()}
+    books = {}
+    for order in orders:
+        reference, floor, ceiling = bands[order.stock_id]
+        buy = order.trade_type == 'BUY'
+        if order.limit_price is None:
+            limit = ceiling if buy else floor
+        else:
+            limit = order.limit_price.paisa
+        if not floor <= limit <= ceiling:
+            order.status, order.reason = 'REJECTED', 'Limit outside the price band'
+            continue
+        if buy:
+            cost = limit * order.quantity
+            if cash.get(order.user_id, 0) < cost:
+                order.status, order.reason = 'REJECTED', 'Insufficient balance'
+                continue
+            cash[order.user_id] -= cost
+        else:
+            key = (order.user_id, order.stock_id)
+            if shares.get(key, 0) < order.quantity:
+                order.status, order.reason = 'REJECTED', 'Insufficient shares'
+                continue
+            shares[key] -= order.quantity
+
+        book = books.get(order.stock_id)
+        if book is None:
+            book = books[order.stock_id] = {
+                'stock_id': order.stock_id, 'reference': reference,
+                'buy_ids': [], 'buy_limits': [], 'buy_quantities': [],
+                'sell_ids': [], 'sell_limits': [], 'sell_quantities': [],
+            }
+        side = 'buy' if buy else 'sell'
+        book[f'{side}_ids'].append(order.id)
+        book[f'{side}_limits'].append(limit)
+        book[f'{side}_quantities'].append(order.quantity)
+    return books
+
+
+def run_opening_auction(session, workers=None):
+    """
+    Uncross every queued order of a pre-open session and open continuous
+    trading. Returns {'symbols', 'fills', 'rejected'}, or None when another
+    process already ran this session's auction.
+    """
+    now = timezone.now()
+    with ExitStack() as stack:
+        stack.enter_context(transaction.atomic(using=PRIMARY_DB))
+        for alias in data_aliases():
+            if alias != PRIMARY_DB:
+                stack.enter_context(transaction.atomic(using=alias))
+        # Claim the session; rolled back with everything else on failure
+        if not MarketSession.objects.filter(pk=session.pk, phase='PRE_OPEN').update(
+            phase='CONTINUOUS', auction_at=now, updated_at=now
+        ):
+            return None
+
+        orders = list(AuctionOrder.objects.filter(session=session, status='QUEUED').order_by('id'))
+        stocks = Stock.objects.in_bulk({order.stock_id for order in orders})
+        accounts, holdings = load_accounts({order.user_id for order in orders}, list(stocks))
+        books = screen_orders(orders, stocks, accounts, holdings)
+
+        by_id = {order.id: order for order in orders}
+        fills = []
+        opened = []
+        for stock_id, price, buy_fills, sell_fills in uncross_books(list(books.values()), workers):
+            book = books[stock_id]
+            for order_id, filled in zip(book['buy_ids'] + book['sell_ids'], buy_fills + sell_fills):
+                order = by_id[order_id]
+                order.filled_quantity = filled
+                order.status = 'FILLED' if filled == order.quantity else 'PARTIAL' if filled else 'UNFILLED'
+                if filled:
+                    order.fill_price = Money(price)
+                    fills.append((order.id, Fill(order.user_id, order.stock_id, order.trade_type, filled, price)))
+            if price is not None:
+                stock = stocks[stock_id]
+                stock.current_price = Money(price)
+                # bulk_update skips auto_now, so stamp it explicitly
+                stock.last_updated = now
+                opened.append(stock)
+
+        # Settle in arrival order, as the orders were screened
+        fills = [fill for _, fill in sorted(fills)]
+        settle_fills(fills, stocks, accounts, holdings, now)
+        AuctionOrder.objects.bulk_update(orders, ['status', 'filled_quantity', 'fill_price', 'reason'], batch_size=500)
+        Stock.objects.bulk_update(opened, ['current_price', 'last_updated'], batch_size=500)
+        # Bulk inserts send no post_save, so ask for the analytics refreshes once everything commits
+        user_ids = {fill.user_id for fill in fills}
+        transaction.on_commit(lambda: request_analytics_refreshes(user_ids), using=PRIMARY_DB)
+        MarketSession.objects.filter(pk=session.pk).update(auction_symbols=len(opened), auction_fills=len(fills))
+
+    return {
+        'symbols': len(opened),
+        'fills': len(fills),
+        'rejected': sum(order.status == 'REJECTED' for order in orders),
+    }
+
+def close_session(session):
+    """Close a session; orders still queued (no auction ran) end unfilled"""
+    now = timezone.now()
+    with transaction.atomic():
+        AuctionOrder.objects.filter(session=session, status='QUEUED').update(
+            status='UNFILLED', reason='Session closed before the auction'
+        )
+        MarketSession.objects.filter(pk=session.pk).update(phase='CLOSED', updated_at=now)
+
+def advance_session(now=None, workers=None):
+    """
+    Bring today's MarketSession to the phase the schedule calls for, running
+    the opening auction on the way into continuous trading. Returns a list of
+    (session, action, auction result) steps taken.
+    """
+    local = market_now(now)
+    today = local.date()
+    target = scheduled_phase(local)
+    steps = []
+
+    for stale in MarketSession.objects.filter(trading_date__lt=today).exclude(phase='CLOSED'):
+        close_session(stale)
+        steps.append((stale, 'closed', None))
+
+    if target == 'CLOSED':
+        session = MarketSession.objects.filter(trading_date=today).exclude(phase='CLOSED').first()
+        if session is not None:
+            if session.phase == 'PRE_OPEN' and local.time() >= clock_time.fromisoformat(settings.MARKET_SCHEDULE['open']):
+                # The scheduler missed the open: fill the queue before closing
+                steps.append((session, 'auction', run_opening_auction(session, workers)))
+            close_session(session)
+            steps.append((session, 'closed', None))
+        return steps
+
+    session, created = MarketSession.objects.get_or_create(trading_date=today, defaults={'phase': 'PRE_OPEN'})
+    if created:
+        steps.append((session, 'pre-open', None))
+    if target == 'CONTINUOUS' and session.phase == 'PRE_OPEN':
+        steps.append((session, 'auction', run_opening_auction(session, workers)))
+    return steps
@@ -0,0 +1,217 @@
+"""
+Admin changelists for tables too large to count or scan.
+
+A default changelist costs a full COUNT (twice, with the unfiltered total), an
+OFFSET that reads every skipped row, a date hierarchy built from SELECT
+DISTINCT over the whole table, and search with LIKE '%term%' across joins.
+LargeTableAdmin replaces each of those:
+
+  - counts: the planner's row estimate for an unfiltered list, and
+    otherwise a COUNT that stops at ADMIN_COUNT_CAP rows
+    (EstimatedCountPaginator); facets and the full-result count are off,
+  - paging: newest first by primary key, with an "Older" link that seeks
+    with pk < the last id shown (KeysetChangeList) instead of an OFFSET,
+  - search: each search_fields path (fk__field) is matched by prefix with a
+    range on the related table's indexed column, as typed or in capitals,
+    and the matching ids are filtered on this table's foreign key index,
+    so the related table is never joined.
+
+With DATABASE_SHARDS set, a sharded model's changelist reads one database
+at a time, chosen with a Shard filter (the first shard by default) rather
+than the signed-in admin's own shard. Primary keys repeat across shards, so
+the change form finds its row on the shard the changelist was showing.
+Relations to primary-only tables (users) cannot be joined on a shard, so
+they are prefetched from the primary instead of select_related.
+"""
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList, ORDER_VAR, PAGE_VAR
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.http import QueryDict
+from django.utils.functional import cached_property
+
+from trading_system.db_routers import SHARD_REFERENCE_MODELS, data_aliases, is_sharded, shard_aliases
+
+CURSOR_VAR = 'before'
+SHARD_VAR = 'shard'
+# Enough ids for a prefix that names a handful of users or symbols
+SEARCH_MATCH_LIMIT = 1000
+
+
+def table_row_estimate(model, using):
+    """The planner's row count for model's table, or None when it has none"""
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            elif connection.vendor == 'mysql':
+                cursor.execute(
+                    'SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s',
+                    [table],
+                )
+            elif connection.vendor == 'sqlite':
+                # Written by ANALYZE: the first figure of each index's stat is the table's rows
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if not row or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    # PostgreSQL reports -1 before the table's first ANALYZE
+    return estimate if estimate >= 0 else None
+
+
+def selected_alias(request):
+    """The database a sharded changelist (or the change form opened from it) reads"""
+    value = request.GET.get(SHARD_VAR) or QueryDict(request.GET.get('_changelist_filters', '')).get(SHARD_VAR)
+    aliases = data_aliases()
+    return value if value in aliases else aliases[0]
+
+def on_every_shard(model):
+    return is_sharded(model) or model._meta.label_lower in SHARD_REFERENCE_MODELS
+
+
+class ShardListFilter(admin.SimpleListFilter):
+    title = 'shard'
+    parameter_name = SHARD_VAR
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in data_aliases()]
+
+    def choices(self, changelist):
+        # One shard is always shown, so there is no "All" choice
+        current = self.value() if self.value() in data_aliases() else data_aliases()[0]
+        for alias, title in self.lookup_choices:
+            yield {
+                'selected': alias == current,
+                'query_string': changelist.get_query_string({self.parameter_name: alias}),
+                'display': title,
+            }
+
+    def queryset(self, request, queryset):
+        # LargeTableAdmin.get_queryset has already picked the database
+        return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that never counts more than ADMIN_COUNT_CAP rows"""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        self.estimated = self.capped = False
+        cap = settings.ADMIN_COUNT_CAP
+        if not queryset.query.where:
+            estimate = table_row_estimate(queryset.model, queryset.db)
+            # A small or stale estimate is checked, so a short list is never cut off
+            if estimate is not None and estimate > cap:
+                self.estimated = True
+                return estimate
+        # COUNT over a LIMITed subquery stops reading at the cap
+        count = queryset.order_by()[:cap + 1].count()
+        if count > cap:
+            self.capped = True
+            return cap
+        return count
+
+
+class KeysetChangeList(ChangeList):
+    """ChangeList that can page newest-first by seeking on the primary key"""
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = None
+        value = request.GET.get(CURSOR_VAR, '')
+        if value.isdigit():
+            self.cursor = int(value)
+        self.next_url = None
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Sorting, filtering and page links start again from the newest rows
+        return super().get_query_string(new_params, [CURSOR_VAR, *(remove or [])])
+
+    def keyset_ordering(self):
+        # Only the admin's own newest-first order; a sorted column pages by number
+        ordering = list(self.model_admin.ordering or [])
+        return ORDER_VAR not in self.params and ordering[:1] in (['-pk'], [f'-{self.lookup_opts.pk.name}'])
+
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        if self.cursor is not None and exclude_parameters is None:
+            queryset = queryset.filter(pk__lt=self.cursor)
+        return queryset
+
+    def get_results(self, request):
+        if self.cursor is not None:
+            self.page_num = 1
+        super().get_results(request)
+        if self.show_all or not self.keyset_ordering():
+            return
+        # Evaluated here, the rows are cached for the template
+        rows = list(self.result_list)
+        if len(rows) == self.list_per_page:
+            self.next_url = self.get_query_string({CURSOR_VAR: rows[-1].pk}, [PAGE_VAR])
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    ordering = ['-pk']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def sharded(self):
+        return bool(shard_aliases()) and is_sharded(self.model)
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        return [ShardListFilter, *list_filter] if self.sharded() else list_filter
+
+    def get_list_select_related(self, request):
+        related = super().get_list_select_related(request)
+        if not self.sharded():
+            return related
+        return [name for name in related if on_every_shard(self.model._meta.get_field(name).related_model)]
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if not self.sharded():
+            return queryset
+        primary_only = [
+            name for name in super().get_list_select_related(request)
+            if not on_every_shard(self.model._meta.get_field(name).related_model)
+        ]
+        # The router would send these to the admin's own shard
+        return queryset.using(selected_alias(request)).prefetch_related(*primary_only)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        for term in search_term.split():
+            matches = Q()
+            for path in self.get_search_fields(request):
+                relation, field = path.lstrip('^=@').split('__', 1)
+                related = self.model._meta.get_field(relation).related_model
+                ids = []
+                for prefix in {term, term.upper()}:
+                    # A range on the indexed column, unlike LIKE, can seek on any backend
+                    ids += related.objects.filter(
+                        **{f'{field}__gte': prefix, f'{field}__lt': prefix + '\U0010ffff'}
+                    ).values_list('pk', flat=True)[:SEARCH_MATCH_LIMIT]
+                matches |= Q(**{f'{relation}_id__in': ids})
+            queryset = queryset.filter(matches)
+        return queryset, False
@@ -0,0 +1,160 @@
+"""
+Corporate actions: bonus shares, splits and rights issues.
+
+Applying an action touches every holder of the symbol with one UPDATE, so
+its cost does not depend on Python looping over Portfolio rows. Trades are
+never rewritten; each applied action records a quantity factor, and
+PriceAdjuster back-adjusts historical prices and quantities when they are read.
+
+Factors are quantity multipliers (new shares per old share):
+  BONUS  (held + new) / held        e.g. 10 bonus per 100 held -> 110/100
+  SPLIT  new / held                 e.g. 2-for-1 -> 2/1
+  RIGHT  1, recorded only: holders are not given the entitlement here
+         (rights have to be subscribed separately), so neither their
+         holdings nor the stock's live or historical prices are adjusted.
+"""
+import datetime
+from bisect import bisect_right
+from collections import defaultdict
+from fractions import Fraction
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Stock, Portfolio, CorporateAction, CorporateActionShard
+from .money import Money, div_round
+from trading_system.db_routers import data_aliases
+
+
+def quantity_factor(action):
+    """The action's quantity multiplier as a reduced Fraction"""
+    if action.action_type == 'BONUS':
+        return Fraction(action.ratio_held + action.ratio_new, action.ratio_held)
+    if action.action_type == 'SPLIT':
+        return Fraction(action.ratio_new, action.ratio_held)
+    return Fraction(1)
+
+def scaled_money(column, numerator, denominator):
+    """SQL for column * numerator / denominator, rounded half up to the paisa"""
+    return (F(column) * (2 * numerator) + denominator) / (2 * denominator)
+
+def scale_holdings(action, alias, num, den):
+    """
+    Scale the action's holdings on one database, once: the marker row is
+    written in the same transaction. Returns the holdings adjusted there.
+    """
+    try:
+        with transaction.atomic(using=alias):
+            done = CorporateActionShard.objects.using(alias).filter(action_id=action.pk).first()
+            if done is not None:
+                return done.holders_adjusted
+            # Fractional bonus shares are dropped. Both SET expressions read the
+            # pre-update quantity, so the cost basis is spread over the new total.
+            new_quantity = F('quantity') * num / den
+            holders = Portfolio.objects.using(alias).filter(stock_id=action.stock_id, quantity__gt=0).update(
+                average_buy_price=(F('average_buy_price') * F('quantity') * 2 + new_quantity) / (new_quantity * 2),
+                quantity=new_quantity,
+            )
+            CorporateActionShard.objects.using(alias).create(action_id=action.pk, holders_adjusted=holders)
+    except IntegrityError:
+        # A concurrent run scaled this database first; its UPDATE stands and ours rolled back
+        return CorporateActionShard.objects.using(alias).get(action_id=action.pk).holders_adjusted
+    return holders
+
+def apply_corporate_action(action):
+    """
+    Apply an action to every holding and to the stock's prices.
+    Returns the number of holdings adjusted; an action is only ever applied once.
+
+    Each database's holdings commit with their own marker before the
+    primary claims the action, so a run that stops in between is finished
+    by running it again without scaling any database twice.
+    """
+    if action.action_type == 'SPLIT' and action.ratio_new < action.ratio_held:
+        raise ValueError('Reverse splits are not supported')
+    if CorporateAction.objects.filter(pk=action.pk, applied_at__isnull=False).exists():
+        return 0
+    factor = quantity_factor(action)
+    num, den = factor.numerator, factor.denominator
+
+    holders = 0
+    if factor != 1:
+        for alias in data_aliases():
+            holders += scale_holdings(action, alias, num, den)
+
+    with transaction.atomic():
+        # Claiming the row makes re-running (or racing) a no-op
+        claimed = CorporateAction.objects.filter(pk=action.pk, applied_at__isnull=True).update(
+            applied_at=timezone.now(), factor_numerator=num, factor_denominator=den, holders_adjusted=holders,
+        )
+        if not claimed:
+            return 0
+        if factor != 1:
+            # Keep today's change meaningful across the ex-date
+            Stock.objects.filter(pk=action.stock_id).update(
+                current_price=scaled_money('current_price', den, num),
+                previous_close=scaled_money('previous_close', den, num),
+                last_updated=timezone.now(),
+            )
+    action.refresh_from_db()
+    return holders
+
+def apply_due_actions(today=None):
+    """Apply every pending action whose ex-date has arrived, oldest first"""
+    today = today or timezone.localdate()
+    applied = []
+    for action in CorporateAction.objects.filter(applied_at__isnull=True, ex_date__lte=today).order_by('ex_date', 'id'):
+        apply_corporate_action(action)
+        applied.append(action)
+    return applied
+
+
+def ex_datetime(ex_date):
+    """Trades strictly before this moment are on the pre-action basis"""
+    return timezone.make_aware(datetime.datetime.combine(ex_date, datetime.time.min))
+
+
+class PriceAdjuster:
+    """Back-adjusts historical trade prices and quantities for applied actions"""
+    def __init__(self, actions):
+        by_stock = defaultdict(list)
+        for stock_id, ex_date, num, den in actions:
+            by_stock[stock_id].append((ex_datetime(ex_date), Fraction(num, den)))
+        # Per stock: ex datetimes ascending, and the product of factors from each one onwards
+        self._stocks = {}
+        for stock_id, entries in by_stock.items():
+            entries.sort(key=lambda entry: entry[0])
+            cumulative = [Fraction(1)] * (len(entries) + 1)
+            for i in range(len(entries) - 1, -1, -1):
+                cumulative[i] = cumulative[i + 1] * entries[i][1]
+            self._stocks[stock_id] = ([moment for moment, _ in entries], cumulative)
+
+    @classmethod
+    def for_stocks(cls, stock_ids):
+        return cls(
+            CorporateAction.objects.filter(stock_id__in=stock_ids, applied_at__isnull=False)
+            .values_list('stock_id', 'ex_date', 'factor_numerator', 'factor_denominator')
+        )
+
+    def factor(self, stock_id, timestamp, as_of=None):
+        """Quantity multiplier for actions with ex-date after timestamp (and up to as_of)"""
+        entry = self._stocks.get(stock_id)
+        if entry is None:
+            return Fraction(1)
+        moments, cumulative = entry
+        factor = cumulative[bisect_right(moments, timestamp)]
+        if as_of is not None:
+            factor /= cumulative[bisect_right(moments, as_of)]
+        return factor
+
+    def price(self, stock_id, timestamp, price, as_of=None):
+        factor = self.factor(stock_id, timestamp, as_of)
+        if factor == 1:
+            return price
+        return Money(div_round(price.paisa * factor.denominator, factor.numerator))
+
+    def quantity(self, stock_id, timestamp, quantity, as_of=None):
+        """Adjusted quantity; may be fractional when an action's ratio does not divide it"""
+        adjusted = quantity * self.factor(stock_id, timestamp, as_of)
+        return int(adjusted) if adjusted.denominator == 1 else float(adjusted)
@@ -1,10 +1,17 @@
 from django import forms
 from .models import Trade, Stock
+from .money import Money
 
 class TradeForm(forms.ModelForm):
+    # Chosen through the autocomplete search box, so only the id is rendered
     stock = forms.ModelChoiceField(
         queryset=Stock.objects.all(),
-        widget=forms.Select(attrs={'class': 'form-control'})
+        widget=forms.HiddenInput()
+    )
+    # Only used for orders queued during pre-open; blank is a market order
+    limit_price = forms.DecimalField(
+        required=False, min_value=0.01, max_digits=12, decimal_places=2,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'})
     )
     
     class Meta:
@@ -14,7 +21,24 @@ class TradeForm(forms.ModelForm):
             'trade_type': forms.Select(attrs={'class': 'form-control'}),
             'quantity': forms.NumberInput(attrs={'class': 'form-control', 'min': '1'}),
         }
-    
-    def __init__(self, *args, **kwargs):
+
+class StockPriceForm(forms.Form):
+    """One price field per stock, for the admin's bulk price edit"""
+    def __init__(self, stocks, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['stock'].label_from_instance = lambda obj: f"{obj.symbol} - {obj.name} (Rs.{obj.current_price})"
\ No newline at end of file
+        self.stocks = stocks
+        for stock in stocks:
+            self.fields[f'price_{stock.id}'] = forms.DecimalField(
+                label=stock.symbol, initial=stock.current_price.to_decimal(),
+                min_value=0.01, max_digits=12, decimal_places=2,
+            )
+
+    def changed_stocks(self):
+        """Stocks whose price was changed, with the new price set on them"""
+        changed = []
+        for stock in self.stocks:
+            price = Money.parse(self.cleaned_data[f'price_{stock.id}'])
+            if price != stock.current_price:
+                stock.current_price = price
+                changed.append(stock)
+        return changed
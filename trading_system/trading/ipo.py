@@ -0,0 +1,191 @@
+"""
+IPO applications and the allotment lottery.
+
+Applying costs two statements: a guarded UPDATE that holds units x issue
+price from the applicant's balance (refused when the balance is short) and
+the IPOApplication INSERT, committed together.
+
+Once the issue has closed, draw_ipo() allots it:
+
+  1. A seed is drawn and stored before anything else, then every
+     application is read in id order into numpy arrays and a digest of them
+     is stored with the seed.
+  2. allot_lots() gives every applicant one lot per round while whole rounds
+     fit, then draws the lots left over at random among those still wanting
+     more, with numpy's default_rng(seed). With NEPSE's usual one-lot
+     applications that is a straight draw of the available lots.
+  3. Applications are settled in chunks of IPO_CHUNK_SIZE, one transaction
+     per chunk and database: each hold is released and the allotted units
+     are bought at the issue price through the bulk settlement, so winners
+     get Portfolio rows and Trade records, and everyone else their refund.
+
+The seed, the input digest and a digest of the result stay on the IPO, so
+anyone can repeat the draw (verify_draw()). A draw that stops part way is
+resumed by running it again: the stored seed and the unchanged application
+set give the same result, and settled applications are skipped.
+"""
+import hashlib
+import secrets
+from contextlib import ExitStack
+
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import Profile
+from .analytics import request_analytics_refreshes
+from .models import Stock, IPO, IPOApplication
+from .settlement import Fill, load_accounts, settle_fills
+from trading_system.db_routers import PRIMARY_DB, data_aliases, user_shard
+
+
+def apply_for_ipo(user, ipo, units):
+    """Hold the amount and record the application; returns (success, message, application)"""
+    now = timezone.now()
+    if ipo.status != 'OPEN' or not ipo.opens_at <= now < ipo.closes_at:
+        return False, "This IPO is not open for applications", None
+    if units <= 0 or units % ipo.lot_units or units > ipo.max_units:
+        return False, f"Apply for a multiple of {ipo.lot_units} units, up to {ipo.max_units}", None
+
+    amount = ipo.issue_price * units
+    try:
+        with user_shard(user.pk) as db, transaction.atomic(using=db), transaction.atomic(using=PRIMARY_DB):
+            # The caller's copy may be stale: the draw reads the applications once it claims the row
+            if not IPO.objects.select_for_update().filter(
+                pk=ipo.pk, status='OPEN', opens_at__lte=now, closes_at__gt=now
+            ).exists():
+                return False, "This IPO is not open for applications", None
+            held = Profile.objects.filter(user_id=user.pk, balance__gte=amount).update(
+                # Column arithmetic runs on the stored paisa
+                balance=F('balance') - amount.paisa, updated_at=now,
+            )
+            if not held:
+                return False, f"Insufficient balance! Need Rs.{amount:.2f}", None
+            application = IPOApplication.objects.create(ipo=ipo, user=user, units=units, amount_held=amount)
+    except IntegrityError:
+        return False, "You have already applied for this IPO", None
+    return True, f"Applied for {units} units of {ipo.stock.symbol}; Rs.{amount:.2f} is on hold", application
+
+
+def allot_lots(lots, total_lots, seed):
+    """
+    Lots allotted to each application, given the lots each asked for (in
+    application id order). Pure and deterministic for a given seed.
+    """
+    lots = np.asarray(lots, dtype=np.int64)
+    if lots.sum() <= total_lots:
+        return lots.copy()
+    # needed[r]: lots used when everyone gets up to r; take the most whole rounds that fit
+    ordered = np.sort(lots)
+    below = np.concatenate([[0], np.cumsum(ordered)])
+    rounds = np.arange(ordered[-1] + 1)
+    at = np.searchsorted(ordered, rounds, 'left')
+    needed = below[at] + rounds * (len(ordered) - at)
+    full_rounds = int(np.searchsorted(needed, total_lots, 'right')) - 1
+
+    allotted = np.minimum(lots, full_rounds)
+    left = int(total_lots - allotted.sum())
+    wanting = np.flatnonzero(lots > full_rounds)
+    winners = np.random.default_rng(seed).choice(wanting, size=left, replace=False)
+    allotted[winners] += 1
+    return allotted
+
+def digest(ipo_id, seed, *arrays):
+    """sha256 over the IPO, the seed and int64 arrays, for publishing a draw"""
+    h = hashlib.sha256(f"ipo:{ipo_id};seed:{seed};".encode())
+    for array in arrays:
+        h.update(np.ascontiguousarray(array, dtype='<i8').tobytes())
+    return h.hexdigest()
+
+def draw(ipo):
+    """(application ids, lots applied for, lots allotted) from the stored seed"""
+    rows = np.array(
+        list(IPOApplication.objects.filter(ipo=ipo).order_by('id').values_list('id', 'units')), dtype=np.int64
+    ).reshape(-1, 2)
+    ids, lots = rows[:, 0], rows[:, 1] // ipo.lot_units
+    return ids, lots, allot_lots(lots, ipo.total_units // ipo.lot_units, ipo.seed)
+
+def verify_draw(ipo):
+    """Repeat the draw from the stored seed; True when it matches the published digests"""
+    ids, lots, allotted = draw(ipo)
+    return (
+        digest(ipo.id, ipo.seed, ids, lots) == ipo.input_digest
+        and digest(ipo.id, ipo.seed, ids, allotted) == ipo.result_digest
+    )
+
+def draw_ipo(ipo, seed=None, chunk_size=None, log=None):
+    """Allot a closed IPO and settle every application; returns {'applicants', 'allottees', 'settled'}"""
+    chunk_size = chunk_size or settings.IPO_CHUNK_SIZE
+    if ipo.status == 'OPEN':
+        if timezone.now() < ipo.closes_at:
+            raise ValueError('The IPO is still open for applications')
+        # Fix the seed before the draw, in one claim, so a re-run draws the same lots
+        seed = secrets.randbits(63) if seed is None else seed
+        if not IPO.objects.filter(pk=ipo.pk, status='OPEN').update(status='ALLOTTING', seed=seed):
+            raise ValueError('The IPO is already being allotted')
+        ipo.refresh_from_db()
+    elif ipo.status == 'ALLOTTED':
+        raise ValueError('The IPO has already been allotted')
+
+    ids, lots, allotted = draw(ipo)
+    IPO.objects.filter(pk=ipo.pk).update(
+        input_digest=digest(ipo.id, ipo.seed, ids, lots),
+        result_digest=digest(ipo.id, ipo.seed, ids, allotted),
+        applicants=len(ids),
+        allottees=int(np.count_nonzero(allotted)),
+    )
+
+    stock = Stock.objects.get(pk=ipo.stock_id)
+    settled = 0
+    while True:
+        now = timezone.now()
+        with ExitStack() as stack:
+            stack.enter_context(transaction.atomic(using=PRIMARY_DB))
+            for alias in data_aliases():
+                if alias != PRIMARY_DB:
+                    stack.enter_context(transaction.atomic(using=alias))
+            applications = list(
+                IPOApplication.objects.filter(ipo=ipo, status='PENDING').order_by('id')[:chunk_size]
+            )
+            if not applications:
+                break
+            accounts, holdings = load_accounts({app.user_id for app in applications}, [stock.id])
+            app_ids = np.array([app.id for app in applications], dtype=np.int64)
+            positions = np.searchsorted(ids, app_ids)
+            if not (positions < len(ids)).all() or not np.array_equal(ids[positions], app_ids):
+                raise ValueError('Applications changed after the draw was read; nothing in this chunk was settled')
+            fills = []
+            for app, units in zip(applications, allotted[positions] * ipo.lot_units):
+                units = int(units)
+                # Release the hold; the allotted units are then bought out of it
+                accounts[app.user_id].balance += app.amount_held
+                app.units_allotted = units
+                app.refund = app.amount_held - ipo.issue_price * units
+                app.status = 'ALLOTTED' if units else 'NOT_ALLOTTED'
+                if units:
+                    fills.append(Fill(app.user_id, stock.id, 'BUY', units, ipo.issue_price.paisa))
+            settle_fills(fills, {stock.id: stock}, accounts, holdings, now)
+            # settle_fills wrote the winners' balances; the rest only get their refunds
+            write_refunds([accounts[app.user_id] for app in applications if not app.units_allotted], now)
+            IPOApplication.objects.bulk_update(applications, ['status', 'units_allotted', 'refund'], batch_size=500)
+            # Bulk inserts send no post_save, so ask for the winners' analytics once the chunk commits
+            user_ids = {fill.user_id for fill in fills}
+            transaction.on_commit(lambda: request_analytics_refreshes(user_ids), using=PRIMARY_DB)
+        settled += len(applications)
+        if log:
+            log(f"Settled {settled:,} of {len(ids):,} applications")
+
+    IPO.objects.filter(pk=ipo.pk).update(status='ALLOTTED', allotted_at=timezone.now())
+    ipo.refresh_from_db()
+    return {'applicants': ipo.applicants, 'allottees': ipo.allottees, 'settled': settled}
+
+def write_refunds(profiles, now):
+    """bulk_update the released holds of profiles settle_fills did not write"""
+    by_alias = {}
+    for profile in profiles:
+        profile.updated_at = now
+        by_alias.setdefault(profile._state.db, []).append(profile)
+    for alias, alias_profiles in by_alias.items():
+        Profile.objects.using(alias).bulk_update(alias_profiles, ['balance', 'updated_at'], batch_size=500)
@@ -0,0 +1,320 @@
+"""
+Leaderboard of users by equity (cash plus holdings at current_price).
+
+Equity is kept in memory and updated incrementally instead of re-joining
+Portfolio x Stock for every view:
+
+  - Each symbol has a holder book (user_id -> quantity). A price move is
+    applied by walking that symbol's book once, and ticks for the same
+    symbol between flushes collapse into one net move, so a user holding
+    several moving symbols is repositioned once per flush.
+  - Trades adjust one user's cash and one holder book entry.
+  - Rankings live in an order-statistic list keyed by (-equity, user_id),
+    giving O(log n) rank, top-N and updates.
+
+Like the search index the board is built lazily per process. It pulls new
+trades and price changes from the database on each access and is rebuilt
+from scratch after LEADERBOARD_REBUILD_SECONDS, which picks up changes
+that arrive without a trade (deposits, corporate actions).
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from contextlib import ExitStack
+from itertools import chain
+
+from django.conf import settings
+from django.db import transaction
+
+from accounts.models import Profile
+from .models import Stock, Trade, Portfolio
+from trading_system.db_routers import data_aliases
+
+class OrderStatisticList:
+    """
+    Sorted unique keys with rank and select.
+
+    Keys live in sorted buckets of roughly BUCKET_SIZE; a Fenwick tree over
+    the bucket lengths turns "how many keys come before bucket i" and "which
+    bucket holds position p" into O(log n) walks, and the in-bucket work is
+    a bisect plus a short C-level memmove.
+    """
+    BUCKET_SIZE = 512
+
+    def __init__(self, keys=()):
+        keys = sorted(keys)
+        self._buckets = [keys[i:i + self.BUCKET_SIZE] for i in range(0, len(keys), self.BUCKET_SIZE)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self.size = len(keys)
+        self._rebuild_tree()
+
+    def __len__(self):
+        return self.size
+
+    def _rebuild_tree(self):
+        tree = [0] + [len(bucket) for bucket in self._buckets]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, index, delta):
+        tree = self._tree
+        index += 1
+        while index < len(tree):
+            tree[index] += delta
+            index += index & -index
+
+    def _keys_before(self, index):
+        """Total length of buckets[:index]"""
+        tree = self._tree
+        total = 0
+        while index:
+            total += tree[index]
+            index -= index & -index
+        return total
+
+    def _locate(self, position):
+        """(bucket index, offset) of the key at position"""
+        tree = self._tree
+        index = 0
+        step = 1 << (len(tree).bit_length() - 1)
+        while step:
+            if index + step < len(tree) and tree[index + step] <= position:
+                index += step
+                position -= tree[index]
+            step >>= 1
+        return index, position
+
+    def insert(self, key):
+        if not self._buckets:
+            self._buckets, self._maxes = [[key]], [key]
+            self.size = 1
+            self._rebuild_tree()
+            return
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            i -= 1
+        bucket = self._buckets[i]
+        insort(bucket, key)
+        self._maxes[i] = bucket[-1]
+        self.size += 1
+        if len(bucket) > 2 * self.BUCKET_SIZE:
+            # Splits are rare, so a full O(buckets) tree rebuild is fine
+            self._buckets[i:i + 1] = [bucket[:self.BUCKET_SIZE], bucket[self.BUCKET_SIZE:]]
+            self._maxes[i:i + 1] = [bucket[self.BUCKET_SIZE - 1], bucket[-1]]
+            self._rebuild_tree()
+        else:
+            self._tree_add(i, 1)
+
+    def remove(self, key):
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            raise KeyError(key)
+        bucket = self._buckets[i]
+        j = bisect_left(bucket, key)
+        if bucket[j] != key:
+            raise KeyError(key)
+        del bucket[j]
+        self.size -= 1
+        if bucket:
+            self._maxes[i] = bucket[-1]
+            self._tree_add(i, -1)
+        else:
+            del self._buckets[i]
+            del self._maxes[i]
+            self._rebuild_tree()
+
+    def rank(self, key):
+        """Number of keys sorting before key"""
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return self.size
+        return self._keys_before(i) + bisect_left(self._buckets[i], key)
+
+    def select(self, start, stop):
+        """Keys at positions start..stop-1"""
+        start, stop = max(0, start), min(stop, self.size)
+        if start >= stop:
+            return []
+        i, offset = self._locate(start)
+        keys = []
+        wanted = stop - start
+        while len(keys) < wanted:
+            keys.extend(self._buckets[i][offset:offset + wanted - len(keys)])
+            i, offset = i + 1, 0
+        return keys
+
+
+class Leaderboard:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.ranking = OrderStatisticList()
+        self.cash = {}                       # user_id -> paisa
+        self.equity = {}                     # user_id -> paisa
+        self.holders = defaultdict(dict)     # stock_id -> {user_id: quantity}
+        self.shares_held = defaultdict(int)  # stock_id -> total quantity held
+        self.prices = {}                     # stock_id -> paisa
+        self._pending_prices = {}            # stock_id -> latest unapplied paisa
+        self.last_trade_ids = {}             # database alias -> last applied trade id
+        self.prices_as_of = None
+        self.built_at = None
+
+    def __len__(self):
+        return len(self.equity)
+
+    def build(self, cash_rows, holding_rows, price_rows, last_trade_ids=None):
+        """
+        Fill an empty board from (user_id, balance), (user_id, stock_id, quantity)
+        and (stock_id, price, last_updated) rows.
+        """
+        with self._lock:
+            for stock_id, price, updated_at in price_rows:
+                self.prices[stock_id] = price.paisa
+                if self.prices_as_of is None or updated_at > self.prices_as_of:
+                    self.prices_as_of = updated_at
+            for user_id, balance in cash_rows:
+                self.cash[user_id] = self.equity[user_id] = balance.paisa
+            for user_id, stock_id, quantity in holding_rows:
+                self.holders[stock_id][user_id] = quantity
+                self.shares_held[stock_id] += quantity
+                self.equity[user_id] = self.equity.get(user_id, 0) + quantity * self.prices.get(stock_id, 0)
+            self.ranking = OrderStatisticList((-equity, user_id) for user_id, equity in self.equity.items())
+            self.last_trade_ids = dict(last_trade_ids or {})
+            self.built_at = time.monotonic()
+
+    def _move(self, user_id, delta):
+        if not delta:
+            return
+        old = self.equity[user_id]
+        self.ranking.remove((-old, user_id))
+        self.equity[user_id] = old + delta
+        self.ranking.insert((-(old + delta), user_id))
+
+    def on_trade(self, user_id, stock_id, trade_type, quantity, price):
+        """Apply one executed trade: shares move one way, cash the other"""
+        with self._lock:
+            if user_id not in self.equity:
+                # Users who signed up after the build join with their real balance on the next rebuild
+                return
+            signed = quantity if trade_type == 'BUY' else -quantity
+            book = self.holders[stock_id]
+            held = book.get(user_id, 0) + signed
+            if held:
+                book[user_id] = held
+            else:
+                book.pop(user_id, None)
+            self.shares_held[stock_id] += signed
+            self.cash[user_id] = self.cash.get(user_id, 0) - signed * price.paisa
+            # Executed at price, valued at the board's current price for the symbol
+            market = self.prices.setdefault(stock_id, price.paisa)
+            self._move(user_id, signed * (market - price.paisa))
+
+    def on_price(self, stock_id, price):
+        """Record a price tick; applied to holders on the next flush()"""
+        with self._lock:
+            self._pending_prices[stock_id] = price.paisa
+
+    def flush(self):
+        """Apply pending ticks through each symbol's holder book; returns users repositioned"""
+        with self._lock:
+            deltas = defaultdict(int)
+            for stock_id, paisa in self._pending_prices.items():
+                move = paisa - self.prices.get(stock_id, paisa)
+                self.prices[stock_id] = paisa
+                if move:
+                    for user_id, quantity in self.holders.get(stock_id, {}).items():
+                        deltas[user_id] += quantity * move
+            self._pending_prices = {}
+            for user_id, delta in deltas.items():
+                self._move(user_id, delta)
+            return len(deltas)
+
+    def market_value(self, stock_id):
+        """Value of all users' holdings of a symbol, from the per-symbol aggregate"""
+        return self.shares_held.get(stock_id, 0) * self.prices.get(stock_id, 0)
+
+    def rank(self, user_id):
+        """1-based rank, or None for users not on the board"""
+        with self._lock:
+            equity = self.equity.get(user_id)
+            if equity is None:
+                return None
+            return self.ranking.rank((-equity, user_id)) + 1
+
+    def top(self, n, offset=0):
+        """[(rank, user_id, equity_paisa), ...] for ranks offset+1..offset+n"""
+        with self._lock:
+            keys = self.ranking.select(offset, offset + n)
+        return [(offset + i + 1, user_id, -neg_equity) for i, (neg_equity, user_id) in enumerate(keys)]
+
+    def sync(self):
+        """Pull trades and price changes made since the last sync, from any process"""
+        # Trade ids are only ordered within one database, so each shard has its own watermark
+        for alias in data_aliases():
+            new_trades = list(
+                Trade.objects.using(alias).filter(id__gt=self.last_trade_ids.get(alias, 0)).order_by('id')
+                .values_list('id', 'user_id', 'stock_id', 'trade_type', 'quantity', 'price')
+            )
+            for trade_id, user_id, stock_id, trade_type, quantity, price in new_trades:
+                self.on_trade(user_id, stock_id, trade_type, quantity, price)
+                self.last_trade_ids[alias] = trade_id
+
+        moved = Stock.objects.values_list('id', 'current_price', 'last_updated')
+        if self.prices_as_of is not None:
+            moved = moved.filter(last_updated__gt=self.prices_as_of)
+        for stock_id, price, updated_at in moved:
+            self.on_price(stock_id, price)
+            if self.prices_as_of is None or updated_at > self.prices_as_of:
+                self.prices_as_of = updated_at
+        self.flush()
+
+    @classmethod
+    def from_database(cls):
+        board = cls()
+        aliases = data_aliases()
+        # One transaction per database so balances, holdings and the trade
+        # watermarks agree; anything that slips through is corrected by the next rebuild
+        with ExitStack() as stack:
+            for alias in aliases:
+                stack.enter_context(transaction.atomic(using=alias))
+            last_trade_ids = {
+                alias: Trade.objects.using(alias).order_by('-id').values_list('id', flat=True).first() or 0
+                for alias in aliases
+            }
+            board.build(
+                chain.from_iterable(
+                    Profile.objects.using(alias).values_list('user_id', 'balance').iterator() for alias in aliases
+                ),
+                chain.from_iterable(
+                    Portfolio.objects.using(alias).filter(quantity__gt=0)
+                    .values_list('user_id', 'stock_id', 'quantity').iterator()
+                    for alias in aliases
+                ),
+                Stock.objects.values_list('id', 'current_price', 'last_updated'),
+                last_trade_ids,
+            )
+        return board
+
+
+_board = None
+_board_lock = threading.Lock()
+
+def get_leaderboard():
+    """The process-wide board, caught up with the database"""
+    global _board
+    max_age = getattr(settings, 'LEADERBOARD_REBUILD_SECONDS', 600)
+    with _board_lock:
+        if _board is None or time.monotonic() - _board.built_at > max_age:
+            _board = Leaderboard.from_database()
+        else:
+            _board.sync()
+        return _board
+
+def reset_leaderboard():
+    """Drop the board so the next access rebuilds it"""
+    global _board
+    with _board_lock:
+        _board = None
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from trading.corporate_actions import apply_due_actions
+
+
+class Command(BaseCommand):
+    help = 'Apply bonus issues, splits and rights issues whose ex-date has arrived'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        applied = apply_due_actions()
+        for action in applied:
+            self.stdout.write(f"{action}: {action.holders_adjusted} holdings adjusted")
+        self.stdout.write(self.style.SUCCESS(
+            f"Applied {len(applied)} corporate actions in {time.perf_counter() - start:.2f}s"
+        ))
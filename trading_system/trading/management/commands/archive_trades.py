@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from trading.archive import archive_trades
+
+
+class Command(BaseCommand):
+    help = 'Move trades older than N months into compressed archive files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=12, help='Archive trades older than this many months')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Trades per archive file')
+        parser.add_argument('--archive-dir', default=None, help='Directory for archive files')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=30 * options['months'])
+        count = archive_trades(cutoff, archive_dir=options['archive_dir'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {count} trades older than {cutoff:%Y-%m-%d}"))
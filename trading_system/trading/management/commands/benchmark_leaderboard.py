@@ -0,0 +1,63 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from trading.leaderboard import Leaderboard
+from trading.money import Money
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the in-memory equity leaderboard (no database access)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200_000)
+        parser.add_argument('--symbols', type=int, default=250)
+        parser.add_argument('--holdings-per-user', type=int, default=5)
+        parser.add_argument('--ticks', type=int, default=1_000)
+        parser.add_argument('--queries', type=int, default=100_000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        n_users, n_symbols = options['users'], options['symbols']
+        prices = [rng.randrange(10_000, 200_000) for _ in range(n_symbols)]
+        cash = [(user_id, Money(rng.randrange(0, 10_000_000))) for user_id in range(n_users)]
+        holdings = [
+            (user_id, stock_id, rng.randrange(10, 1_000))
+            for user_id in range(n_users)
+            for stock_id in rng.sample(range(n_symbols), options['holdings_per_user'])
+        ]
+
+        board = Leaderboard()
+        start = time.perf_counter()
+        board.build(cash, holdings, [(stock_id, Money(p), None) for stock_id, p in enumerate(prices)])
+        self.stdout.write(f"Built {n_users:,} users / {len(holdings):,} holdings in {time.perf_counter() - start:.2f}s")
+        del cash, holdings
+
+        # One flush per tick: the worst case, with nothing coalesced
+        moved = 0
+        start = time.perf_counter()
+        for _ in range(options['ticks']):
+            stock_id = rng.randrange(n_symbols)
+            prices[stock_id] = max(100, int(prices[stock_id] * (1 + rng.gauss(0, 0.01))))
+            board.on_price(stock_id, Money(prices[stock_id]))
+            moved += board.flush()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"{options['ticks']:,} ticks in {elapsed:.2f}s ({elapsed / options['ticks'] * 1e3:.2f} ms/tick), "
+            f"{moved / options['ticks']:,.0f} holders repositioned per tick"
+        )
+
+        user_ids = [rng.randrange(n_users) for _ in range(options['queries'])]
+        start = time.perf_counter()
+        for user_id in user_ids:
+            board.rank(user_id)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{options['queries']:,} rank lookups: {elapsed / options['queries'] * 1e6:.1f} us each")
+
+        start = time.perf_counter()
+        for _ in range(options['queries']):
+            board.top(10, rng.randrange(n_users))
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{options['queries']:,} top-10 pages: {elapsed / options['queries'] * 1e6:.1f} us each")
@@ -0,0 +1,67 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from trading.money import Money, total_value
+
+
+def decimal_execution(orders):
+    """The old execution path: string round trips into Decimal"""
+    balance = Decimal('10000000.00')
+    for quantity, price in orders:
+        cost = Decimal(str(quantity)) * Decimal(str(price))
+        balance -= cost
+        average = (cost + Decimal(str(price)) * 10) / (quantity + 10)
+    return balance, average
+
+def money_execution(orders):
+    balance = Money(1_000_000_000)
+    for quantity, price in orders:
+        cost = price * quantity
+        balance -= cost
+        average = (cost + price * 10) / (quantity + 10)
+    return balance, average
+
+
+class Command(BaseCommand):
+    help = 'Compare Money (integer paisa) with the old Decimal arithmetic (no database access)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200_000)
+        parser.add_argument('--holdings', type=int, default=1_000_000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def timed(self, label, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"  {label:<8} {elapsed:.3f}s")
+        return elapsed, result
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        paisa = [rng.randrange(10_000, 500_000) for _ in range(max(options['orders'], options['holdings']))]
+        quantities = [rng.randrange(1, 500) for _ in paisa]
+
+        # Decimal rows mirror what DecimalField used to hand back
+        decimal_orders = [(q, Decimal(p).scaleb(-2)) for q, p in zip(quantities[:options['orders']], paisa)]
+        money_orders = [(q, Money(p)) for q, p in zip(quantities[:options['orders']], paisa)]
+
+        self.stdout.write(f"Trade execution arithmetic, {options['orders']:,} orders:")
+        old, old_result = self.timed('Decimal', decimal_execution, decimal_orders)
+        new, new_result = self.timed('Money', money_execution, money_orders)
+        self.stdout.write(f"  speedup  {old / new:.1f}x")
+        if old_result[0] != new_result[0]:
+            self.stderr.write(f"Balances differ: {old_result[0]} vs {new_result[0]}")
+
+        decimal_holdings = [(q, Decimal(p).scaleb(-2)) for q, p in zip(quantities, paisa[:options['holdings']])]
+        money_holdings = [(q, Money(p)) for q, p in zip(quantities, paisa[:options['holdings']])]
+
+        self.stdout.write(f"Portfolio valuation, {options['holdings']:,} holdings:")
+        old, old_total = self.timed('Decimal', lambda rows: sum((q * p for q, p in rows), Decimal('0.00')), decimal_holdings)
+        new, new_total = self.timed('Money', total_value, money_holdings)
+        self.stdout.write(f"  speedup  {old / new:.1f}x")
+        if old_total != new_total:
+            self.stderr.write(f"Totals differ: {old_total} vs {new_total}")
@@ -0,0 +1,51 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from trading.alerts import PriceAlertEngine
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the in-memory price alert engine (no database access)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alerts', type=int, default=1_000_000)
+        parser.add_argument('--symbols', type=int, default=500)
+        parser.add_argument('--ticks', type=int, default=200_000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        n_symbols = options['symbols']
+        prices = [rng.uniform(100, 2000) for _ in range(n_symbols)]
+
+        # Thresholds spread +/-20% around each symbol's starting price
+        rows = []
+        for alert_id in range(1, options['alerts'] + 1):
+            stock_id = rng.randrange(n_symbols)
+            direction = 'ABOVE' if rng.random() < 0.5 else 'BELOW'
+            offset = rng.uniform(0.0, 0.2)
+            threshold = prices[stock_id] * (1 + offset if direction == 'ABOVE' else 1 - offset)
+            rows.append((alert_id, stock_id, direction, round(threshold, 2)))
+
+        engine = PriceAlertEngine()
+        start = time.perf_counter()
+        engine.load(rows)
+        load_time = time.perf_counter() - start
+        del rows
+
+        ticks = [(rng.randrange(n_symbols), rng.gauss(0, 0.002)) for _ in range(options['ticks'])]
+        fired = 0
+        start = time.perf_counter()
+        for stock_id, move in ticks:
+            prices[stock_id] *= 1 + move
+            fired += len(engine.on_price(stock_id, round(prices[stock_id], 2)))
+        tick_time = time.perf_counter() - start
+        engine.pending = []
+
+        self.stdout.write(f"Loaded {options['alerts']:,} alerts over {n_symbols} symbols in {load_time:.2f}s")
+        self.stdout.write(
+            f"{options['ticks']:,} ticks in {tick_time:.2f}s "
+            f"({tick_time / options['ticks'] * 1e6:.1f} us/tick), {fired:,} alerts fired, {len(engine):,} still active"
+        )
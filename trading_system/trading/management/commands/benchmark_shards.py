@@ -0,0 +1,80 @@
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from accounts.models import Profile
+from trading.analytics import init_worker
+from trading.models import Stock, Trade, Portfolio, OutboxEvent
+from trading.money import Money
+from trading.views import execute_trade_logic
+from trading_system.db_routers import data_aliases, shard_for_user
+
+USERNAME_PREFIX = 'shardbench_'
+
+
+def run_trades(user_ids, stock_id, rounds):
+    """Worker: alternate one-share buys and sells for each user; returns trades executed"""
+    stock = Stock.objects.get(pk=stock_id)
+    users = list(User.objects.filter(pk__in=user_ids))
+    executed = 0
+    for i in range(rounds):
+        for user in users:
+            success, message, _ = execute_trade_logic(user, stock, 'BUY' if i % 2 == 0 else 'SELL', 1, stock.current_price)
+            if not success:
+                raise RuntimeError(message)
+            executed += 1
+    return executed
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure order write throughput with one process per database holding trades. '
+        'Writes to the configured databases: run against scratch files, with and without TMS_SHARD_DBS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Writer processes (default: one per shard)')
+        parser.add_argument('--users-per-worker', type=int, default=5)
+        parser.add_argument('--rounds', type=int, default=200, help='Trades per user')
+
+    def handle(self, *args, **options):
+        aliases = data_aliases()
+        workers = options['workers'] or len(aliases)
+
+        # Worker w writes only for users homed on aliases[w % len(aliases)]
+        worker_shards = [aliases[w % len(aliases)] for w in range(workers)]
+        per_worker = options['users_per_worker']
+        needed = Counter(worker_shards)
+        stock, _ = Stock.objects.get_or_create(symbol='SHBENCH', defaults={'name': 'Shard benchmark', 'current_price': Money(10_000)})
+        by_shard = defaultdict(list)
+        n = 0
+        while any(len(by_shard[alias]) < count * per_worker for alias, count in needed.items()):
+            user, _ = User.objects.get_or_create(username=f'{USERNAME_PREFIX}{n}')
+            by_shard[shard_for_user(user.pk)].append(user.pk)
+            n += 1
+        groups = []
+        for w, alias in enumerate(worker_shards):
+            taken = worker_shards[:w].count(alias) * per_worker
+            groups.append(by_shard[alias][taken:taken + per_worker])
+
+        connections.close_all()
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+            executed = sum(pool.map(run_trades, groups, [stock.id] * workers, [options['rounds']] * workers))
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"{executed:,} trades by {workers} workers over {len(aliases)} database(s) in {elapsed:.2f}s: "
+            f"{executed / elapsed:,.0f} trades/s"
+        )
+
+        bench_ids = list(User.objects.filter(username__startswith=USERNAME_PREFIX).values_list('id', flat=True))
+        for alias in aliases:
+            for model in (Trade, Portfolio, Profile):
+                model.objects.using(alias).filter(user_id__in=bench_ids).delete()
+            OutboxEvent.objects.using(alias).filter(payload__stock_id=stock.id).delete()
+        User.objects.filter(id__in=bench_ids).delete()
+        stock.delete()
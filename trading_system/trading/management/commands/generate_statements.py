@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from trading.statements import generate_statements, fiscal_year_bounds
+
+
+class Command(BaseCommand):
+    help = (
+        'Write every user\'s capital-gains and transaction statement for a fiscal year '
+        'to compressed files; a stopped run resumes where it left off'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('year', type=int, help='Year the fiscal year starts in (2025 for FY 2025/26)')
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default ANALYTICS_WORKERS)')
+        parser.add_argument('--users-per-range', type=int, default=2000, help='Users per worker task and file')
+        parser.add_argument('--output-dir', default=None, help='Directory for the year\'s statements (default STATEMENT_DIR)')
+
+    def handle(self, *args, **options):
+        try:
+            start, end = fiscal_year_bounds(options['year'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"Statements for {start.date()} to {end.date()} (exclusive)")
+
+        def on_range(alias, first, last, stats):
+            self.stdout.write(f"{alias} users {first}..{last if last is not None else 'end'}: {stats}")
+
+        directory, totals = generate_statements(
+            options['year'],
+            output_dir=options['output_dir'],
+            users_per_range=options['users_per_range'],
+            workers=options['workers'] or settings.ANALYTICS_WORKERS,
+            on_range=on_range,
+        )
+        if totals['users_per_range'] not in (None, options['users_per_range']):
+            self.stderr.write(self.style.WARNING(
+                f"--users-per-range {options['users_per_range']} ignored: {directory} was started with "
+                f"{totals['users_per_range']}; delete the directory to cut the ranges again"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['users']} statements, {totals['transactions']} transactions written to {directory} "
+            f"({totals['ranges']} ranges, {totals['resumed']} already done)"
+        ))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from trading.sharding import rebalance
+from trading_system.db_routers import shard_aliases
+
+
+class Command(BaseCommand):
+    help = 'Move users whose rows are not on their home shard (run with order entry stopped)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', action='append', dest='sources',
+            help="Database to drain or check (repeatable); default: every shard. "
+                 "Use 'default' when switching sharding on, or a retired shard's alias."
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Users moved per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would move')
+
+    def handle(self, *args, **options):
+        if not shard_aliases():
+            raise CommandError('No shards configured (set TMS_SHARD_DBS).')
+        for alias in options['sources'] or []:
+            if alias not in connections:
+                raise CommandError(f"Unknown database '{alias}'")
+
+        log = None if options['dry_run'] else self.stdout.write
+        summary = rebalance(options['sources'], options['batch_size'], options['dry_run'], log=log)
+        if not summary:
+            self.stdout.write(self.style.SUCCESS('Every user is on their home shard'))
+            return
+        verb = 'would move' if options['dry_run'] else 'moved'
+        for (source, target), users in sorted(summary.items()):
+            self.stdout.write(self.style.SUCCESS(f"{source} -> {target}: {verb} {users} users"))
@@ -0,0 +1,63 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from trading.reconcile import reconcile, apply_repairs, read_plan
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild holdings and cash from the trade history and report (or repair) '
+        'Portfolio and Profile rows that differ'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default ANALYTICS_WORKERS)')
+        parser.add_argument('--users-per-range', type=int, default=2000, help='Users per worker task')
+        parser.add_argument('--plan', help='Write the repair plan to this file, one JSON object per line')
+        parser.add_argument('--apply', action='store_true', help='Apply repairs as each range is reconciled')
+        parser.add_argument('--from-plan', help='Apply a plan written earlier with --plan, and nothing else')
+
+    def handle(self, *args, **options):
+        if options['from_plan']:
+            repairs = read_plan(options['from_plan'])
+            applied = apply_repairs(repairs)
+            self.stdout.write(self.style.SUCCESS(
+                f"Applied {applied} of {len(repairs)} repairs (rows changed since the plan was written are left alone)"
+            ))
+            return
+
+        totals = {'users': 0, 'positions': 0, 'skipped': 0, 'applied': 0}
+
+        def on_range(alias, first, last, stats):
+            for key, value in stats.items():
+                totals[key] += value
+            self.stdout.write(f"{alias} users {first}..{last if last is not None else 'end'}: {stats}")
+
+        plan = open(options['plan'], 'w') if options['plan'] else None
+        found = 0
+        try:
+            for repairs in reconcile(
+                users_per_range=options['users_per_range'],
+                workers=options['workers'] or settings.ANALYTICS_WORKERS,
+                apply=options['apply'],
+                on_range=on_range,
+            ):
+                found += len(repairs)
+                for repair in repairs:
+                    if plan:
+                        plan.write(json.dumps(repair) + '\n')
+                    elif not options['apply']:
+                        self.stdout.write(json.dumps(repair))
+        finally:
+            if plan:
+                plan.close()
+
+        summary = (
+            f"{totals['users']} users, {totals['positions']} positions checked; "
+            f"{found} repairs found, {totals['skipped']} positions skipped"
+        )
+        if options['apply']:
+            summary += f", {totals['applied']} applied"
+        self.stdout.write(self.style.SUCCESS(summary))
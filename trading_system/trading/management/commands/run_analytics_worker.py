@@ -0,0 +1,52 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from trading.analytics import init_worker, mark_outdated_snapshots, refresh_user_analytics, stale_user_ids
+
+
+class Command(BaseCommand):
+    help = 'Drain the analytics snapshot queue with a process pool (run a single instance)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default ANALYTICS_WORKERS)')
+        parser.add_argument('--batch-size', type=int, default=100, help='Users claimed per poll')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--schedule', type=int, default=3600, help='Refresh every snapshot older than this many seconds, 0 to disable')
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+
+    def handle(self, *args, **options):
+        workers = options['workers'] or settings.ANALYTICS_WORKERS
+        max_age = timedelta(seconds=options['schedule']) if options['schedule'] else None
+        next_schedule = 0.0
+        refreshed = 0
+
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+            while True:
+                if max_age and time.monotonic() >= next_schedule:
+                    mark_outdated_snapshots(max_age)
+                    next_schedule = time.monotonic() + max_age.total_seconds()
+
+                user_ids = stale_user_ids(options['batch_size'])
+                if not user_ids:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                futures = {pool.submit(refresh_user_analytics, user_id): user_id for user_id in user_ids}
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                        refreshed += 1
+                    except Exception as e:
+                        self.stderr.write(f"Analytics refresh failed for user {futures[future]}: {e}")
+                if options['once'] and len(user_ids) < options['batch_size']:
+                    break
+
+        self.stdout.write(self.style.SUCCESS(f"Refreshed analytics for {refreshed} users"))
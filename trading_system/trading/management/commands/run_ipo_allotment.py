@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from trading.ipo import draw_ipo, verify_draw
+from trading.models import IPO
+
+
+class Command(BaseCommand):
+    help = 'Allot a closed IPO by seeded lottery and settle every application (re-run to resume)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ipo_id', type=int)
+        parser.add_argument('--seed', type=int, default=None, help='Lottery seed (default: drawn at random and stored)')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Applications per transaction (default IPO_CHUNK_SIZE)')
+        parser.add_argument('--verify', action='store_true', help='Only repeat a finished draw and check its digests')
+
+    def handle(self, *args, **options):
+        try:
+            ipo = IPO.objects.select_related('stock').get(pk=options['ipo_id'])
+        except IPO.DoesNotExist:
+            raise CommandError(f"No IPO {options['ipo_id']}")
+
+        if options['verify']:
+            if ipo.seed is None:
+                raise CommandError('The IPO has not been drawn')
+            if not verify_draw(ipo):
+                raise CommandError('The draw does not reproduce the published digests')
+            self.stdout.write(self.style.SUCCESS(f"Draw verified: seed {ipo.seed}, result {ipo.result_digest}"))
+            return
+
+        try:
+            result = draw_ipo(ipo, seed=options['seed'], chunk_size=options['chunk_size'], log=self.stdout.write)
+        except ValueError as e:
+            raise CommandError(str(e))
+        ipo.refresh_from_db()
+        self.stdout.write(self.style.SUCCESS(
+            f"{ipo.stock.symbol}: {result['allottees']:,} of {result['applicants']:,} applicants allotted "
+            f"(seed {ipo.seed}, result {ipo.result_digest})"
+        ))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from trading.auction import advance_session
+
+
+class Command(BaseCommand):
+    help = 'Move the trading day through pre-open, the opening auction, continuous trading and close (run a single instance)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds between schedule checks')
+        parser.add_argument('--workers', type=int, default=None, help='Auction processes (default: AUCTION_WORKERS)')
+        parser.add_argument('--once', action='store_true', help='Apply the current phase once and exit')
+
+    def handle(self, *args, **options):
+        while True:
+            for session, action, result in advance_session(workers=options['workers']):
+                if result:
+                    self.stdout.write(
+                        f"{session.trading_date}: opening auction uncrossed {result['symbols']} symbols, "
+                        f"{result['fills']} fills, {result['rejected']} orders rejected"
+                    )
+                else:
+                    self.stdout.write(f"{session.trading_date}: {action}")
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
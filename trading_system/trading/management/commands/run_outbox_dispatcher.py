@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from trading.outbox import Dispatcher, get_consumers
+from trading_system.db_routers import data_aliases
+
+
+class Command(BaseCommand):
+    help = 'Deliver outbox trade events to OUTBOX_CONSUMERS in batches (run a single instance)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Events read per consumer per pass')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when every consumer is caught up')
+        parser.add_argument('--prune-interval', type=int, default=3600, help='Seconds between deletes of fully delivered events')
+        parser.add_argument('--once', action='store_true', help='Deliver everything pending and exit')
+
+    def handle(self, *args, **options):
+        consumers = get_consumers()
+        if not consumers:
+            self.stdout.write('No OUTBOX_CONSUMERS configured')
+            return
+        # One log per database holding trades (each user shard, or the primary)
+        dispatchers = [Dispatcher(consumers, options['batch_size'], using=alias) for alias in data_aliases()]
+        next_prune = 0.0
+        delivered = 0
+
+        while True:
+            if time.monotonic() >= next_prune:
+                pruned = sum(dispatcher.prune(settings.OUTBOX_RETENTION_SECONDS) for dispatcher in dispatchers)
+                if pruned:
+                    self.stdout.write(f"Pruned {pruned} delivered events")
+                next_prune = time.monotonic() + options['prune_interval']
+
+            count = sum(dispatcher.dispatch_once() for dispatcher in dispatchers)
+            delivered += count
+            if not count:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Delivered {delivered} events"))
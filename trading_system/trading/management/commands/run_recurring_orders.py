@@ -0,0 +1,23 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from trading.auction import market_phase
+from trading.recurring import run_recurring_orders
+
+
+class Command(BaseCommand):
+    help = "Execute the day's due recurring (SIP) orders in bulk; run once a day during continuous trading"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=datetime.date.fromisoformat, default=None,
+                            help='Run plans due on or before this date (default: today in MARKET_TIME_ZONE)')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Plans per transaction (default SIP_CHUNK_SIZE)')
+        parser.add_argument('--force', action='store_true', help='Run even when the market is not in continuous trading')
+
+    def handle(self, *args, **options):
+        phase = market_phase()
+        if phase != 'CONTINUOUS' and not options['force']:
+            raise CommandError(f"The market is {phase.lower().replace('_', '-')}; use --force to run anyway")
+        totals = run_recurring_orders(options['date'], options['chunk_size'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f"{totals['executed']} plans executed, {totals['skipped']} skipped"))
@@ -0,0 +1,98 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from trading.alerts import PriceAlertEngine
+from trading.models import Stock
+from trading.simulator import MarketSimulator, write_prices
+
+# Largest number of market steps generated in one NumPy call
+MAX_BLOCK_STEPS = 4096
+
+
+class Command(BaseCommand):
+    help = 'Evolve all stock prices with a correlated GBM simulator and write them back in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rate', type=float, default=1.0, help='Market steps per second (each step ticks every symbol)')
+        parser.add_argument('--duration', type=float, default=60.0, help='Seconds to run, 0 to run until interrupted')
+        parser.add_argument('--flush-interval', type=float, default=1.0, help='Seconds between bulk price writes')
+        parser.add_argument('--volatility', type=float, default=0.25, help='Annualised volatility')
+        parser.add_argument('--drift', type=float, default=0.0, help='Annualised drift')
+        parser.add_argument('--correlation', type=float, default=0.5, help='Share of variance from the sector factor')
+        parser.add_argument('--circuit-limit', type=float, default=0.10, help='Daily band around previous close')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--benchmark', action='store_true', help='Run as fast as possible without writing prices')
+        parser.add_argument('--no-alerts', action='store_true', help='Skip price alert evaluation')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['correlation'] < 1:
+            raise CommandError('--correlation must be in [0, 1)')
+        simulator, stocks = MarketSimulator.from_stocks(
+            Stock.objects.order_by('id'),
+            volatility=options['volatility'],
+            drift=options['drift'],
+            sector_correlation=options['correlation'],
+            circuit_limit=options['circuit_limit'],
+            seed=options['seed'],
+        )
+        if not stocks:
+            raise CommandError('No stocks to simulate')
+
+        if options['benchmark']:
+            self.benchmark(simulator, options['duration'] or 10.0)
+            return
+
+        alerts = None if options['no_alerts'] else PriceAlertEngine.from_database()
+        fired = 0
+
+        def flush():
+            nonlocal fired
+            changed = write_prices(stocks, simulator.prices)
+            if alerts is not None:
+                for stock in changed:
+                    alerts.on_price(stock.id, stock.current_price)
+                fired += alerts.flush()
+                alerts.sync()
+            return len(changed)
+
+        rate = options['rate']
+        duration = options['duration']
+        flush_interval = options['flush_interval']
+        start = time.monotonic()
+        next_flush = start + flush_interval
+        steps_done = 0
+        writes = 0
+        try:
+            while True:
+                now = time.monotonic()
+                elapsed = now - start
+                if duration and elapsed >= duration:
+                    break
+                due = int(rate * elapsed) - steps_done
+                while due > 0:
+                    block = min(due, MAX_BLOCK_STEPS)
+                    simulator.advance(block)
+                    steps_done += block
+                    due -= block
+                if now >= next_flush:
+                    writes += flush()
+                    next_flush += flush_interval
+                time.sleep(min(1.0 / rate if rate > 0 else flush_interval, max(next_flush - time.monotonic(), 0)))
+        except KeyboardInterrupt:
+            pass
+        writes += flush()
+        self.stdout.write(self.style.SUCCESS(
+            f"Simulated {simulator.ticks} ticks over {len(stocks)} symbols; "
+            f"wrote {writes} price updates, fired {fired} alerts"
+        ))
+
+    def benchmark(self, simulator, seconds):
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            simulator.advance(MAX_BLOCK_STEPS)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"{simulator.ticks} ticks in {elapsed:.2f}s = {simulator.ticks / elapsed * 60:,.0f} ticks/minute "
+            f"({simulator.n_symbols} symbols)"
+        )
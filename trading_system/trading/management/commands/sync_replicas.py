@@ -0,0 +1,39 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from trading_system.db_routers import PRIMARY_DB
+
+
+class Command(BaseCommand):
+    help = 'Refresh SQLite read replicas with an online copy of the primary database'
+
+    def handle(self, *args, **options):
+        primary = connections[PRIMARY_DB]
+        if primary.vendor != 'sqlite':
+            raise CommandError('sync_replicas only supports SQLite databases')
+        if not settings.DATABASE_REPLICAS:
+            self.stdout.write('No replicas configured (set TMS_REPLICA_DBS).')
+            return
+
+        # Copy through Django's own connection, so the copy is of the database
+        # Django uses (the test database under tests), not a path in settings
+        primary.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            # Drop any open handle so readers reopen the refreshed file
+            connections[alias].close()
+            path = str(connections[alias].settings_dict['NAME'])
+            started = time.time()
+            target = sqlite3.connect(path)
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            # The copy holds every write committed before it started; replica
+            # routing reads this back to know whose writes it has
+            os.utime(path, (started, started))
+            self.stdout.write(self.style.SUCCESS(f"Synced {alias}"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from trading.sharding import sync_reference_data
+from trading_system.db_routers import shard_aliases
+
+
+class Command(BaseCommand):
+    help = 'Refresh the Stock copy on every user shard from the primary database'
+
+    def handle(self, *args, **options):
+        if not shard_aliases():
+            self.stdout.write('No shards configured (set TMS_SHARD_DBS).')
+            return
+        copied = sync_reference_data()
+        self.stdout.write(self.style.SUCCESS(f"Copied {copied} stocks to {', '.join(shard_aliases())}"))
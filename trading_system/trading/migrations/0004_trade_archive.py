@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0003_trade_history_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TradeArchiveFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_name', models.CharField(max_length=255, unique=True)),
+                ('cutoff', models.DateTimeField()),
+                ('trade_count', models.IntegerField()),
+                ('first_trade_id', models.BigIntegerField()),
+                ('last_trade_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TradeArchiveSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trade_count', models.IntegerField(default=0)),
+                ('buy_count', models.IntegerField(default=0)),
+                ('sell_count', models.IntegerField(default=0)),
+                ('buy_quantity', models.BigIntegerField(default=0)),
+                ('sell_quantity', models.BigIntegerField(default=0)),
+                ('buy_value', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('sell_value', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('first_trade_at', models.DateTimeField(null=True)),
+                ('last_trade_at', models.DateTimeField(null=True)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='trading.stock')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'stock')},
+            },
+        ),
+    ]
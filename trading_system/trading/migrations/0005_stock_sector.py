@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0004_trade_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='sector',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+    ]
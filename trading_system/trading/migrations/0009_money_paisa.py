@@ -0,0 +1,21 @@
+from django.db import migrations
+
+from trading.money import paisa_conversion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0008_analytics_snapshot'),
+    ]
+
+    operations = [
+        *paisa_conversion('trading', 'stock', 'current_price', 10),
+        *paisa_conversion('trading', 'stock', 'previous_close', 10, default=0),
+        *paisa_conversion('trading', 'trade', 'price', 10),
+        *paisa_conversion('trading', 'portfolio', 'average_buy_price', 10),
+        *paisa_conversion('trading', 'pricealert', 'threshold', 10),
+        *paisa_conversion('trading', 'pricealert', 'triggered_price', 10, null=True, blank=True),
+        *paisa_conversion('trading', 'tradearchivesummary', 'buy_value', 16, default=0),
+        *paisa_conversion('trading', 'tradearchivesummary', 'sell_value', 16, default=0),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:25
+
+import django.db.models.deletion
+import trading.money
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0009_money_paisa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorporateAction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action_type', models.CharField(choices=[('BONUS', 'Bonus shares'), ('SPLIT', 'Stock split'), ('RIGHT', 'Rights issue')], max_length=5)),
+                ('ratio_new', models.PositiveIntegerField()),
+                ('ratio_held', models.PositiveIntegerField()),
+                ('rights_price', trading.money.MoneyField(blank=True, null=True)),
+                ('ex_date', models.DateField()),
+                ('factor_numerator', models.BigIntegerField(blank=True, null=True)),
+                ('factor_denominator', models.BigIntegerField(blank=True, null=True)),
+                ('holders_adjusted', models.IntegerField(default=0)),
+                ('applied_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='trading.stock')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['stock', 'ex_date'], name='corpaction_stock_exdate_idx')],
+            },
+        ),
+    ]
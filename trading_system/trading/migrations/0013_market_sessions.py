@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:50
+
+import django.db.models.deletion
+import trading.money
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0012_unconstrained_user_relations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trading_date', models.DateField(unique=True)),
+                ('phase', models.CharField(choices=[('PRE_OPEN', 'Pre-open'), ('CONTINUOUS', 'Continuous'), ('CLOSED', 'Closed')], max_length=10)),
+                ('auction_at', models.DateTimeField(blank=True, null=True)),
+                ('auction_symbols', models.IntegerField(default=0)),
+                ('auction_fills', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AuctionOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trade_type', models.CharField(choices=[('BUY', 'Buy'), ('SELL', 'Sell')], max_length=4)),
+                ('quantity', models.IntegerField()),
+                ('limit_price', trading.money.MoneyField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('FILLED', 'Filled'), ('PARTIAL', 'Partially filled'), ('UNFILLED', 'Unfilled'), ('REJECTED', 'Rejected')], default='QUEUED', max_length=8)),
+                ('filled_quantity', models.IntegerField(default=0)),
+                ('fill_price', trading.money.MoneyField(blank=True, null=True)),
+                ('reason', models.CharField(blank=True, default='', max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='trading.stock')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='trading.marketsession')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['session', 'status', 'stock'], name='auction_session_status_idx')],
+            },
+        ),
+    ]
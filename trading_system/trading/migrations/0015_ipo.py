@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:07
+
+import django.db.models.deletion
+import trading.money
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0014_recurring_orders'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IPO',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('issue_price', trading.money.MoneyField()),
+                ('total_units', models.IntegerField()),
+                ('lot_units', models.IntegerField(default=10)),
+                ('max_units', models.IntegerField(default=1000)),
+                ('opens_at', models.DateTimeField()),
+                ('closes_at', models.DateTimeField()),
+                ('status', models.CharField(choices=[('OPEN', 'Open'), ('ALLOTTING', 'Allotting'), ('ALLOTTED', 'Allotted')], default='OPEN', max_length=9)),
+                ('seed', models.BigIntegerField(blank=True, null=True)),
+                ('input_digest', models.CharField(blank=True, default='', max_length=64)),
+                ('result_digest', models.CharField(blank=True, default='', max_length=64)),
+                ('applicants', models.IntegerField(default=0)),
+                ('allottees', models.IntegerField(default=0)),
+                ('allotted_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='trading.stock')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IPOApplication',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('units', models.IntegerField()),
+                ('amount_held', trading.money.MoneyField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('ALLOTTED', 'Allotted'), ('NOT_ALLOTTED', 'Not allotted')], default='PENDING', max_length=12)),
+                ('units_allotted', models.IntegerField(default=0)),
+                ('refund', trading.money.MoneyField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('ipo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='applications', to='trading.ipo')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ipo', 'status', 'id'], name='ipoapp_ipo_status_idx')],
+                'unique_together': {('ipo', 'user')},
+            },
+        ),
+    ]
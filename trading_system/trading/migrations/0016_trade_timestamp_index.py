@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0015_ipo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['timestamp'], name='trade_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0016_trade_timestamp_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['user', 'stock', 'timestamp', 'id'], name='trade_user_stock_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0018_corporate_action_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tradearchivefile',
+            name='database',
+            field=models.CharField(default='default', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='tradearchivefile',
+            name='purged',
+            field=models.BooleanField(default=True),
+        ),
+    ]
@@ -1,11 +1,13 @@
 from django.db import models
 from django.contrib.auth.models import User
+from .money import MoneyField
 
 class Stock(models.Model):
     symbol = models.CharField(max_length=10, unique=True)
     name = models.CharField(max_length=100)
-    current_price = models.DecimalField(max_digits=10, decimal_places=2)
-    previous_close = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    sector = models.CharField(max_length=50, blank=True, default='')
+    current_price = MoneyField()
+    previous_close = MoneyField(default=0)
     last_updated = models.DateTimeField(auto_now=True)
     
     def __str__(self):
@@ -18,7 +20,7 @@ class Stock(models.Model):
     @property
     def todays_change_percentage(self):
         if self.previous_close > 0:
-            return (self.todays_change / self.previous_close) * 100
+            return self.todays_change / self.previous_close * 100
         return 0
 
 class Trade(models.Model):
@@ -27,13 +29,25 @@ class Trade(models.Model):
         ('SELL', 'Sell'),
     ]
     
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    stock = models.ForeignKey(Stock, on_delete=models.CASCADE)
+    # No database-level constraints: with sharding, trades live on a different
+    # database from users and stocks (CASCADE is still applied by the ORM)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, db_constraint=False)
     trade_type = models.CharField(max_length=4, choices=TRADE_TYPES)
     quantity = models.IntegerField()
-    price = models.DecimalField(max_digits=10, decimal_places=2)
+    price = MoneyField()
     timestamp = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            # Keyset pagination over a user's history walks (timestamp, id)
+            models.Index(fields=['user', '-timestamp', '-id'], name='trade_user_ts_id_idx'),
+            # The admin's date filters are timestamp ranges across all users
+            models.Index(fields=['timestamp'], name='trade_ts_idx'),
+            # Capital-gains statements stream each user's trades stock by stock
+            models.Index(fields=['user', 'stock', 'timestamp', 'id'], name='trade_user_stock_ts_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.user.username} - {self.trade_type} {self.quantity} {self.stock.symbol}"
     
@@ -42,10 +56,11 @@ class Trade(models.Model):
         return self.quantity * self.price
 
 class Portfolio(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    stock = models.ForeignKey(Stock, on_delete=models.CASCADE)
+    # Unconstrained like Trade's, so holdings can sit on a user shard
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, db_constraint=False)
     quantity = models.IntegerField(default=0)
-    average_buy_price = models.DecimalField(max_digits=10, decimal_places=2)
+    average_buy_price = MoneyField()
     last_updated = models.DateTimeField(auto_now=True)
     
     class Meta:
@@ -69,7 +84,7 @@ class Portfolio(models.Model):
     @property
     def profit_loss_percentage(self):
         if self.invested_value > 0:
-            return (self.profit_loss / self.invested_value) * 100
+            return self.profit_loss / self.invested_value * 100
         return 0
     
     @property
@@ -79,4 +94,296 @@ class Portfolio(models.Model):
     @property
     def todays_change_percentage(self):
         return self.stock.todays_change_percentage
-        
\ No newline at end of file
+
+class PriceAlert(models.Model):
+    DIRECTIONS = [
+        ('ABOVE', 'Crosses above'),
+        ('BELOW', 'Crosses below'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE)
+    direction = models.CharField(max_length=5, choices=DIRECTIONS)
+    threshold = MoneyField()
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    triggered_at = models.DateTimeField(null=True, blank=True)
+    triggered_price = MoneyField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active', 'id'], name='pricealert_active_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.stock.symbol} {self.direction.lower()} {self.threshold}"
+
+class Watchlist(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE)
+    added_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['user', 'stock']
+    
+    def __str__(self):
+        return f"{self.user.username} watching {self.stock.symbol}"
+        
+
+# A bonus issue, split or rights issue. Holdings before ex_date are scaled by
+# factor_numerator / factor_denominator; historical prices by the inverse.
+# Rights issues are recorded with a factor of 1.
+class CorporateAction(models.Model):
+    ACTION_TYPES = [
+        ('BONUS', 'Bonus shares'),
+        ('SPLIT', 'Stock split'),
+        ('RIGHT', 'Rights issue'),
+    ]
+    
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE)
+    action_type = models.CharField(max_length=5, choices=ACTION_TYPES)
+    # ratio_new shares (bonus, replacement or rights entitlement) per ratio_held shares held
+    ratio_new = models.PositiveIntegerField()
+    ratio_held = models.PositiveIntegerField()
+    rights_price = MoneyField(null=True, blank=True)
+    ex_date = models.DateField()
+    factor_numerator = models.BigIntegerField(null=True, blank=True)
+    factor_denominator = models.BigIntegerField(null=True, blank=True)
+    holders_adjusted = models.IntegerField(default=0)
+    applied_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['stock', 'ex_date'], name='corpaction_stock_exdate_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.stock.symbol} {self.get_action_type_display().lower()} {self.ratio_new}:{self.ratio_held} ex {self.ex_date}"
+
+# Written beside the holdings an action scaled, in the same transaction, so a
+# database is never scaled twice for one action (corporate_actions.py)
+class CorporateActionShard(models.Model):
+    action_id = models.BigIntegerField(unique=True)
+    holders_adjusted = models.IntegerField(default=0)
+    applied_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Action {self.action_id}: {self.holders_adjusted} holdings"
+
+# Lifetime totals for trades that have been moved out of the hot Trade table
+class TradeArchiveSummary(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE)
+    trade_count = models.IntegerField(default=0)
+    buy_count = models.IntegerField(default=0)
+    sell_count = models.IntegerField(default=0)
+    buy_quantity = models.BigIntegerField(default=0)
+    sell_quantity = models.BigIntegerField(default=0)
+    buy_value = MoneyField(default=0)
+    sell_value = MoneyField(default=0)
+    first_trade_at = models.DateTimeField(null=True)
+    last_trade_at = models.DateTimeField(null=True)
+    
+    class Meta:
+        unique_together = ['user', 'stock']
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.stock.symbol}: {self.trade_count} archived"
+
+# One compressed columnar file holding a chunk of archived trades. Recorded
+# (with the summaries) before its trades are deleted from database; purged
+# once they are, so an interrupted run knows which deletes to finish.
+class TradeArchiveFile(models.Model):
+    file_name = models.CharField(max_length=255, unique=True)
+    database = models.CharField(max_length=100, default='default')
+    cutoff = models.DateTimeField()
+    trade_count = models.IntegerField()
+    first_trade_id = models.BigIntegerField()
+    last_trade_id = models.BigIntegerField()
+    purged = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.file_name} ({self.trade_count} trades)"
+
+# Precomputed analytics page figures, refreshed in the background
+class AnalyticsSnapshot(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    data = models.JSONField(null=True, blank=True)
+    # When the stored data was computed from, and when a refresh was last asked for
+    computed_at = models.DateTimeField(null=True, blank=True)
+    requested_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    
+    def __str__(self):
+        return f"{self.user.username}'s analytics"
+    
+    @property
+    def is_stale(self):
+        if self.computed_at is None:
+            return True
+        return self.requested_at is not None and self.requested_at > self.computed_at
+
+# Trade events written in the same transaction as the trade, delivered to
+# consumers by the outbox dispatcher. id is the log offset.
+class OutboxEvent(models.Model):
+    topic = models.CharField(max_length=50)
+    idempotency_key = models.CharField(max_length=100, unique=True)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.topic} #{self.id}"
+
+# How far each outbox consumer has got: every event with id <= last_event_id
+# has been handled
+class OutboxOffset(models.Model):
+    consumer = models.CharField(max_length=100, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.consumer} @ {self.last_event_id}"
+
+# One trading day. The market session scheduler moves it from pre-open
+# (orders queue for the opening auction) to continuous trading to closed.
+class MarketSession(models.Model):
+    PHASES = [
+        ('PRE_OPEN', 'Pre-open'),
+        ('CONTINUOUS', 'Continuous'),
+        ('CLOSED', 'Closed'),
+    ]
+    
+    trading_date = models.DateField(unique=True)
+    phase = models.CharField(max_length=10, choices=PHASES)
+    # When the opening auction uncrossed, and how it went
+    auction_at = models.DateTimeField(null=True, blank=True)
+    auction_symbols = models.IntegerField(default=0)
+    auction_fills = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.trading_date} {self.get_phase_display()}"
+
+# An order placed during pre-open, filled by the opening call auction. A
+# null limit_price is a market order.
+class AuctionOrder(models.Model):
+    STATUSES = [
+        ('QUEUED', 'Queued'),
+        ('FILLED', 'Filled'),
+        ('PARTIAL', 'Partially filled'),
+        ('UNFILLED', 'Unfilled'),
+        ('REJECTED', 'Rejected'),
+    ]
+    
+    session = models.ForeignKey(MarketSession, on_delete=models.CASCADE, related_name='orders')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE)
+    trade_type = models.CharField(max_length=4, choices=Trade.TRADE_TYPES)
+    quantity = models.IntegerField()
+    limit_price = MoneyField(null=True, blank=True)
+    status = models.CharField(max_length=8, choices=STATUSES, default='QUEUED')
+    filled_quantity = models.IntegerField(default=0)
+    fill_price = MoneyField(null=True, blank=True)
+    reason = models.CharField(max_length=100, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['session', 'status', 'stock'], name='auction_session_status_idx'),
+        ]
+    
+    def __str__(self):
+        limit = f"@{self.limit_price}" if self.limit_price is not None else "at market"
+        return f"{self.user.username} {self.trade_type} {self.quantity} {self.stock.symbol} {limit}"
+
+# A systematic investment plan: buy a fixed amount's worth of a stock every
+# period. run_recurring_orders executes the day's due plans in bulk.
+class RecurringOrder(models.Model):
+    FREQUENCIES = [
+        ('DAILY', 'Daily'),
+        ('WEEKLY', 'Weekly'),
+        ('MONTHLY', 'Monthly'),
+    ]
+    STATUSES = [
+        ('EXECUTED', 'Executed'),
+        ('NO_FUNDS', 'Insufficient balance'),
+        ('TOO_SMALL', 'Amount below one share'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE)
+    # Whole shares this amount buys at the day's price
+    amount = MoneyField()
+    frequency = models.CharField(max_length=7, choices=FREQUENCIES, default='MONTHLY')
+    next_run_date = models.DateField()
+    is_active = models.BooleanField(default=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    last_status = models.CharField(max_length=9, choices=STATUSES, blank=True, default='')
+    last_quantity = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active', 'next_run_date', 'stock'], name='recurring_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} {self.get_frequency_display().lower()} Rs.{self.amount} of {self.stock.symbol}"
+
+# A primary issue. Applications hold their amount from the applicant's
+# balance; once closed, trading.ipo.draw_ipo allots the units by a seeded
+# lottery and refunds the rest.
+class IPO(models.Model):
+    STATUSES = [
+        ('OPEN', 'Open'),
+        ('ALLOTTING', 'Allotting'),
+        ('ALLOTTED', 'Allotted'),
+    ]
+    
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE)
+    issue_price = MoneyField()
+    total_units = models.IntegerField()
+    # Units per lottery lot, and the most one applicant may apply for
+    lot_units = models.IntegerField(default=10)
+    max_units = models.IntegerField(default=1000)
+    opens_at = models.DateTimeField()
+    closes_at = models.DateTimeField()
+    status = models.CharField(max_length=9, choices=STATUSES, default='OPEN')
+    # The draw: anyone can repeat it from the seed and the applications
+    seed = models.BigIntegerField(null=True, blank=True)
+    input_digest = models.CharField(max_length=64, blank=True, default='')
+    result_digest = models.CharField(max_length=64, blank=True, default='')
+    applicants = models.IntegerField(default=0)
+    allottees = models.IntegerField(default=0)
+    allotted_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.stock.symbol} IPO ({self.total_units} units @ Rs.{self.issue_price})"
+
+class IPOApplication(models.Model):
+    STATUSES = [
+        ('PENDING', 'Pending'),
+        ('ALLOTTED', 'Allotted'),
+        ('NOT_ALLOTTED', 'Not allotted'),
+    ]
+    
+    ipo = models.ForeignKey(IPO, on_delete=models.CASCADE, related_name='applications')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    units = models.IntegerField()
+    amount_held = MoneyField()
+    status = models.CharField(max_length=12, choices=STATUSES, default='PENDING')
+    units_allotted = models.IntegerField(default=0)
+    refund = MoneyField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        # One application per person, as NEPSE allows
+        unique_together = ['ipo', 'user']
+        indexes = [
+            models.Index(fields=['ipo', 'status', 'id'], name='ipoapp_ipo_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.ipo.stock.symbol} IPO: {self.units} units"
@@ -0,0 +1,285 @@
+"""
+Fixed-point money as integer paisa (1 rupee = 100 paisa).
+
+Money wraps a single int, so addition, subtraction and multiplication by a
+share quantity are plain integer operations with no rounding at all.
+Rounding only happens when a value enters from outside (Decimal, float,
+string) or is divided, and always goes to the nearest paisa with ties to
+even - the same rule DecimalField applies when saving.
+
+Plain numbers mixed with Money are read as rupees, so `balance >= 0` and
+`Money.parse('1250.50')` behave as they did with Decimal amounts.
+
+MoneyField stores the paisa in a BIGINT column and always hands Money back,
+including for values assigned in Python.
+"""
+from decimal import Decimal, ROUND_HALF_EVEN
+
+from django import forms
+from django.db import migrations, models
+from django.db.models.query_utils import DeferredAttribute
+from django.utils.functional import cached_property
+
+ONE = Decimal('1')
+
+
+def div_round(numerator, denominator):
+    """Integer division rounded to nearest, ties to even"""
+    if denominator < 0:
+        numerator, denominator = -numerator, -denominator
+    quotient, remainder = divmod(numerator, denominator)
+    twice = 2 * remainder
+    if twice > denominator or (twice == denominator and quotient % 2):
+        quotient += 1
+    return quotient
+
+
+class Money:
+    __slots__ = ('paisa',)
+
+    def __init__(self, paisa=0):
+        if not isinstance(paisa, int):
+            raise TypeError(f"Money takes integer paisa, got {type(paisa).__name__}; use Money.parse()")
+        self.paisa = paisa
+
+    @classmethod
+    def from_decimal(cls, value):
+        if isinstance(value, float):
+            value = Decimal(repr(value))
+        elif not isinstance(value, Decimal):
+            value = Decimal(value)
+        return cls(int((value * 100).quantize(ONE, rounding=ROUND_HALF_EVEN)))
+
+    @classmethod
+    def parse(cls, value):
+        """Money from Money, rupee numbers or strings; None stays None"""
+        if value is None or isinstance(value, Money):
+            return value
+        if isinstance(value, int) and not isinstance(value, bool):
+            return cls(value * 100)
+        if isinstance(value, (Decimal, float, str)):
+            return cls.from_decimal(value.strip() if isinstance(value, str) else value)
+        raise TypeError(f"Cannot convert {type(value).__name__} to Money")
+
+    def to_decimal(self):
+        return Decimal(self.paisa).scaleb(-2)
+
+    def deconstruct(self):
+        return ('trading.money.Money', (self.paisa,), {})
+
+    def __str__(self):
+        sign = '-' if self.paisa < 0 else ''
+        rupees, paisa = divmod(abs(self.paisa), 100)
+        return f"{sign}{rupees}.{paisa:02d}"
+
+    def __repr__(self):
+        return f"Money('{self}')"
+
+    def __format__(self, spec):
+        return format(self.to_decimal(), spec) if spec else str(self)
+
+    def __float__(self):
+        return self.paisa / 100
+
+    def __bool__(self):
+        return self.paisa != 0
+
+    def __hash__(self):
+        # Equal to Decimal amounts, so hash like them too
+        return hash(self.to_decimal())
+
+    def __reduce__(self):
+        return (Money, (self.paisa,))
+
+    # Arithmetic. Money (+|-) Money and Money * int are the hot path, so they
+    # are checked first and build the result without going through __init__.
+
+    @staticmethod
+    def _paisa(other):
+        if isinstance(other, Money):
+            return other.paisa
+        if isinstance(other, (int, Decimal, float)) and not isinstance(other, bool):
+            return Money.parse(other).paisa
+        return None
+
+    def __add__(self, other):
+        result = _new(Money)
+        if type(other) is Money:
+            result.paisa = self.paisa + other.paisa
+            return result
+        paisa = self._paisa(other)
+        if paisa is None:
+            return NotImplemented
+        result.paisa = self.paisa + paisa
+        return result
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        result = _new(Money)
+        if type(other) is Money:
+            result.paisa = self.paisa - other.paisa
+            return result
+        paisa = self._paisa(other)
+        if paisa is None:
+            return NotImplemented
+        result.paisa = self.paisa - paisa
+        return result
+
+    def __rsub__(self, other):
+        paisa = self._paisa(other)
+        return NotImplemented if paisa is None else Money(paisa - self.paisa)
+
+    def __mul__(self, other):
+        if type(other) is int:
+            result = _new(Money)
+            result.paisa = self.paisa * other
+            return result
+        if isinstance(other, int) and not isinstance(other, bool):
+            return Money(self.paisa * other)
+        if isinstance(other, (Decimal, float)):
+            return Money.from_decimal(self.to_decimal() * Decimal(repr(other) if isinstance(other, float) else other))
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if type(other) is int and other > 0:
+            # Share-count averages: round half to even without leaving integers
+            quotient, remainder = divmod(self.paisa, other)
+            twice = remainder + remainder
+            if twice > other or (twice == other and quotient & 1):
+                quotient += 1
+            result = _new(Money)
+            result.paisa = quotient
+            return result
+        if isinstance(other, Money):
+            # Ratio of two amounts, e.g. a return percentage
+            return self.paisa / other.paisa
+        if isinstance(other, int) and not isinstance(other, bool):
+            return Money(div_round(self.paisa, other))
+        if isinstance(other, (Decimal, float)):
+            return Money.from_decimal(self.to_decimal() / Decimal(repr(other) if isinstance(other, float) else other))
+        return NotImplemented
+
+    def __rtruediv__(self, other):
+        # A plain number is an amount in rupees, so this is a ratio, as for Money / Money
+        paisa = self._paisa(other)
+        return NotImplemented if paisa is None else paisa / self.paisa
+
+    def __neg__(self):
+        return Money(-self.paisa)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return Money(abs(self.paisa))
+
+    # Comparisons
+
+    def __eq__(self, other):
+        paisa = self._paisa(other)
+        return NotImplemented if paisa is None else self.paisa == paisa
+
+    def __lt__(self, other):
+        paisa = self._paisa(other)
+        return NotImplemented if paisa is None else self.paisa < paisa
+
+    def __le__(self, other):
+        paisa = self._paisa(other)
+        return NotImplemented if paisa is None else self.paisa <= paisa
+
+    def __gt__(self, other):
+        paisa = self._paisa(other)
+        return NotImplemented if paisa is None else self.paisa > paisa
+
+    def __ge__(self, other):
+        paisa = self._paisa(other)
+        return NotImplemented if paisa is None else self.paisa >= paisa
+
+
+_new = object.__new__
+
+
+def total_value(pairs):
+    """Sum of quantity * price over (quantity, Money) pairs, added up as plain ints"""
+    return Money(sum([quantity * price.paisa for quantity, price in pairs]))
+
+
+ZERO = Money(0)
+
+
+class MoneyDescriptor(DeferredAttribute):
+    """Coerce anything assigned to a MoneyField attribute into Money"""
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = self.field.to_python(value)
+
+
+class MoneyField(models.BigIntegerField):
+    descriptor_class = MoneyDescriptor
+
+    @cached_property
+    def validators(self):
+        # IntegerField's range validators compare against raw integers, not rupees
+        return [*self.default_validators, *self._validators]
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else Money(int(value))
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Money) or hasattr(value, 'resolve_expression'):
+            return value
+        try:
+            return Money.parse(value)
+        except (TypeError, ArithmeticError):
+            raise models.ValidationError(f"'{value}' is not a valid amount", code='invalid')
+
+    def get_prep_value(self, value):
+        if value is None or hasattr(value, 'resolve_expression'):
+            return value
+        return Money.parse(value).paisa
+
+    def value_to_string(self, obj):
+        value = self.value_from_object(obj)
+        return '' if value is None else str(value)
+
+    def formfield(self, **kwargs):
+        # Forms and the admin edit rupees with two decimal places
+        return models.Field.formfield(self, **{
+            'form_class': forms.DecimalField,
+            'decimal_places': 2,
+            **kwargs,
+        })
+
+
+def paisa_conversion(app_label, model_name, field_name, max_digits, **options):
+    """
+    Migration operations turning a decimal rupee column into a MoneyField of
+    the same name: add a paisa column, fill it with one UPDATE, swap it in.
+    The decimal column is made nullable first so the swap can be reversed.
+    """
+    temp_name = f"{field_name}_paisa"
+
+    def copy_column(apps, schema_editor, source, target, expression):
+        qn = schema_editor.quote_name
+        table = apps.get_model(app_label, model_name)._meta.db_table
+        schema_editor.execute(
+            f"UPDATE {qn(table)} SET {qn(target)} = {expression.format(qn(source))} "
+            f"WHERE {qn(source)} IS NOT NULL"
+        )
+
+    def forwards(apps, schema_editor):
+        copy_column(apps, schema_editor, field_name, temp_name, "CAST(ROUND({} * 100) AS BIGINT)")
+
+    def backwards(apps, schema_editor):
+        copy_column(apps, schema_editor, temp_name, field_name, "{} / 100.0")
+
+    return [
+        migrations.AddField(model_name, temp_name, MoneyField(null=True)),
+        migrations.AlterField(model_name, field_name, models.DecimalField(max_digits=max_digits, decimal_places=2, null=True)),
+        migrations.RunPython(forwards, backwards),
+        migrations.RemoveField(model_name, field_name),
+        migrations.RenameField(model_name, temp_name, field_name),
+        migrations.AlterField(model_name, field_name, MoneyField(**options)),
+    ]
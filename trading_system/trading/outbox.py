@@ -0,0 +1,142 @@
+"""
+Transactional outbox for trade events.
+
+execute_trade_logic writes one OutboxEvent inside the trade's transaction,
+so the order path costs a single INSERT however many consumers there are,
+and an event exists if and only if its trade committed.
+
+The dispatcher (`python manage.py run_outbox_dispatcher`, one instance)
+reads the log in id order and hands batches to the consumers named in
+OUTBOX_CONSUMERS. Each consumer has its own offset, advanced only after it
+returns, so delivery is at-least-once: a consumer that raises, or a
+dispatcher that dies mid-batch, sees the same events again. Consumers dedupe
+on event.idempotency_key when a repeat would matter.
+
+A consumer is any callable taking a list of OutboxEvent. A consumer added
+later starts from the oldest event still retained. With user shards each
+shard keeps its own log and offsets, and event ids are only ordered within
+a shard.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboxEvent, OutboxOffset
+from trading_system.db_routers import PRIMARY_DB
+
+logger = logging.getLogger(__name__)
+
+TRADE_EXECUTED = 'trade.executed'
+
+
+def trade_event(trade, profit_loss):
+    """Unsaved trade.executed event for a saved trade"""
+    # Trade ids are per database, so keys from a shard carry its alias
+    key = f"trade:{trade.id}" if trade._state.db == PRIMARY_DB else f"trade:{trade._state.db}:{trade.id}"
+    return OutboxEvent(
+        topic=TRADE_EXECUTED,
+        idempotency_key=key,
+        payload={
+            'trade_id': trade.id,
+            'user_id': trade.user_id,
+            'stock_id': trade.stock_id,
+            'symbol': trade.stock.symbol,
+            'trade_type': trade.trade_type,
+            'quantity': trade.quantity,
+            'price': str(trade.price),
+            'profit_loss': str(profit_loss),
+            'timestamp': trade.timestamp.isoformat(),
+        },
+    )
+
+def publish_trade(trade, profit_loss):
+    """Record a trade.executed event; call inside the trade's transaction"""
+    event = trade_event(trade, profit_loss)
+    event.save(using=trade._state.db)
+    return event
+
+def publish_trades(trades_with_pl, using):
+    """Bulk publish_trade for [(trade, profit_loss), ...] saved on one database"""
+    return OutboxEvent.objects.using(using).bulk_create(
+        [trade_event(trade, profit_loss) for trade, profit_loss in trades_with_pl]
+    )
+
+
+def log_trade_events(events):
+    """Audit consumer: one log line per executed trade"""
+    for event in events:
+        payload = event.payload
+        logger.info(
+            "%s %s %s x%s @ %s (user %s, %s)", event.idempotency_key, payload['trade_type'],
+            payload['symbol'], payload['quantity'], payload['price'], payload['user_id'], payload['timestamp'],
+        )
+
+
+def get_consumers():
+    """{name: callable} from OUTBOX_CONSUMERS"""
+    return {name: import_string(path) for name, path in getattr(settings, 'OUTBOX_CONSUMERS', {}).items()}
+
+
+class Dispatcher:
+    """Delivers one database's outbox; with user shards there is one per shard"""
+    def __init__(self, consumers=None, batch_size=500, using=PRIMARY_DB):
+        self.consumers = get_consumers() if consumers is None else consumers
+        self.batch_size = batch_size
+        self.using = using
+        for name in self.consumers:
+            OutboxOffset.objects.using(using).get_or_create(consumer=name)
+
+    def offsets(self):
+        return dict(
+            OutboxOffset.objects.using(self.using).filter(consumer__in=list(self.consumers))
+            .values_list('consumer', 'last_event_id')
+        )
+
+    def fetch(self, after):
+        events = OutboxEvent.objects.using(self.using).filter(id__gt=after).order_by('id')
+        settle = getattr(settings, 'OUTBOX_SETTLE_SECONDS', 0)
+        if settle:
+            # Leave recent ids alone until transactions that took lower ids have committed
+            events = events.filter(created_at__lte=timezone.now() - timedelta(seconds=settle))
+        return list(events[:self.batch_size])
+
+    def dispatch_once(self):
+        """Deliver one batch to every consumer that is behind; returns events delivered"""
+        offsets = self.offsets()
+        if not offsets:
+            return 0
+        # One read per distinct offset: consumers in step share a batch, and a
+        # consumer stuck on a failing event does not hold the others back
+        batches = {}
+        delivered = 0
+        for name, handler in self.consumers.items():
+            offset = offsets[name]
+            if offset not in batches:
+                batches[offset] = self.fetch(offset)
+            batch = batches[offset]
+            if not batch:
+                continue
+            try:
+                handler(batch)
+            except Exception:
+                logger.exception("Outbox consumer %s failed on events %s..%s", name, batch[0].id, batch[-1].id)
+                continue
+            # Guarded so two dispatchers racing cannot move an offset backwards
+            OutboxOffset.objects.using(self.using).filter(consumer=name, last_event_id=offset).update(
+                last_event_id=batch[-1].id, updated_at=timezone.now()
+            )
+            delivered += len(batch)
+        return delivered
+
+    def prune(self, retention_seconds):
+        """Delete events every consumer has handled and that are past retention"""
+        offsets = self.offsets()
+        if not offsets:
+            return 0
+        floor = min(offsets.values())
+        cutoff = timezone.now() - timedelta(seconds=retention_seconds)
+        deleted, _ = OutboxEvent.objects.using(self.using).filter(id__lte=floor, created_at__lt=cutoff).delete()
+        return deleted
@@ -0,0 +1,101 @@
+"""
+Token-bucket admission control for the order path.
+
+Buckets are tracked with GCRA (generic cell rate algorithm): each
+(user, endpoint) key stores a single "theoretical arrival time", so a check
+is one read and one write. The shared store is the Django cache; a local
+in-process store stands in for tests or single-process deployments.
+"""
+import math
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+
+LOCAL_STORE_MAX_KEYS = 100_000
+
+
+class LocalBucketStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tats = {}
+
+    def check(self, key, interval, burst, now):
+        with self._lock:
+            if len(self._tats) > LOCAL_STORE_MAX_KEYS:
+                # Buckets whose TAT has passed are full again, so they can go
+                self._tats = {k: tat for k, tat in self._tats.items() if tat > now}
+            allowed, retry_after, new_tat = gcra(self._tats.get(key), interval, burst, now)
+            if allowed:
+                self._tats[key] = new_tat
+            return allowed, retry_after
+
+    def clear(self):
+        with self._lock:
+            self._tats.clear()
+
+
+class CacheBucketStore:
+    """
+    Shared buckets in a Django cache. The get/set pair is not atomic, so
+    concurrent requests for the same key can slightly over-admit; that is the
+    price of a single round trip on the happy path.
+    """
+    def __init__(self, alias):
+        self.alias = alias
+
+    def check(self, key, interval, burst, now):
+        cache = caches[self.alias]
+        allowed, retry_after, new_tat = gcra(cache.get(key), interval, burst, now)
+        if allowed:
+            cache.set(key, new_tat, timeout=math.ceil(new_tat - now) + 1)
+        return allowed, retry_after
+
+    def clear(self):
+        caches[self.alias].clear()
+
+
+def gcra(tat, interval, burst, now):
+    """Return (allowed, retry_after_seconds, new_tat) for one request"""
+    tat = max(tat or now, now)
+    new_tat = tat + interval
+    allow_at = new_tat - burst * interval
+    if allow_at > now:
+        return False, allow_at - now, tat
+    return True, 0.0, new_tat
+
+
+_local_store = LocalBucketStore()
+
+def get_bucket_store():
+    if settings.RATE_LIMIT_BACKEND == 'local':
+        return _local_store
+    return CacheBucketStore(settings.RATE_LIMIT_CACHE_ALIAS)
+
+def check_rate_limit(user_id, endpoint):
+    """Consume one token for (user, endpoint); returns (allowed, retry_after_seconds)"""
+    rate, burst = settings.ORDER_RATE_LIMITS[endpoint]
+    key = f"ratelimit:{endpoint}:{user_id}"
+    return get_bucket_store().check(key, 1.0 / rate, burst, time.time())
+
+def rate_limited(endpoint, methods=('POST',)):
+    """Reject order submissions over the endpoint's budget with 429 and Retry-After"""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods and request.user.is_authenticated:
+                allowed, retry_after = check_rate_limit(request.user.id, endpoint)
+                if not allowed:
+                    message = 'Too many orders, please slow down'
+                    if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.content_type == 'application/json':
+                        response = JsonResponse({'success': False, 'error': message}, status=429)
+                    else:
+                        response = HttpResponse(message, status=429, content_type='text/plain')
+                    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+                    return response
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
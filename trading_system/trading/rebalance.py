@@ -0,0 +1,186 @@
+"""
+Target-weight rebalancing.
+
+A target maps sectors or symbols to percentages of the user's equity (cash
+plus holdings at current prices); whatever is left over stays in cash.
+Within a sector target the user's current holdings keep their relative
+sizes, so only the sector total moves; a sector the user holds nothing in is
+split equally over its listed stocks. Holdings the targets do not cover are
+sold.
+
+plan_rebalance() works out the orders with numpy over the user's positions:
+
+  - positions within REBALANCE_TOLERANCE of their target are left alone,
+  - orders are rounded towards zero to whole REBALANCE_LOT_SIZE lots, except
+    that a position with no target is sold outright,
+  - if the buys cost more than cash plus sale proceeds they are scaled down
+    together and rounded down to lots again.
+
+execute_rebalance() takes the previewed orders and settles them in one
+transaction on the user's shard at current prices, sells first, or not at
+all.
+"""
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import Profile
+from .analytics import request_analytics_refresh
+from .models import Stock, Portfolio
+from .money import Money, total_value
+from .settlement import Fill, load_accounts, settle_fills
+from trading_system.db_routers import user_shard
+
+CASH = 'cash'
+
+
+class RebalanceError(ValueError):
+    pass
+
+
+def parse_targets(targets):
+    """{key: weight fraction} from {sector, symbol or 'cash': percent}; cash is implied"""
+    weights = {}
+    for key, percent in targets.items():
+        try:
+            percent = Decimal(str(percent))
+        except InvalidOperation:
+            raise RebalanceError(f"Invalid weight for {key}: {percent}")
+        if not percent.is_finite():
+            raise RebalanceError(f"Invalid weight for {key}: {percent}")
+        if not 0 <= percent <= 100:
+            raise RebalanceError(f"Weight for {key} must be between 0 and 100")
+        if key.strip().lower() != CASH:
+            weights[key.strip()] = percent / 100
+    if sum(weights.values()) > 1:
+        raise RebalanceError('Weights add up to more than 100%')
+    return weights
+
+def plan_rebalance(user, targets, tolerance=None, lot_size=None):
+    """Orders that bring the user's holdings to the target weights, with a before/after summary"""
+    tolerance = settings.REBALANCE_TOLERANCE if tolerance is None else tolerance
+    lot_size = lot_size or settings.REBALANCE_LOT_SIZE
+    weights = parse_targets(targets)
+
+    with user_shard(user.pk):
+        holdings = {item.stock_id: item.quantity for item in Portfolio.objects.filter(user=user)}
+        cash = Profile.objects.get(user=user).balance
+
+    symbol_targets = {}
+    sector_targets = {}
+    sectors = {sector.lower(): sector for sector in Stock.objects.exclude(sector='').values_list('sector', flat=True).distinct()}
+    named = {stock.symbol: stock for stock in Stock.objects.filter(symbol__in=[key.upper() for key in weights])}
+    for key, weight in weights.items():
+        if key.upper() in named:
+            symbol_targets[named[key.upper()].id] = weight
+        elif key.lower() in sectors:
+            sector_targets[sectors[key.lower()]] = weight
+        else:
+            raise RebalanceError(f"{key} is neither a symbol nor a sector")
+
+    held_sectors = set(Stock.objects.filter(id__in=holdings).values_list('sector', flat=True))
+    new_sectors = [sector for sector in sector_targets if sector not in held_sectors]
+    # Constituents of sectors the user holds nothing in, for the equal split
+    constituents = Stock.objects.filter(sector__in=new_sectors, current_price__gt=0).values_list('id', flat=True)
+    stocks = Stock.objects.in_bulk(set(holdings) | set(symbol_targets) | set(constituents))
+    ids = sorted(stocks)
+    prices = np.array([stocks[i].current_price.paisa for i in ids], dtype=np.int64)
+    quantities = np.array([holdings.get(i, 0) for i in ids], dtype=np.int64)
+    values = prices * quantities
+    equity = cash.paisa + int(values.sum())
+
+    # Target weight per stock: named symbols directly, sector weight spread by current value (equally if none is held)
+    target = np.zeros(len(ids))
+    in_sector = {}
+    for n, stock_id in enumerate(ids):
+        if stock_id in symbol_targets:
+            target[n] = float(symbol_targets[stock_id])
+        elif stocks[stock_id].sector in sector_targets:
+            in_sector.setdefault(stocks[stock_id].sector, []).append(n)
+    for sector, members in in_sector.items():
+        members = np.array(members)
+        held = values[members].sum()
+        target[members] = float(sector_targets[sector]) * (values[members] / held if held else 1 / len(members))
+
+    target_values = target * equity
+    drift = np.abs(target_values - values) / equity if equity else np.zeros(len(ids))
+    delta = np.floor(target_values / prices).astype(np.int64) - quantities
+    delta = np.sign(delta) * (np.abs(delta) // lot_size * lot_size)
+    delta[drift < tolerance] = 0
+    # Untargeted positions are closed entirely, odd lots included
+    delta[target == 0] = -quantities[target == 0]
+
+    buys = np.clip(delta, 0, None)
+    available = cash.paisa + int((np.clip(-delta, 0, None) * prices).sum())
+    spend = int((buys * prices).sum())
+    if spend > available:
+        buys = (np.floor(buys * (available / spend)).astype(np.int64) // lot_size) * lot_size
+        delta = np.where(delta > 0, buys, delta)
+
+    orders = [
+        {
+            'stock_id': ids[n], 'symbol': stocks[ids[n]].symbol,
+            'side': 'BUY' if delta[n] > 0 else 'SELL', 'quantity': int(abs(delta[n])),
+            'price': Money(int(prices[n])),
+        }
+        for n in np.flatnonzero(delta)
+    ]
+    orders.sort(key=lambda order: (order['side'] != 'SELL', order['symbol']))
+    after = quantities + delta
+    cash_after = equity - int((after * prices).sum())
+    return {
+        'orders': orders,
+        'equity': Money(equity),
+        'cash_before': cash,
+        'cash_after': Money(cash_after),
+        'weights_before': {stocks[i].symbol: float(v / equity) for i, v in zip(ids, values) if v} if equity else {},
+        'weights_after': {stocks[i].symbol: float(q * p / equity) for i, q, p in zip(ids, after, prices) if q} if equity else {},
+    }
+
+def execute_rebalance(user, orders):
+    """
+    Settle previewed orders ([{'stock_id', 'side', 'quantity'}]) at current
+    prices in one transaction. Raises RebalanceError, writing nothing, when
+    the holdings or cash no longer cover them. Returns the trades written.
+    """
+    fills = []
+    for order in orders:
+        try:
+            stock_id, side, quantity = int(order['stock_id']), order['side'], int(order['quantity'])
+        except (KeyError, TypeError, ValueError):
+            raise RebalanceError('Each order needs stock_id, side and quantity')
+        if side not in ('BUY', 'SELL') or quantity <= 0:
+            raise RebalanceError('Orders must be a BUY or SELL of at least one share')
+        fills.append((side != 'SELL', stock_id, side, quantity))
+    if not fills:
+        return []
+    # Sells first, so their proceeds pay for the buys
+    fills.sort()
+
+    with user_shard(user.pk) as db, transaction.atomic(using=db):
+        stocks = Stock.objects.in_bulk({stock_id for _, stock_id, _, _ in fills})
+        if len(stocks) != len({stock_id for _, stock_id, _, _ in fills}):
+            raise RebalanceError('Unknown stock in orders')
+        accounts, holdings = load_accounts([user.pk], list(stocks))
+        held = {stock_id: item.quantity for (_, stock_id), item in holdings.items()}
+        for buy, stock_id, side, quantity in fills:
+            if not buy:
+                held[stock_id] = held.get(stock_id, 0) - quantity
+                if held[stock_id] < 0:
+                    raise RebalanceError(f"Insufficient shares of {stocks[stock_id].symbol}")
+        proceeds = total_value((quantity, stocks[stock_id].current_price) for buy, stock_id, _, quantity in fills if not buy)
+        cost = total_value((quantity, stocks[stock_id].current_price) for buy, stock_id, _, quantity in fills if buy)
+        if accounts[user.pk].balance + proceeds < cost:
+            raise RebalanceError(f"Insufficient balance! Need Rs.{cost:.2f}, have Rs.{accounts[user.pk].balance + proceeds:.2f}")
+
+        trades = settle_fills(
+            [Fill(user.pk, stock_id, side, quantity, stocks[stock_id].current_price.paisa)
+             for _, stock_id, side, quantity in fills],
+            stocks, accounts, holdings, timezone.now(),
+        )
+        # Bulk inserts send no post_save, so ask for the analytics refresh here
+        transaction.on_commit(lambda: request_analytics_refresh(user.pk), using=db)
+    return [trade for trade, _ in trades.get(db, [])]
@@ -0,0 +1,264 @@
+"""
+Ledger reconciliation: rebuild holdings and cash from the Trade history and
+repair Portfolio and Profile rows that have drifted from it.
+
+Users are cut into contiguous id ranges on each database holding trades, and
+each range is one task for a worker process. A worker streams the range's
+trades with .iterator() in (user, timestamp, id) order, so memory is bounded
+by the positions and stored rows of one range, and replays them the way the
+order paths write them:
+
+  - a buy re-averages the cost basis, rounded half to even to the paisa,
+  - a sell reduces the quantity (the row goes when it reaches zero),
+  - a bonus or split applied while the position was open scales it as
+    apply_corporate_action does (fractional shares dropped),
+  - cash is the opening Profile balance less buys plus sells, less IPO
+    application amounts still on hold.
+
+Archived trades are folded into cash from their TradeArchiveSummary rows.
+Their order is no longer known, so positions with archived history are
+reported as skipped rather than repaired.
+
+A repair records the value found and the value expected. Applying one only
+changes a row still holding the value found, so a plan can be written,
+reviewed and applied later while trading continues: rows that moved in the
+meantime are left alone and show up again on the next run.
+"""
+import json
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections, transaction
+
+from accounts.models import Profile
+from .analytics import init_worker
+from .models import Trade, Portfolio, CorporateAction, TradeArchiveSummary, IPOApplication
+from .money import Money, div_round
+from trading_system.db_routers import PRIMARY_DB, data_aliases
+
+TRADE_ITERATOR_CHUNK_SIZE = 5000
+
+
+def opening_balance():
+    """Balance a Profile starts with"""
+    return Profile._meta.get_field('balance').get_default().paisa
+
+def applied_actions():
+    """{stock_id: [(applied_at, numerator, denominator)]} for applied bonuses and splits, oldest first"""
+    actions = defaultdict(list)
+    for stock_id, applied_at, num, den in (
+        CorporateAction.objects.filter(applied_at__isnull=False).exclude(action_type='RIGHT')
+        .order_by('applied_at', 'id').values_list('stock_id', 'applied_at', 'factor_numerator', 'factor_denominator')
+    ):
+        actions[stock_id].append((applied_at, num, den))
+    return dict(actions)
+
+def user_ranges(alias, users_per_range):
+    """Contiguous (first, last) user id ranges on a database, the last one open-ended"""
+    bounds = []
+    for i, user_id in enumerate(
+        Profile.objects.using(alias).order_by('user_id').values_list('user_id', flat=True).iterator()
+    ):
+        if i % users_per_range == users_per_range - 1:
+            bounds.append(user_id)
+    ranges = []
+    first = 0
+    for last in bounds:
+        ranges.append((first, last))
+        first = last + 1
+    ranges.append((first, None))
+    return ranges
+
+
+class Position:
+    __slots__ = ('quantity', 'average', 'actions')
+
+    def __init__(self, actions):
+        self.quantity = 0
+        self.average = 0
+        # Pending (applied_at, num, den) for this stock, soonest last
+        self.actions = list(reversed(actions))
+
+    def catch_up(self, until=None):
+        """Apply the corporate actions that took effect before until (all when None)"""
+        while self.actions and (until is None or self.actions[-1][0] <= until):
+            _, num, den = self.actions.pop()
+            if self.quantity > 0:
+                quantity = self.quantity * num // den
+                if quantity:
+                    self.average = (self.average * self.quantity * 2 + quantity) // (quantity * 2)
+                self.quantity = quantity
+
+    def buy(self, quantity, price):
+        self.average = div_round(self.quantity * self.average + quantity * price, self.quantity + quantity)
+        self.quantity += quantity
+
+    def sell(self, quantity):
+        self.quantity -= quantity
+
+
+def replay(rows, actions, opening):
+    """
+    Fold one range's trade rows, ordered by user then time, into
+    {user_id: (cash paisa, {stock_id: Position})}.
+    """
+    ledgers = {}
+    for user_id, stock_id, trade_type, quantity, price, timestamp in rows:
+        ledger = ledgers.get(user_id)
+        if ledger is None:
+            ledger = ledgers[user_id] = [opening, {}]
+        position = ledger[1].get(stock_id)
+        if position is None:
+            position = ledger[1][stock_id] = Position(actions.get(stock_id, ()))
+        position.catch_up(timestamp)
+        if trade_type == 'BUY':
+            position.buy(quantity, price.paisa)
+            ledger[0] -= quantity * price.paisa
+        else:
+            position.sell(quantity)
+            ledger[0] += quantity * price.paisa
+    for ledger in ledgers.values():
+        for position in ledger[1].values():
+            position.catch_up()
+    return ledgers
+
+def in_range(queryset, first, last):
+    queryset = queryset.filter(user_id__gte=first)
+    return queryset if last is None else queryset.filter(user_id__lte=last)
+
+def reconcile_range(alias, first, last, actions, opening):
+    """Worker: repairs for the users with ids first..last on alias, plus counts"""
+    trades = in_range(Trade.objects.using(alias), first, last).order_by('user_id', 'timestamp', 'id').values_list(
+        'user_id', 'stock_id', 'trade_type', 'quantity', 'price', 'timestamp'
+    )
+    ledgers = replay(trades.iterator(chunk_size=TRADE_ITERATOR_CHUNK_SIZE), actions, opening)
+
+    # Archived flows count towards cash; their positions cannot be replayed
+    archived_cash = defaultdict(int)
+    archived_positions = set()
+    for user_id, stock_id, buy_value, sell_value in in_range(
+        TradeArchiveSummary.objects.using(PRIMARY_DB), first, last
+    ).values_list('user_id', 'stock_id', 'buy_value', 'sell_value'):
+        archived_cash[user_id] += sell_value.paisa - buy_value.paisa
+        archived_positions.add((user_id, stock_id))
+
+    # IPO applications hold their amount until the draw settles them
+    held = defaultdict(int)
+    for user_id, amount in in_range(
+        IPOApplication.objects.using(PRIMARY_DB).filter(status='PENDING'), first, last
+    ).values_list('user_id', 'amount_held'):
+        held[user_id] += amount.paisa
+
+    repairs = []
+    stats = {'users': 0, 'positions': 0, 'skipped': 0}
+    for user_id, balance in in_range(Profile.objects.using(alias), first, last).values_list('user_id', 'balance'):
+        stats['users'] += 1
+        cash = ledgers[user_id][0] if user_id in ledgers else opening
+        cash += archived_cash.get(user_id, 0) - held.get(user_id, 0)
+        if cash != balance.paisa:
+            repairs.append({'alias': alias, 'model': 'profile', 'user_id': user_id, 'stock_id': None,
+                            'found': {'balance': balance.paisa}, 'expected': {'balance': cash}})
+
+    stored = {
+        (user_id, stock_id): (quantity, average.paisa)
+        for user_id, stock_id, quantity, average in in_range(Portfolio.objects.using(alias), first, last)
+        .values_list('user_id', 'stock_id', 'quantity', 'average_buy_price')
+    }
+    expected = {}
+    for user_id, (_, positions) in ledgers.items():
+        for stock_id, position in positions.items():
+            if position.quantity:
+                expected[user_id, stock_id] = (position.quantity, position.average)
+    for key in sorted(stored.keys() | expected.keys()):
+        stats['positions'] += 1
+        if key in archived_positions:
+            stats['skipped'] += 1
+            continue
+        found, want = stored.get(key), expected.get(key)
+        if found == want:
+            continue
+        if want is not None and want[0] < 0:
+            # More sold than bought: nothing sensible to write, so only report it
+            stats['skipped'] += 1
+            repairs.append({'alias': alias, 'model': 'portfolio', 'user_id': key[0], 'stock_id': key[1],
+                            'found': None if found is None else {'quantity': found[0], 'average_buy_price': found[1]},
+                            'expected': None, 'oversold': -want[0]})
+            continue
+        repairs.append({
+            'alias': alias, 'model': 'portfolio', 'user_id': key[0], 'stock_id': key[1],
+            'found': None if found is None else {'quantity': found[0], 'average_buy_price': found[1]},
+            'expected': None if want is None else {'quantity': want[0], 'average_buy_price': want[1]},
+        })
+    return repairs, stats
+
+
+def apply_repairs(repairs):
+    """
+    Write repairs, each only onto a row still holding the value it found.
+    Returns the number applied.
+    """
+    by_alias = defaultdict(list)
+    for repair in repairs:
+        if 'oversold' not in repair:
+            by_alias[repair['alias']].append(repair)
+    applied = 0
+    for alias, alias_repairs in by_alias.items():
+        with transaction.atomic(using=alias):
+            for repair in alias_repairs:
+                found, expected = repair['found'], repair['expected']
+                if repair['model'] == 'profile':
+                    applied += Profile.objects.using(alias).filter(
+                        user_id=repair['user_id'], balance=Money(found['balance'])
+                    ).update(balance=Money(expected['balance']))
+                    continue
+                rows = Portfolio.objects.using(alias).filter(user_id=repair['user_id'], stock_id=repair['stock_id'])
+                if found is None:
+                    if not rows.exists():
+                        Portfolio(user_id=repair['user_id'], stock_id=repair['stock_id'], quantity=expected['quantity'],
+                                  average_buy_price=Money(expected['average_buy_price'])).save(using=alias)
+                        applied += 1
+                    continue
+                rows = rows.filter(quantity=found['quantity'], average_buy_price=Money(found['average_buy_price']))
+                if expected is None:
+                    applied += bool(rows.delete()[0])
+                else:
+                    applied += rows.update(quantity=expected['quantity'],
+                                           average_buy_price=Money(expected['average_buy_price']))
+    return applied
+
+def reconcile(users_per_range=2000, workers=1, apply=False, aliases=None, on_range=None):
+    """
+    Reconcile every user on aliases (default: every database holding trades).
+    Yields each range's repairs as its worker finishes, applying them first
+    when apply is set; on_range(alias, first, last, stats) is told about each.
+    """
+    actions = applied_actions()
+    opening = opening_balance()
+    tasks = [
+        (alias, first, last)
+        for alias in aliases or data_aliases()
+        for first, last in user_ranges(alias, users_per_range)
+    ]
+
+    def finish(task, result):
+        repairs, stats = result
+        if apply:
+            stats['applied'] = apply_repairs(repairs)
+        if on_range:
+            on_range(*task, stats)
+        return repairs
+
+    if workers <= 1:
+        for task in tasks:
+            yield finish(task, reconcile_range(*task, actions, opening))
+        return
+
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        futures = [pool.submit(reconcile_range, *task, actions, opening) for task in tasks]
+        for task, future in zip(tasks, futures):
+            yield finish(task, future.result())
+
+def read_plan(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
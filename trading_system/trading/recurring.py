@@ -0,0 +1,104 @@
+"""
+Recurring (SIP) orders, executed as one daily batch.
+
+Due plans are read in (stock, id) order in chunks of SIP_CHUNK_SIZE, so a
+chunk touches few symbols and each symbol's price is read once. Each chunk
+commits in one transaction per database:
+
+  - the chunk users' balances and holdings are loaded with one query per
+    table and database (settlement.load_accounts),
+  - each plan buys the whole shares its amount covers at the current price,
+    and is skipped when its user cannot pay after their earlier plans,
+  - balances, holdings (updated or inserted), trades and outbox events are
+    written with bulk statements (settlement.settle_fills),
+  - the plans are stamped and moved to their next date with one bulk UPDATE.
+
+A skipped instalment is not retried; the plan waits for its next date. Every
+plan leaves the due set in its chunk's transaction, so a run that stops part
+way can simply be started again.
+"""
+import calendar
+import datetime
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .analytics import request_analytics_refreshes
+from .auction import market_now
+from .models import Stock, RecurringOrder
+from .settlement import Fill, load_accounts, settle_fills
+from trading_system.db_routers import PRIMARY_DB, data_aliases
+
+
+def add_months(day, months):
+    """day moved by whole months, clamped to the end of shorter months"""
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+def next_run_after(run_date, frequency, today):
+    """The plan's first date after today; missed periods are not caught up"""
+    periods = 0
+    next_date = run_date
+    while next_date <= today:
+        periods += 1
+        if frequency == 'MONTHLY':
+            next_date = add_months(run_date, periods)
+        else:
+            next_date = run_date + datetime.timedelta(days=periods * (7 if frequency == 'WEEKLY' else 1))
+    return next_date
+
+def execute_plans(plans, today, now):
+    """Run one chunk of due plans inside the caller's transactions; returns plans executed"""
+    stocks = Stock.objects.in_bulk({plan.stock_id for plan in plans})
+    accounts, holdings = load_accounts({plan.user_id for plan in plans}, list(stocks))
+    cash = {user_id: profile.balance.paisa for user_id, profile in accounts.items()}
+
+    fills = []
+    for plan in plans:
+        price = stocks[plan.stock_id].current_price.paisa
+        quantity = plan.amount.paisa // price if price > 0 else 0
+        if not quantity:
+            plan.last_status, plan.last_quantity = 'TOO_SMALL', 0
+        elif cash.get(plan.user_id, 0) < quantity * price:
+            plan.last_status, plan.last_quantity = 'NO_FUNDS', 0
+        else:
+            cash[plan.user_id] -= quantity * price
+            fills.append(Fill(plan.user_id, plan.stock_id, 'BUY', quantity, price))
+            plan.last_status, plan.last_quantity = 'EXECUTED', quantity
+        plan.last_run_at = now
+        plan.next_run_date = next_run_after(plan.next_run_date, plan.frequency, today)
+
+    settle_fills(fills, stocks, accounts, holdings, now)
+    RecurringOrder.objects.bulk_update(plans, ['next_run_date', 'last_run_at', 'last_status', 'last_quantity'])
+    # Bulk inserts send no post_save, so ask for the analytics refreshes once the chunk commits
+    user_ids = {fill.user_id for fill in fills}
+    transaction.on_commit(lambda: request_analytics_refreshes(user_ids), using=PRIMARY_DB)
+    return len(fills)
+
+def run_recurring_orders(today=None, chunk_size=None, log=None):
+    """Execute every plan due on or before today; returns {'executed', 'skipped'}"""
+    today = today or market_now().date()
+    chunk_size = chunk_size or settings.SIP_CHUNK_SIZE
+    totals = {'executed': 0, 'skipped': 0}
+    while True:
+        now = timezone.now()
+        with ExitStack() as stack:
+            stack.enter_context(transaction.atomic(using=PRIMARY_DB))
+            for alias in data_aliases():
+                if alias != PRIMARY_DB:
+                    stack.enter_context(transaction.atomic(using=alias))
+            plans = list(
+                RecurringOrder.objects.filter(is_active=True, next_run_date__lte=today)
+                .order_by('stock_id', 'id')[:chunk_size]
+            )
+            if not plans:
+                break
+            executed = execute_plans(plans, today, now)
+        totals['executed'] += executed
+        totals['skipped'] += len(plans) - executed
+        if log:
+            log(f"{len(plans)} plans: {executed} executed, {len(plans) - executed} skipped")
+    return totals
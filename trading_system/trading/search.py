@@ -0,0 +1,159 @@
+"""
+In-memory symbol/name search for stock autocomplete.
+
+Prefix lookups use sorted token lists and bisect; a trigram map catches
+misspellings and mid-word matches. The index is built lazily per process,
+kept current by Stock save/delete signals and fully rebuilt after
+STOCK_SEARCH_REBUILD_SECONDS to pick up changes made by other processes.
+"""
+import math
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from django.conf import settings
+
+from .models import Stock
+
+TOKEN_SPLIT = re.compile(r'[^a-z0-9]+')
+MIN_TRIGRAM_SCORE = 0.5
+
+
+def name_tokens(name):
+    return {token for token in TOKEN_SPLIT.split(name.lower()) if token}
+
+def trigrams(text):
+    padded = f"  {text.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class StockSearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._stocks = {}            # id -> (symbol, name)
+        self._symbol_keys = []       # sorted (symbol_lower, id)
+        self._name_keys = []         # sorted (name_token, symbol_lower, id)
+        self._trigrams = defaultdict(set)
+        self.built_at = None
+
+    def __len__(self):
+        return len(self._stocks)
+
+    def build(self, rows):
+        """Replace the index contents with (id, symbol, name) rows"""
+        stocks, symbol_keys, name_keys, grams = {}, [], [], defaultdict(set)
+        for stock_id, symbol, name in rows:
+            stocks[stock_id] = (symbol, name)
+            symbol_keys.append((symbol.lower(), stock_id))
+            name_keys.extend((token, symbol.lower(), stock_id) for token in name_tokens(name))
+            for gram in trigrams(f"{symbol} {name}"):
+                grams[gram].add(stock_id)
+        symbol_keys.sort()
+        name_keys.sort()
+        with self._lock:
+            self._stocks, self._symbol_keys, self._name_keys, self._trigrams = stocks, symbol_keys, name_keys, grams
+            self.built_at = time.monotonic()
+
+    def add(self, stock_id, symbol, name):
+        with self._lock:
+            if stock_id in self._stocks:
+                self.remove(stock_id)
+            self._stocks[stock_id] = (symbol, name)
+            insort(self._symbol_keys, (symbol.lower(), stock_id))
+            for token in name_tokens(name):
+                insort(self._name_keys, (token, symbol.lower(), stock_id))
+            for gram in trigrams(f"{symbol} {name}"):
+                self._trigrams[gram].add(stock_id)
+
+    def remove(self, stock_id):
+        with self._lock:
+            entry = self._stocks.pop(stock_id, None)
+            if entry is None:
+                return
+            symbol, name = entry
+            self._discard(self._symbol_keys, (symbol.lower(), stock_id))
+            for token in name_tokens(name):
+                self._discard(self._name_keys, (token, symbol.lower(), stock_id))
+            for gram in trigrams(f"{symbol} {name}"):
+                ids = self._trigrams.get(gram)
+                if ids is not None:
+                    ids.discard(stock_id)
+                    if not ids:
+                        del self._trigrams[gram]
+
+    @staticmethod
+    def _discard(keys, key):
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del keys[i]
+
+    @staticmethod
+    def _prefix_scan(keys, prefix, found, limit):
+        i = bisect_left(keys, (prefix,))
+        while i < len(keys) and len(found) < limit:
+            token, stock_id = keys[i][0], keys[i][-1]
+            if not token.startswith(prefix):
+                break
+            found.setdefault(stock_id, None)
+            i += 1
+
+    def search(self, query, limit=10):
+        """
+        Top matches for query: symbol prefixes first, then name-word prefixes,
+        then trigram similarity. Returns [(id, symbol, name), ...].
+        """
+        query = query.strip().lower()
+        if not query or limit <= 0:
+            return []
+        with self._lock:
+            # dict keeps insertion order, so it doubles as an ordered set
+            found = {}
+            self._prefix_scan(self._symbol_keys, query, found, limit)
+            self._prefix_scan(self._name_keys, query, found, limit)
+
+            if len(found) < limit and len(query) >= 3:
+                postings = sorted((self._trigrams.get(gram, set()) for gram in trigrams(query)), key=len)
+                needed = math.ceil(len(postings) * MIN_TRIGRAM_SCORE)
+                # A match must share at least one of the rarest len - needed + 1
+                # trigrams, so only those postings are scanned for candidates
+                candidates = set().union(*postings[:len(postings) - needed + 1]) - found.keys()
+                counts = {
+                    stock_id: sum(stock_id in ids for ids in postings)
+                    for stock_id in candidates
+                }
+                ranked = sorted(
+                    (stock_id for stock_id, count in counts.items() if count >= needed),
+                    key=lambda stock_id: (-counts[stock_id], self._stocks[stock_id][0]),
+                )
+                for stock_id in ranked[:limit - len(found)]:
+                    found[stock_id] = None
+
+            return [(stock_id, *self._stocks[stock_id]) for stock_id in found]
+
+
+_index = StockSearchIndex()
+_build_lock = threading.Lock()
+
+def get_stock_index():
+    """The process-wide index, (re)built from the database when missing or stale"""
+    max_age = getattr(settings, 'STOCK_SEARCH_REBUILD_SECONDS', 300)
+    if _index.built_at is None or time.monotonic() - _index.built_at > max_age:
+        with _build_lock:
+            if _index.built_at is None or time.monotonic() - _index.built_at > max_age:
+                _index.build(Stock.objects.values_list('id', 'symbol', 'name').iterator())
+    return _index
+
+def reset_stock_index():
+    """Drop the index so the next search rebuilds it"""
+    _index.build([])
+    _index.built_at = None
+
+def index_stock(stock):
+    if _index.built_at is not None:
+        _index.add(stock.id, stock.symbol, stock.name)
+
+def unindex_stock(stock_id):
+    if _index.built_at is not None:
+        _index.remove(stock_id)
@@ -0,0 +1,94 @@
+"""
+Bulk settlement for batch order paths (the opening auction, rebalancing,
+recurring orders).
+
+Instead of one execute_trade_logic call per order, a batch loads the
+balances and holdings it touches once, applies every fill in memory with the
+same arithmetic (half-even average cost, rows removed at zero), and writes
+each database's balances, holdings, trades and outbox events with a handful
+of bulk statements. Callers hold the transactions.
+"""
+from collections import defaultdict, namedtuple
+
+from django.utils import timezone
+
+from accounts.models import Profile
+from .models import Trade, Portfolio
+from .money import Money, ZERO
+from .outbox import publish_trades
+from trading_system.db_routers import on_shard, shard_for_user
+
+# price is in paisa
+Fill = namedtuple('Fill', 'user_id stock_id trade_type quantity price')
+
+
+def load_accounts(user_ids, stock_ids):
+    """({user_id: Profile}, {(user_id, stock_id): Portfolio}) from each user's home database"""
+    by_alias = defaultdict(list)
+    for user_id in user_ids:
+        by_alias[shard_for_user(user_id)].append(user_id)
+    accounts, holdings = {}, {}
+    for alias, ids in by_alias.items():
+        for profile in Profile.objects.using(alias).filter(user_id__in=ids):
+            accounts[profile.user_id] = profile
+        for item in Portfolio.objects.using(alias).filter(user_id__in=ids, stock_id__in=stock_ids):
+            holdings[item.user_id, item.stock_id] = item
+    return accounts, holdings
+
+def settle_fills(fills, stocks, accounts, holdings, now=None):
+    """
+    Apply fills, in order, to the loaded accounts and holdings, then write
+    them with the trades and their outbox events to each user's database.
+    Returns {alias: [(trade, profit_loss)]}.
+    """
+    now = now or timezone.now()
+    trades = defaultdict(list)
+    for fill in fills:
+        alias = shard_for_user(fill.user_id)
+        profile = accounts[fill.user_id]
+        price = Money(fill.price)
+        cost = price * fill.quantity
+        key = (fill.user_id, fill.stock_id)
+        item = holdings.get(key)
+        if fill.trade_type == 'BUY':
+            profile.balance -= cost
+            if item is None:
+                with on_shard(alias):
+                    item = holdings[key] = Portfolio(
+                        user_id=fill.user_id, stock=stocks[fill.stock_id], quantity=0, average_buy_price=ZERO
+                    )
+            item.average_buy_price = (item.quantity * item.average_buy_price + cost) / (item.quantity + fill.quantity)
+            item.quantity += fill.quantity
+            profit_loss = ZERO
+        else:
+            profit_loss = (price - item.average_buy_price) * fill.quantity
+            item.quantity -= fill.quantity
+            profile.balance += cost
+        # bulk_update skips auto_now, so stamp it explicitly
+        item.last_updated = now
+        profile.updated_at = now
+        with on_shard(alias):
+            trade = Trade(user_id=fill.user_id, stock=stocks[fill.stock_id],
+                          trade_type=fill.trade_type, quantity=fill.quantity, price=price)
+        trades[alias].append((trade, profit_loss))
+
+    user_ids = {fill.user_id for fill in fills}
+    keys = {(fill.user_id, fill.stock_id) for fill in fills}
+    for alias, alias_trades in trades.items():
+        with on_shard(alias):
+            Profile.objects.using(alias).bulk_update(
+                [accounts[user_id] for user_id in user_ids if shard_for_user(user_id) == alias],
+                ['balance', 'updated_at'], batch_size=500,
+            )
+            touched = [holdings[key] for key in keys if shard_for_user(key[0]) == alias]
+            Portfolio.objects.using(alias).filter(pk__in=[item.pk for item in touched if item.pk and not item.quantity]).delete()
+            Portfolio.objects.using(alias).bulk_update(
+                [item for item in touched if item.quantity and item.pk],
+                ['quantity', 'average_buy_price', 'last_updated'], batch_size=500,
+            )
+            Portfolio.objects.using(alias).bulk_create(
+                [item for item in touched if item.quantity and not item.pk], batch_size=500
+            )
+            Trade.objects.using(alias).bulk_create([trade for trade, _ in alias_trades], batch_size=500)
+            publish_trades(alias_trades, alias)
+    return dict(trades)
@@ -0,0 +1,125 @@
+"""
+Maintenance for user shards (see ShardRouter in trading_system.db_routers).
+
+  - sync_reference_data() refreshes the Stock copy on each shard, which only
+    serves joins from sharded rows (symbol, name, sector).
+  - rebalance() moves every user whose rows sit on a database other than
+    their home shard: after adding or removing a shard, or with
+    sources=['default'] when switching sharding on. Rendezvous hashing means
+    adding an Nth shard moves only about 1/N of the users.
+
+Rows are copied with plain INSERTs so timestamps survive the move; moved
+portfolio and trade rows get new ids on the target. Each user's rows are
+written to the target before they are deleted from the source, and a re-run
+first clears what an interrupted run left on the target, so a move can
+simply be repeated. Outbox events stay in their shard's log. Run rebalancing
+with order entry stopped: a user's home changes before their rows arrive.
+"""
+from collections import defaultdict
+
+from django.db import connections, transaction
+
+from accounts.models import Profile
+from .models import Stock, Trade, Portfolio
+from trading_system.db_routers import PRIMARY_DB, shard_aliases, shard_for_user
+
+# Per-user models moved between shards, parents first
+USER_MODELS = [Profile, Portfolio, Trade]
+COPY_BATCH_SIZE = 500
+
+
+def copy_rows(model, rows, using, include_pk=False):
+    """
+    INSERT rows (tuples of concrete field values in field order, primary key
+    first) into model's table on using, bypassing save() and its auto_now
+    hooks. Returns the number of rows written.
+    """
+    fields = list(model._meta.concrete_fields)
+    if not include_pk:
+        fields = [field for field in fields if not field.primary_key]
+        rows = (row[1:] for row in rows)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        quote(model._meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    written = 0
+    batch = []
+    with connection.cursor() as cursor:
+        for row in rows:
+            batch.append([field.get_db_prep_save(value, connection) for field, value in zip(fields, row)])
+            if len(batch) >= COPY_BATCH_SIZE:
+                cursor.executemany(sql, batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+            written += len(batch)
+    return written
+
+def field_values(model, queryset):
+    return queryset.values_list(*[field.attname for field in model._meta.concrete_fields])
+
+def sync_reference_data(aliases=None):
+    """Replace each shard's Stock copy with the primary's rows; returns rows copied per shard"""
+    rows = list(field_values(Stock, Stock.objects.using(PRIMARY_DB).order_by('id')))
+    for alias in shard_aliases() if aliases is None else aliases:
+        connection = connections[alias]
+        with transaction.atomic(using=alias):
+            # Raw DELETE: the ORM would cascade into the shard's trades and fire search-index signals
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {connection.ops.quote_name(Stock._meta.db_table)}")
+            copy_rows(Stock, rows, alias, include_pk=True)
+    return len(rows)
+
+def users_on(alias):
+    """Ids of users with any per-user rows on a database"""
+    user_ids = set()
+    for model in USER_MODELS:
+        user_ids.update(model.objects.using(alias).values_list('user_id', flat=True).distinct())
+    return user_ids
+
+def misplaced_users(alias):
+    """{target alias: [user ids]} for users on alias whose home shard is elsewhere"""
+    moves = defaultdict(list)
+    for user_id in sorted(users_on(alias)):
+        home = shard_for_user(user_id)
+        if home != alias:
+            moves[home].append(user_id)
+    return moves
+
+def move_users(user_ids, source, target):
+    """Move users' rows from source to target; returns rows moved"""
+    moved = 0
+    with transaction.atomic(using=target):
+        # Clear anything an interrupted earlier run copied
+        for model in reversed(USER_MODELS):
+            model.objects.using(target).filter(user_id__in=user_ids).delete()
+        for model in USER_MODELS:
+            rows = field_values(model, model.objects.using(source).filter(user_id__in=user_ids).order_by('pk'))
+            moved += copy_rows(model, rows.iterator(), target)
+    with transaction.atomic(using=source):
+        for model in reversed(USER_MODELS):
+            model.objects.using(source).filter(user_id__in=user_ids).delete()
+    return moved
+
+def rebalance(sources=None, batch_size=COPY_BATCH_SIZE, dry_run=False, log=None):
+    """
+    Move every misplaced user found on sources (default: the configured
+    shards). Returns {(source, target): users moved}.
+    """
+    if not shard_aliases():
+        raise ValueError('No DATABASE_SHARDS configured')
+    summary = defaultdict(int)
+    for source in sources or shard_aliases():
+        for target, user_ids in misplaced_users(source).items():
+            for i in range(0, len(user_ids), batch_size):
+                batch = user_ids[i:i + batch_size]
+                if not dry_run:
+                    rows = move_users(batch, source, target)
+                    if log:
+                        log(f"{source} -> {target}: {len(batch)} users, {rows} rows")
+                summary[source, target] += len(batch)
+    return dict(summary)
@@ -0,0 +1,19 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Stock, Trade
+from .search import index_stock, unindex_stock
+from .analytics import request_analytics_refresh
+
+@receiver(post_save, sender=Stock)
+def update_stock_search_index(sender, instance, **kwargs):
+    index_stock(instance)
+
+@receiver(post_delete, sender=Stock)
+def remove_from_stock_search_index(sender, instance, **kwargs):
+    unindex_stock(instance.id)
+
+@receiver(post_save, sender=Trade)
+def refresh_analytics_after_trade(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: request_analytics_refresh(instance.user_id))
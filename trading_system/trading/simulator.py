@@ -0,0 +1,94 @@
+"""
+Vectorized market price simulator.
+
+All listed symbols evolve together as geometric Brownian motion. Each tick's
+shock mixes a shared per-sector factor with an idiosyncratic term, so stocks in
+the same sector move together. Prices are held inside a circuit-breaker band
+around the previous close, like NEPSE's daily limit.
+"""
+
+
+import numpy as np
+from django.utils import timezone
+
+from .models import Stock
+from .money import Money
+
+# NEPSE halts a scrip at +/-10% of the previous close
+DEFAULT_CIRCUIT_LIMIT = 0.10
+# Trading minutes in a NEPSE session (11:00 - 15:00)
+SESSION_MINUTES = 240
+
+
+class MarketSimulator:
+    def __init__(self, prices, sectors, previous_close=None, volatility=0.25, drift=0.0,
+                 sector_correlation=0.5, circuit_limit=DEFAULT_CIRCUIT_LIMIT,
+                 ticks_per_day=SESSION_MINUTES * 60, seed=None):
+        """
+        prices/previous_close: per-symbol arrays; volatility and drift are annualised.
+        sector_correlation is the share of each shock's variance that comes from the sector factor.
+        """
+        self.prices = np.asarray(prices, dtype=np.float64)
+        reference = self.prices if previous_close is None else np.asarray(previous_close, dtype=np.float64)
+        # Symbols without a previous close use the opening price as their reference
+        reference = np.where(reference > 0, reference, self.prices)
+        self.lower = np.log(reference * (1 - circuit_limit))
+        self.upper = np.log(reference * (1 + circuit_limit))
+        self.log_prices = np.log(self.prices)
+
+        self.sector_names, self.sector_index = np.unique(np.asarray(sectors, dtype=object), return_inverse=True)
+        self.rng = np.random.default_rng(seed)
+
+        dt = 1.0 / (252 * ticks_per_day)
+        self.mu = (drift - 0.5 * volatility ** 2) * dt
+        self.sigma = volatility * np.sqrt(dt)
+        self.sector_weight = np.sqrt(sector_correlation)
+        self.idio_weight = np.sqrt(1 - sector_correlation)
+        self.ticks = 0
+
+    @property
+    def n_symbols(self):
+        return len(self.prices)
+
+    def shocks(self, n_steps):
+        """Correlated standard-normal shocks, shape (n_steps, n_symbols)"""
+        sector = self.rng.standard_normal((n_steps, len(self.sector_names)))
+        idio = self.rng.standard_normal((n_steps, self.n_symbols))
+        return self.sector_weight * sector[:, self.sector_index] + self.idio_weight * idio
+
+    def advance(self, n_steps=1):
+        """Move every symbol forward n_steps ticks and return the latest prices"""
+        returns = self.mu + self.sigma * self.shocks(n_steps)
+        log_prices = self.log_prices
+        # Clipping is path dependent, so apply it per step; each step is one vector op
+        for row in returns:
+            log_prices += row
+            np.clip(log_prices, self.lower, self.upper, out=log_prices)
+        np.exp(log_prices, out=self.prices)
+        self.ticks += n_steps * self.n_symbols
+        return self.prices
+
+    @classmethod
+    def from_stocks(cls, stocks, **kwargs):
+        stocks = list(stocks)
+        return cls(
+            prices=[float(s.current_price) for s in stocks],
+            sectors=[s.sector or 'Others' for s in stocks],
+            previous_close=[float(s.previous_close) for s in stocks],
+            **kwargs
+        ), stocks
+
+
+def write_prices(stocks, prices, batch_size=500):
+    """Persist simulated prices for stocks with one batched UPDATE per batch"""
+    now = timezone.now()
+    changed = []
+    for stock, price in zip(stocks, prices):
+        new_price = Money(int(round(price * 100)))
+        if new_price != stock.current_price:
+            stock.current_price = new_price
+            # bulk_update skips auto_now, so stamp it explicitly
+            stock.last_updated = now
+            changed.append(stock)
+    Stock.objects.bulk_update(changed, ['current_price', 'last_updated'], batch_size=batch_size)
+    return changed
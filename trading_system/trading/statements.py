@@ -0,0 +1,218 @@
+"""
+Annual capital-gains statements for every user, built from the Trade history.
+
+Users are cut into id ranges on each database holding trades, as for ledger
+reconciliation, and each range is one task for a worker process. A worker
+makes a single pass over its range's trades up to the end of the fiscal
+year, streamed with .iterator() in (user, stock, timestamp, id) order, which
+the trade_user_stock_ts_idx index returns without sorting. Only one user's
+positions and lines are in memory at a time:
+
+  - trades before the year build each position's cost basis, the way the
+    order paths do (average cost, rounded half to even to the paisa, with
+    bonuses and splits applied as they took effect),
+  - during the year, every trade is a statement line and each sell realizes
+    quantity x (price - average cost), the profit or loss booked at the time.
+
+Each range's statements go to one gzip-compressed JSON Lines file, one
+statement per line, written under a temporary name and renamed when
+complete. The ranges are fixed in a manifest on the first run, so a run
+that stops part way is resumed by running it again: finished range files
+are kept and only the missing ones are rebuilt. Delete the year's directory
+to start over.
+
+Users with no trades up to the year end get no statement. Positions with
+archived trades (TradeArchiveSummary), or selling more than their trades
+show bought, have no replayable cost basis, so their realized gains are
+marked incomplete.
+"""
+import datetime
+import gzip
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+
+from .analytics import init_worker
+from .auction import market_now, market_time_zone
+from .models import Stock, Trade, TradeArchiveSummary
+from .money import Money
+from .reconcile import Position, applied_actions, in_range, user_ranges, TRADE_ITERATOR_CHUNK_SIZE
+from trading_system.db_routers import PRIMARY_DB, data_aliases
+
+MANIFEST = 'manifest.json'
+
+
+def fiscal_year_start(year):
+    """Shrawan 1 of the Gregorian year, from FISCAL_YEAR_STARTS, as an aware datetime"""
+    try:
+        month, day = settings.FISCAL_YEAR_STARTS[year]
+    except KeyError:
+        raise ValueError(f"FISCAL_YEAR_STARTS has no fiscal year start for {year}")
+    return datetime.datetime(year, month, day, tzinfo=market_time_zone())
+
+def fiscal_year_bounds(year):
+    """[start, end) of the fiscal year starting in year, as aware datetimes in the market's time zone"""
+    return fiscal_year_start(year), fiscal_year_start(year + 1)
+
+def fiscal_year_label(year):
+    return f"FY{year}-{(year + 1) % 100:02d}"
+
+def range_file_name(alias, first, last):
+    return f"statements_{alias}_{first:012d}_{'end' if last is None else f'{last:012d}'}.jsonl.gz"
+
+
+def position_summary(symbol, position):
+    return {'symbol': symbol, 'quantity': position.quantity, 'average_cost': str(Money(position.average))}
+
+def build_statement(user_id, rows, start, end, actions, symbols, archived):
+    """One user's statement from their trade rows up to end, ordered by stock then time"""
+    opening, closing, lines, realized = [], [], [], []
+    total_gain = 0
+    for stock_id, stock_rows in groupby(rows, key=lambda row: row[1]):
+        symbol = symbols.get(stock_id, str(stock_id))
+        position = Position(actions.get(stock_id, ()))
+        in_year = False
+        incomplete = (user_id, stock_id) in archived
+        sold = proceeds = cost = 0
+        for _, _, trade_type, quantity, price, timestamp in stock_rows:
+            if not in_year and timestamp >= start:
+                position.catch_up(start)
+                if position.quantity:
+                    opening.append(position_summary(symbol, position))
+                in_year = True
+            position.catch_up(timestamp)
+            price = price.paisa
+            if trade_type == 'BUY':
+                position.buy(quantity, price)
+            else:
+                average = position.average
+                if quantity > position.quantity:
+                    # More sold than the trades show bought: the rest came from archived history
+                    incomplete = True
+                    position.quantity = quantity
+                position.sell(quantity)
+            if not in_year:
+                continue
+            line = {'date': market_now(timestamp).isoformat(), 'symbol': symbol, 'type': trade_type, 'quantity': quantity,
+                    'price': str(Money(price)), 'value': str(Money(quantity * price))}
+            if trade_type == 'SELL':
+                line.update({'cost': str(Money(quantity * average)), 'gain': str(Money(quantity * (price - average)))})
+                sold += quantity
+                proceeds += quantity * price
+                cost += quantity * average
+            lines.append(line)
+        if not in_year:
+            # Held through the year without trading it
+            position.catch_up(start)
+            if position.quantity:
+                opening.append(position_summary(symbol, position))
+        position.catch_up(end)
+        if position.quantity:
+            closing.append(position_summary(symbol, position))
+        if sold:
+            entry = {'symbol': symbol, 'quantity_sold': sold, 'proceeds': str(Money(proceeds)),
+                     'cost': str(Money(cost)), 'gain': str(Money(proceeds - cost))}
+            if incomplete:
+                # Bought (in part) before the archive cutoff, so the cost basis is not known
+                entry['incomplete'] = True
+            realized.append(entry)
+            total_gain += proceeds - cost
+    return {'user_id': user_id, 'opening_positions': opening, 'transactions': lines,
+            'realized': realized, 'total_realized_gain': str(Money(total_gain)), 'closing_positions': closing}
+
+def statement_range(alias, first, last, year, path, actions, symbols):
+    """Worker: write the statements for users first..last on alias to path; returns counts"""
+    start, end = fiscal_year_bounds(year)
+    trades = in_range(Trade.objects.using(alias), first, last).filter(timestamp__lt=end).order_by(
+        'user_id', 'stock_id', 'timestamp', 'id'
+    ).values_list('user_id', 'stock_id', 'trade_type', 'quantity', 'price', 'timestamp')
+    archived = set(in_range(TradeArchiveSummary.objects.using(PRIMARY_DB), first, last).values_list('user_id', 'stock_id'))
+    users = User.objects.using(PRIMARY_DB).filter(id__gte=first)
+    if last is not None:
+        users = users.filter(id__lte=last)
+    usernames = dict(users.values_list('id', 'username'))
+    label = fiscal_year_label(year)
+    period = [start.date().isoformat(), (end - datetime.timedelta(days=1)).date().isoformat()]
+
+    stats = {'users': 0, 'transactions': 0}
+    tmp_path = path + '.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        for user_id, rows in groupby(trades.iterator(chunk_size=TRADE_ITERATOR_CHUNK_SIZE), key=lambda row: row[0]):
+            statement = build_statement(user_id, rows, start, end, actions, symbols, archived)
+            if not statement['transactions'] and not statement['opening_positions']:
+                continue
+            statement.update({'username': usernames.get(user_id, ''), 'fiscal_year': label, 'period': period})
+            f.write(json.dumps(statement, separators=(',', ':')) + '\n')
+            stats['users'] += 1
+            stats['transactions'] += len(statement['transactions'])
+    os.replace(tmp_path, path)
+    return stats
+
+def read_statements(path):
+    """Yield the statements in a range file"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+def load_manifest(directory, year, users_per_range):
+    """
+    The year's ranges and the users_per_range they were cut with, fixed by
+    the first run so a resumed run rebuilds the same files.
+    """
+    path = os.path.join(directory, MANIFEST)
+    if os.path.exists(path):
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest['year'] != year:
+            raise ValueError(f"{path} belongs to fiscal year {manifest['year']}")
+        return [tuple(task) for task in manifest['ranges']], manifest.get('users_per_range')
+    ranges = [
+        (alias, first, last)
+        for alias in data_aliases()
+        for first, last in user_ranges(alias, users_per_range)
+    ]
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'year': year, 'users_per_range': users_per_range, 'ranges': ranges}, f)
+    os.replace(tmp_path, path)
+    return ranges, users_per_range
+
+def generate_statements(year, output_dir=None, users_per_range=2000, workers=1, on_range=None):
+    """
+    Write every user's statement for the fiscal year starting in year.
+    Ranges already written are skipped; on_range(alias, first, last, stats)
+    is told about each range written. Returns the year's directory and totals,
+    whose users_per_range is the manifest's: a resumed run keeps its ranges.
+    """
+    directory = os.path.join(output_dir or settings.STATEMENT_DIR, fiscal_year_label(year))
+    os.makedirs(directory, exist_ok=True)
+    ranges, recorded = load_manifest(directory, year, users_per_range)
+    tasks = [task for task in ranges if not os.path.exists(os.path.join(directory, range_file_name(*task)))]
+    totals = {'ranges': len(ranges), 'resumed': len(ranges) - len(tasks), 'users': 0, 'transactions': 0,
+              'users_per_range': recorded}
+    actions = applied_actions()
+    symbols = dict(Stock.objects.using(PRIMARY_DB).values_list('id', 'symbol'))
+
+    def finish(task, stats):
+        totals['users'] += stats['users']
+        totals['transactions'] += stats['transactions']
+        if on_range:
+            on_range(*task, stats)
+
+    args = [(*task, year, os.path.join(directory, range_file_name(*task)), actions, symbols) for task in tasks]
+    if workers <= 1:
+        for task, task_args in zip(tasks, args):
+            finish(task, statement_range(*task_args))
+        return directory, totals
+
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        futures = [pool.submit(statement_range, *task_args) for task_args in args]
+        for task, future in zip(tasks, futures):
+            finish(task, future.result())
+    return directory, totals
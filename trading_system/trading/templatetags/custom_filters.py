@@ -1,11 +1,18 @@
 from django import template
 
+from trading.money import Money
+
 register = template.Library()
 
 @register.filter(name='mul')
 def multiply(value, arg):
     """Multiply the value by the argument"""
     try:
+        # Money times a whole quantity stays exact
+        if isinstance(value, Money) and isinstance(arg, int):
+            return value * arg
+        if isinstance(arg, Money) and isinstance(value, int):
+            return arg * value
         return float(value) * float(arg)
     except (ValueError, TypeError):
         return 0
@@ -14,6 +21,8 @@ def multiply(value, arg):
 def divide(value, arg):
     """Divide the value by the argument"""
     try:
+        if isinstance(value, Money) and isinstance(arg, (Money, int)):
+            return value / arg
         return float(value) / float(arg)
     except (ValueError, TypeError, ZeroDivisionError):
         return 0.
@@ -0,0 +1,90 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from trading.admin import TradeAdmin
+from trading.changelist import EstimatedCountPaginator
+from trading.models import Stock, Trade
+from trading.money import Money
+from trading.sharding import sync_reference_data
+from trading.tests_shards import SHARDS, ShardedTestCase
+from trading.views import execute_trade_logic
+from trading_system.db_routers import shard_for_user
+
+class LargeTableAdminTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='ops', password='x')
+        self.client.force_login(self.admin)
+        self.nabil = Stock.objects.create(symbol='NABIL', name='Nabil Bank', current_price=Decimal('500.00'))
+        self.ntc = Stock.objects.create(symbol='NTC', name='Nepal Telecom', current_price=Decimal('900.00'))
+        self.trader = User.objects.create_user(username='ramesh')
+        Trade.objects.bulk_create([
+            Trade(user=self.trader if i % 2 else self.admin, stock=self.nabil if i % 3 else self.ntc,
+                  trade_type='BUY', quantity=i + 1, price=Money.parse('500.00'))
+            for i in range(25)
+        ])
+
+    def test_keyset_pages_walk_every_trade_once(self):
+        seen = []
+        url = '/admin/trading/trade/'
+        with mock.patch.object(TradeAdmin, 'list_per_page', 10):
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                cl = response.context['cl']
+                seen += [trade.pk for trade in cl.result_list]
+                url = cl.next_url and '/admin/trading/trade/' + cl.next_url
+        self.assertEqual(seen, list(Trade.objects.order_by('-pk').values_list('pk', flat=True)))
+
+    def test_prefix_search_and_capped_count(self):
+        response = self.client.get('/admin/trading/trade/', {'q': 'ram'})
+        self.assertEqual(response.context['cl'].result_count, 12)
+        response = self.client.get('/admin/trading/trade/', {'q': 'ntc ram'})
+        self.assertEqual(response.context['cl'].result_count, 4)
+
+        with override_settings(ADMIN_COUNT_CAP=20):
+            paginator = EstimatedCountPaginator(Trade.objects.filter(quantity__gt=0).order_by('-pk'), 10)
+            self.assertEqual((paginator.count, paginator.capped), (20, True))
+            self.assertContains(self.client.get('/admin/trading/trade/', {'trade_type__exact': 'BUY'}), '20+ trades')
+
+    def test_bulk_price_edit(self):
+        data = {'action': 'edit_prices', '_selected_action': [self.nabil.pk, self.ntc.pk]}
+        response = self.client.post('/admin/trading/stock/', data)
+        self.assertContains(response, 'name="price_%d"' % self.nabil.pk)
+
+        data.update({'apply': 'yes', f'price_{self.nabil.pk}': '512.50', f'price_{self.ntc.pk}': '900.00'})
+        response = self.client.post('/admin/trading/stock/', data)
+        self.assertEqual(response.status_code, 302)
+        self.nabil.refresh_from_db()
+        self.ntc.refresh_from_db()
+        self.assertEqual((self.nabil.current_price, self.ntc.current_price), (Money.parse('512.50'), Money.parse('900.00')))
+
+        data[f'price_{self.ntc.pk}'] = '-1'
+        self.assertContains(self.client.post('/admin/trading/stock/', data), 'errorlist')
+
+
+class ShardedAdminTest(ShardedTestCase):
+    def setUp(self):
+        self.stock = Stock.objects.create(symbol='NABIL', name='Nabil Bank', current_price=Decimal('100.00'))
+        sync_reference_data()
+        self.admin = User.objects.create_superuser(username='ops', password='x')
+        self.client.force_login(self.admin)
+        self.users = [User.objects.create_user(username=f'trader{i}') for i in range(8)]
+        for user in self.users:
+            execute_trade_logic(user, self.stock, 'BUY', 1, self.stock.current_price)
+
+    def test_changelist_reads_the_selected_shard(self):
+        for alias in SHARDS:
+            response = self.client.get('/admin/trading/trade/', {'shard': alias})
+            self.assertEqual(response.status_code, 200)
+            shown = {trade.user_id for trade in response.context['cl'].result_list}
+            self.assertEqual(shown, {user.pk for user in self.users if shard_for_user(user.pk) == alias})
+        self.assertEqual(self.client.get('/admin/trading/portfolio/').status_code, 200)
+
+        # The change form opened from a shard's list reads that shard
+        user = next(user for user in self.users if shard_for_user(user.pk) == SHARDS[1])
+        trade = Trade.objects.using(SHARDS[1]).get(user=user)
+        response = self.client.get(f'/admin/trading/trade/{trade.pk}/change/',
+                                   {'_changelist_filters': f'shard={SHARDS[1]}'})
+        self.assertEqual(response.context['original'].user_id, user.pk)
@@ -0,0 +1,76 @@
+import json
+from decimal import Decimal
+
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from trading.models import Stock, PriceAlert
+from trading.alerts import PriceAlertEngine
+
+class PriceAlertEngineTest(TestCase):
+    def setUp(self):
+        self.engine = PriceAlertEngine()
+        self.engine.load([
+            (1, 10, 'ABOVE', Decimal('1300.00')),
+            (2, 10, 'ABOVE', Decimal('1250.00')),
+            (3, 10, 'ABOVE', Decimal('1400.00')),
+            (4, 10, 'BELOW', Decimal('1100.00')),
+            (5, 10, 'BELOW', Decimal('1150.00')),
+            (6, 20, 'ABOVE', Decimal('100.00')),
+        ])
+
+    def test_fires_only_crossed_alerts(self):
+        self.assertEqual(self.engine.on_price(10, Decimal('1200.00')), [])
+        self.assertEqual(sorted(self.engine.on_price(10, Decimal('1300.00'))), [1, 2])
+        # Fired alerts are removed, so they don't fire again
+        self.assertEqual(self.engine.on_price(10, Decimal('1350.00')), [])
+        self.assertEqual(sorted(self.engine.on_price(10, Decimal('1120.00'))), [5])
+        self.assertEqual(len(self.engine), 3)
+
+    def test_incremental_add_and_remove(self):
+        self.engine.add(7, 10, 'BELOW', Decimal('1180.00'))
+        self.assertTrue(self.engine.remove(5, 10, 'BELOW', Decimal('1150.00')))
+        self.assertEqual(self.engine.on_price(10, Decimal('1150.00')), [7])
+
+
+class PriceAlertPersistenceTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.stock = Stock.objects.create(symbol='NABIL', name='Nabil Bank', current_price=Decimal('1250.00'))
+        self.client = Client()
+        self.client.login(username='testuser', password='password123')
+
+    def test_created_alert_fires_and_is_persisted(self):
+        response = self.client.post(
+            reverse('alerts_api'),
+            data=json.dumps({'symbol': 'NABIL', 'direction': 'ABOVE', 'threshold': '1300'}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        engine = PriceAlertEngine.from_database()
+        engine.on_price(self.stock.id, Decimal('1305.50'))
+        self.assertEqual(engine.flush(), 1)
+
+        alert = PriceAlert.objects.get()
+        self.assertFalse(alert.is_active)
+        self.assertEqual(alert.triggered_price, Decimal('1305.50'))
+
+    def test_bad_or_already_satisfied_alerts_are_refused(self):
+        for body in (
+            [1, 2],
+            '"NABIL"',
+            {'symbol': 'NABIL', 'direction': 'ABOVE', 'threshold': '1250'},
+            {'symbol': 'NABIL', 'direction': 'BELOW', 'threshold': '1300'},
+        ):
+            response = self.client.post(reverse('alerts_api'), data=body if isinstance(body, str) else json.dumps(body),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+        self.assertFalse(PriceAlert.objects.exists())
+
+    def test_cancelled_alert_is_not_marked_triggered(self):
+        alert = PriceAlert.objects.create(user=self.user, stock=self.stock, direction='BELOW', threshold=Decimal('1200'))
+        engine = PriceAlertEngine.from_database()
+        self.client.post(reverse('alert_cancel', args=[alert.id]))
+        engine.on_price(self.stock.id, Decimal('1100.00'))
+        self.assertEqual(engine.flush(), 0)
+        self.assertIsNone(PriceAlert.objects.get().triggered_at)
@@ -0,0 +1,65 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from trading.models import Stock, Trade, AnalyticsSnapshot
+from trading.analytics import request_analytics_refresh, refresh_user_analytics, stale_user_ids
+from trading_system.db_routers import replica_reads
+
+class AnalyticsSnapshotTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.stock = Stock.objects.create(symbol='NABIL', name='Nabil Bank', current_price=Decimal('1000.00'))
+        Trade.objects.create(user=self.user, stock=self.stock, trade_type='BUY', quantity=10, price=Decimal('900.00'))
+        Trade.objects.create(user=self.user, stock=self.stock, trade_type='SELL', quantity=5, price=Decimal('950.00'))
+        self.client = Client()
+        self.client.login(username='testuser', password='password123')
+
+    def test_view_serves_cached_snapshot_and_flags_refresh(self):
+        refresh_user_analytics(self.user.id)
+        Trade.objects.create(user=self.user, stock=self.stock, trade_type='BUY', quantity=1, price=Decimal('1000.00'))
+        request_analytics_refresh(self.user.id)
+
+        response = self.client.get(reverse('analytics'))
+        self.assertEqual(response.context['total_trades'], 2)
+        self.assertTrue(response.context['refreshing'])
+        self.assertEqual(response.context['total_profit'], Decimal('250.00'))
+        self.assertEqual(stale_user_ids(10), [self.user.id])
+
+        refresh_user_analytics(self.user.id)
+        response = self.client.get(reverse('analytics'))
+        self.assertEqual(response.context['total_trades'], 3)
+        self.assertFalse(response.context['refreshing'])
+        self.assertEqual(stale_user_ids(10), [])
+
+    def test_view_refreshes_inline_when_no_worker_picks_it_up(self):
+        refresh_user_analytics(self.user.id)
+        Trade.objects.create(user=self.user, stock=self.stock, trade_type='BUY', quantity=1, price=Decimal('1000.00'))
+        request_analytics_refresh(self.user.id)
+        # Requested five minutes ago and still not computed
+        now = timezone.now()
+        AnalyticsSnapshot.objects.filter(user=self.user).update(computed_at=now - timedelta(minutes=10),
+                                                                requested_at=now - timedelta(minutes=5))
+
+        response = self.client.get(reverse('analytics'))
+        self.assertFalse(response.context['refreshing'])
+        self.assertEqual(response.context['total_trades'], 3)
+        self.assertEqual(stale_user_ids(10), [])
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_refresh_reads_the_primary_inside_replica_views(self):
+        # replica1 is not a configured connection: any read routed there fails
+        with replica_reads():
+            data = refresh_user_analytics(self.user.id)
+        self.assertEqual(data['total_trades'], 2)
+
+    @override_settings(ANALYTICS_QUEUE='sync')
+    def test_trade_commit_triggers_refresh(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Trade.objects.create(user=self.user, stock=self.stock, trade_type='BUY', quantity=1, price=Decimal('1000.00'))
+        snapshot = AnalyticsSnapshot.objects.get(user=self.user)
+        self.assertFalse(snapshot.is_stale)
+        self.assertEqual(snapshot.data['total_trades'], 3)
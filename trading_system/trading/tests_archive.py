@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from trading.models import Stock, Trade, TradeArchiveSummary, TradeArchiveFile
+from trading.archive import archive_trades, read_archive_file, lifetime_trade_stats
+
+class TradeArchiveTest(TestCase):
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.stock = Stock.objects.create(symbol='NABIL', name='Nabil Bank', current_price=Decimal('1000.00'))
+        for trade_type, quantity in [('BUY', 10), ('BUY', 5), ('SELL', 3), ('BUY', 1)]:
+            Trade.objects.create(user=self.user, stock=self.stock, trade_type=trade_type, quantity=quantity, price=Decimal('1000.00'))
+        old_ids = list(Trade.objects.order_by('id').values_list('id', flat=True)[:3])
+        Trade.objects.filter(id__in=old_ids).update(timestamp=timezone.now() - timedelta(days=400))
+
+    def tearDown(self):
+        shutil.rmtree(self.archive_dir)
+
+    def test_archive_moves_old_trades_and_summarises(self):
+        archived = archive_trades(timezone.now() - timedelta(days=365), archive_dir=self.archive_dir, chunk_size=2)
+        self.assertEqual(archived, 3)
+        self.assertEqual(Trade.objects.count(), 1)
+        self.assertEqual(TradeArchiveFile.objects.count(), 2)
+
+        summary = TradeArchiveSummary.objects.get(user=self.user, stock=self.stock)
+        self.assertEqual((summary.buy_count, summary.sell_count), (2, 1))
+        self.assertEqual(summary.buy_quantity, 15)
+        self.assertEqual(summary.sell_value, Decimal('3000.00'))
+
+        rows = []
+        for archive_file in TradeArchiveFile.objects.order_by('first_trade_id'):
+            rows.extend(read_archive_file(os.path.join(self.archive_dir, archive_file.file_name)))
+        self.assertEqual([r['quantity'] for r in rows], [10, 5, 3])
+
+    def test_rerun_after_a_failed_delete_archives_each_trade_once(self):
+        cutoff = timezone.now() - timedelta(days=365)
+        # The first chunk is recorded and summarised, then its delete fails
+        with mock.patch('trading.archive.purge_archived', side_effect=RuntimeError('database is locked')):
+            with self.assertRaises(RuntimeError):
+                archive_trades(cutoff, archive_dir=self.archive_dir, chunk_size=2)
+        self.assertEqual(Trade.objects.count(), 4)
+        self.assertEqual(TradeArchiveFile.objects.get().purged, False)
+
+        # A different chunk size must not pick the recorded trades up again
+        self.assertEqual(archive_trades(cutoff, archive_dir=self.archive_dir, chunk_size=10), 1)
+        self.assertEqual(Trade.objects.count(), 1)
+        self.assertFalse(TradeArchiveFile.objects.filter(purged=False).exists())
+        summary = TradeArchiveSummary.objects.get(user=self.user, stock=self.stock)
+        self.assertEqual((summary.trade_count, summary.buy_quantity, summary.sell_quantity), (3, 15, 3))
+        rows = []
+        for archive_file in TradeArchiveFile.objects.order_by('first_trade_id'):
+            rows.extend(read_archive_file(os.path.join(self.archive_dir, archive_file.file_name)))
+        self.assertEqual([r['quantity'] for r in rows], [10, 5, 3])
+
+    def test_analytics_reports_lifetime_counts(self):
+        archive_trades(timezone.now() - timedelta(days=365), archive_dir=self.archive_dir)
+        self.assertEqual(lifetime_trade_stats(self.user), {'total': 4, 'buys': 3, 'sells': 1})
+
+        client = Client()
+        client.login(username='testuser', password='password123')
+        response = client.get(reverse('analytics'))
+        self.assertEqual(response.context['total_trades'], 4)
+        self.assertEqual(response.context['most_traded'][0]['count'], 4)
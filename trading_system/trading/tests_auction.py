@@ -0,0 +1,144 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from trading.auction import (
+    uncross, uncross_books, market_phase, scheduled_phase, queue_auction_order,
+    run_opening_auction, advance_session, market_now,
+)
+from trading.models import Stock, Trade, Portfolio, OutboxEvent, MarketSession, AuctionOrder, AnalyticsSnapshot
+from trading.money import Money
+from trading.views import execute_trade_logic
+
+KATHMANDU = ZoneInfo('Asia/Kathmandu')
+
+class UncrossTest(TestCase):
+    def test_price_maximises_volume(self):
+        # Bids 102 x10, 101 x10, 100 x10 against offers 99 x5, 100 x10, 101 x20
+        price, volume = uncross([10200, 10100, 10000], [10, 10, 10], [9900, 10000, 10100], [5, 10, 20], 10000)
+        self.assertEqual((price, volume), (10100, 20))
+
+    def test_ties_go_to_smallest_surplus_then_reference(self):
+        # Every price from 99 to 101 trades 10; only the reference breaks the tie
+        self.assertEqual(uncross([10100], [10], [9900], [10], 10000), (10000, 10))
+        self.assertEqual(uncross([10100], [10], [10000], [30], 10000), (10000, 10))
+        self.assertEqual(uncross([9900], [10], [10000], [10], 10000), (None, 0))
+
+    def test_pool_matches_inline(self):
+        books = [{
+            'stock_id': i, 'reference': 10000,
+            'buy_ids': [1, 2], 'buy_limits': [10000 + i, 11000], 'buy_quantities': [5, 5],
+            'sell_ids': [3], 'sell_limits': [9000], 'sell_quantities': [7],
+        } for i in range(8)]
+        self.assertEqual(uncross_books(books, workers=2, min_parallel=0), uncross_books(books, workers=1))
+
+
+class OpeningAuctionTest(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer')
+        self.other = User.objects.create_user(username='other')
+        self.seller = User.objects.create_user(username='seller')
+        self.stock = Stock.objects.create(symbol='NABIL', name='Nabil Bank',
+                                          current_price=Decimal('100.00'), previous_close=Decimal('100.00'))
+        execute_trade_logic(self.seller, self.stock, 'BUY', 50, self.stock.current_price)
+        self.session = MarketSession.objects.create(trading_date=market_now().date(), phase='PRE_OPEN')
+
+    def queue(self, user, trade_type, quantity, limit=None):
+        success, message, order = queue_auction_order(user, self.stock, trade_type, quantity, limit)
+        self.assertTrue(success, message)
+        return order
+
+    def test_auction_fills_in_bulk_by_price_time_priority(self):
+        first = self.queue(self.buyer, 'BUY', 20, '104.00')
+        second = self.queue(self.other, 'BUY', 20, '104.00')
+        offer = self.queue(self.seller, 'SELL', 30, '104.00')
+        greedy = self.queue(self.buyer, 'BUY', 1000, '105.00')
+        trades_before = Trade.objects.count()
+
+        result = run_opening_auction(self.session, workers=1)
+
+        self.assertEqual(result, {'symbols': 1, 'fills': 3, 'rejected': 1})
+        for order in (first, second, offer, greedy):
+            order.refresh_from_db()
+        self.assertEqual((greedy.status, greedy.reason), ('REJECTED', 'Insufficient balance'))
+        self.assertEqual((first.status, first.filled_quantity, first.fill_price), ('FILLED', 20, Money.parse('104.00')))
+        self.assertEqual((second.status, second.filled_quantity), ('PARTIAL', 10))
+        self.assertEqual(offer.status, 'FILLED')
+        self.assertEqual(Trade.objects.count() - trades_before, 3)
+        self.assertEqual(OutboxEvent.objects.filter(payload__price='104.00').count(), 3)
+
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.current_price, Money.parse('104.00'))
+        self.assertEqual(Portfolio.objects.get(user=self.seller).quantity, 20)
+        self.assertEqual(Portfolio.objects.get(user=self.other).average_buy_price, Money.parse('104.00'))
+        self.buyer.profile.refresh_from_db()
+        self.seller.profile.refresh_from_db()
+        self.assertEqual(self.buyer.profile.balance, Money.parse('10000.00') - Money.parse('2080.00'))
+        self.assertEqual(self.seller.profile.balance, Money.parse('10000.00') - Money.parse('5000.00') + Money.parse('3120.00'))
+
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.phase, self.session.auction_fills), ('CONTINUOUS', 3))
+        # A second run finds the session already opened
+        self.assertIsNone(run_opening_auction(self.session, workers=1))
+
+    @override_settings(ANALYTICS_QUEUE='sync')
+    def test_auction_fills_refresh_analytics_after_commit(self):
+        self.queue(self.buyer, 'BUY', 20, '104.00')
+        self.queue(self.seller, 'SELL', 20, '104.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            run_opening_auction(self.session, workers=1)
+        snapshots = AnalyticsSnapshot.objects.filter(user__in=[self.buyer, self.seller])
+        self.assertEqual(sorted(snapshot.data['total_trades'] for snapshot in snapshots), [1, 2])
+        self.assertFalse(any(snapshot.is_stale for snapshot in snapshots))
+
+    def test_orders_outside_band_or_holdings_are_refused(self):
+        success, message, _ = queue_auction_order(self.buyer, self.stock, 'BUY', 1, '111.00')
+        self.assertFalse(success)
+        self.assertIn('110.00', message)
+        oversell = self.queue(self.seller, 'SELL', 51, '95.00')
+        run_opening_auction(self.session, workers=1)
+        oversell.refresh_from_db()
+        self.assertEqual((oversell.status, oversell.reason), ('REJECTED', 'Insufficient shares'))
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.current_price, Money.parse('100.00'))
+
+    def test_views_queue_during_pre_open_and_refuse_when_closed(self):
+        self.client.force_login(self.buyer)
+        payload = {'stock_id': self.stock.id, 'trade_type': 'BUY', 'quantity': 5, 'limit_price': '101.50'}
+        response = self.client.post('/api/quick-trade/', json.dumps(payload), content_type='application/json',
+                                    HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertTrue(response.json()['queued'])
+        order = AuctionOrder.objects.get(user=self.buyer)
+        self.assertEqual(order.limit_price, Money.parse('101.50'))
+        self.assertFalse(Trade.objects.filter(user=self.buyer).exists())
+
+        MarketSession.objects.filter(pk=self.session.pk).update(phase='CLOSED')
+        response = self.client.post('/api/quick-trade/', json.dumps(payload), content_type='application/json',
+                                    HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.json()['error'], 'The market is closed')
+
+
+class ScheduleTest(TestCase):
+    def test_schedule_drives_the_session(self):
+        self.assertEqual(market_phase(), 'CONTINUOUS')
+        # Sunday 19 October 2025 in Kathmandu
+        day = datetime(2025, 10, 19, tzinfo=KATHMANDU)
+        self.assertEqual(scheduled_phase(day.replace(hour=10, minute=45)), 'PRE_OPEN')
+        self.assertEqual(scheduled_phase(datetime(2025, 10, 17, 12, tzinfo=KATHMANDU)), 'CLOSED')
+
+        advance_session(day.replace(hour=10, minute=45), workers=1)
+        session = MarketSession.objects.get()
+        self.assertEqual(session.phase, 'PRE_OPEN')
+        user = User.objects.create_user(username='late')
+        stock = Stock.objects.create(symbol='NTC', name='Nepal Telecom', current_price=Decimal('900.00'))
+        AuctionOrder.objects.create(session=session, user=user, stock=stock, trade_type='BUY', quantity=1)
+
+        steps = advance_session(day.replace(hour=11, minute=1), workers=1)
+        self.assertEqual([action for _, action, _ in steps], ['auction'])
+        advance_session(day.replace(hour=15), workers=1)
+        session.refresh_from_db()
+        self.assertEqual(session.phase, 'CLOSED')
+        self.assertEqual(AuctionOrder.objects.get().status, 'UNFILLED')
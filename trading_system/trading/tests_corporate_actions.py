@@ -0,0 +1,101 @@
+import datetime
+import json
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from trading.models import Stock, Trade, Portfolio, CorporateAction
+from trading.money import Money
+from trading.corporate_actions import apply_corporate_action, apply_due_actions
+
+class CorporateActionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.other = User.objects.create_user(username='other', password='password123')
+        self.stock = Stock.objects.create(
+            symbol='NABIL', name='Nabil Bank',
+            current_price=Decimal('1100.00'), previous_close=Decimal('1000.00')
+        )
+        Portfolio.objects.create(user=self.user, stock=self.stock, quantity=100, average_buy_price=Decimal('990.00'))
+        Portfolio.objects.create(user=self.other, stock=self.stock, quantity=15, average_buy_price=Decimal('1000.00'))
+
+    def create_action(self, action_type, ratio_new, ratio_held, **kwargs):
+        return CorporateAction.objects.create(
+            stock=self.stock, action_type=action_type, ratio_new=ratio_new, ratio_held=ratio_held,
+            ex_date=timezone.localdate(), **kwargs
+        )
+
+    def test_bonus_scales_holdings_and_keeps_cost_basis(self):
+        action = self.create_action('BONUS', 10, 100)
+        Stock.objects.filter(pk=self.stock.pk).update(last_updated=timezone.now() - datetime.timedelta(days=1))
+        self.assertEqual(apply_corporate_action(action), 2)
+
+        item = Portfolio.objects.get(user=self.user)
+        self.assertEqual(item.quantity, 110)
+        self.assertEqual(item.average_buy_price, Money.parse('900.00'))
+        # 16.5 shares: the fraction is dropped, the cost stays the same
+        item = Portfolio.objects.get(user=self.other)
+        self.assertEqual(item.quantity, 16)
+        self.assertEqual(item.average_buy_price, Money.parse('937.50'))
+
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.current_price, Money.parse('1000.00'))
+        self.assertEqual(self.stock.previous_close, Money.parse('909.09'))
+        self.assertGreaterEqual(self.stock.last_updated, action.applied_at)
+        self.assertEqual((action.factor_numerator, action.factor_denominator), (11, 10))
+
+    def test_applied_only_once(self):
+        action = self.create_action('SPLIT', 2, 1)
+        apply_due_actions()
+        self.assertEqual(apply_corporate_action(action), 0)
+        self.assertEqual(Portfolio.objects.get(user=self.user).quantity, 200)
+
+    def test_rerun_after_a_failed_claim_scales_holdings_once(self):
+        action = self.create_action('SPLIT', 2, 1)
+        # Holdings commit, then the primary's claim fails
+        with mock.patch('trading.corporate_actions.scaled_money', side_effect=RuntimeError('lock timeout')):
+            with self.assertRaises(RuntimeError):
+                apply_corporate_action(action)
+        self.assertIsNone(CorporateAction.objects.get().applied_at)
+        self.assertEqual(Portfolio.objects.get(user=self.user).quantity, 200)
+
+        self.assertEqual(apply_corporate_action(action), 2)
+        self.assertEqual(Portfolio.objects.get(user=self.user).quantity, 200)
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.current_price, Money.parse('550.00'))
+
+    def test_rights_leave_holdings_unchanged(self):
+        action = self.create_action('RIGHT', 1, 1, rights_price=Decimal('100.00'))
+        self.assertEqual(apply_corporate_action(action), 0)
+        self.assertEqual(Portfolio.objects.get(user=self.user).quantity, 100)
+        # Holders get no entitlement here, so the price is not cut to the ex-rights price either
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.current_price, Money.parse('1100.00'))
+        action.refresh_from_db()
+        self.assertEqual((action.factor_numerator, action.factor_denominator), (1, 1))
+
+    def test_history_is_back_adjusted_on_read(self):
+        trade = Trade.objects.create(user=self.user, stock=self.stock, trade_type='BUY', quantity=10, price=Decimal('1000.00'))
+        Trade.objects.filter(pk=trade.pk).update(timestamp=timezone.now() - datetime.timedelta(days=3))
+        apply_corporate_action(self.create_action('SPLIT', 2, 1))
+
+        client = Client()
+        client.login(username='testuser', password='password123')
+        row = json.loads(client.get(reverse('trade_history_api')).content)['trades'][0]
+        self.assertEqual((row['quantity'], row['price']), (10, '1000.00'))
+        self.assertEqual((row['adjusted_quantity'], row['adjusted_price']), (20, '500.00'))
+        self.assertEqual(Trade.objects.get(pk=trade.pk).price, Money.parse('1000.00'))
+
+    def test_admin_action_waits_for_the_ex_date(self):
+        User.objects.create_superuser(username='ops', password='x')
+        client = Client()
+        client.login(username='ops', password='x')
+        early = self.create_action('SPLIT', 2, 1)
+        CorporateAction.objects.filter(pk=early.pk).update(ex_date=timezone.localdate() + datetime.timedelta(days=3))
+        response = client.post('/admin/trading/corporateaction/', {'action': 'apply_actions', '_selected_action': [early.pk]}, follow=True)
+        self.assertContains(response, 'not applied before its ex-date')
+        self.assertIsNone(CorporateAction.objects.get().applied_at)
+        self.assertEqual(Portfolio.objects.get(user=self.user).quantity, 100)
@@ -0,0 +1,50 @@
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from trading.models import Stock, Trade
+from decimal import Decimal
+
+class TradeHistoryTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.stock = Stock.objects.create(
+            symbol='NABIL',
+            name='Nabil Bank',
+            current_price=Decimal('1000.00'),
+            previous_close=Decimal('950.00')
+        )
+        for i in range(7):
+            Trade.objects.create(user=self.user, stock=self.stock, trade_type='BUY', quantity=i + 1, price=Decimal('1000.00'))
+        # Force timestamp ties so the id tiebreaker is exercised
+        Trade.objects.filter(user=self.user).update(timestamp=timezone.now())
+
+        self.client = Client()
+        self.client.login(username='testuser', password='password123')
+
+    def test_cursor_pages_cover_history_once(self):
+        url = reverse('trade_history_api')
+        seen = []
+        cursor = None
+        while True:
+            params = {'limit': 3}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.client.get(url, params).json()
+            seen.extend(t['id'] for t in data['trades'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        expected = list(Trade.objects.filter(user=self.user).order_by('-timestamp', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('trade_history_api'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_csv_export(self):
+        response = self.client.get(reverse('export_trades'))
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().strip().splitlines()
+        self.assertEqual(lines[0], 'Timestamp,Symbol,Type,Quantity,Price,Total')
+        self.assertEqual(len(lines), 8)
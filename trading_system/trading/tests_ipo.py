@@ -0,0 +1,126 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from unittest import mock
+
+import numpy as np
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+from accounts.models import Profile
+from trading.ipo import allot_lots, apply_for_ipo, draw, draw_ipo, verify_draw
+from trading.models import Stock, Trade, Portfolio, IPO, IPOApplication, AnalyticsSnapshot
+from trading.money import Money
+from trading.reconcile import reconcile
+
+class LotteryTest(TestCase):
+    def test_whole_rounds_then_a_seeded_draw(self):
+        np.testing.assert_array_equal(allot_lots([1, 2], 5, seed=1), [1, 2])
+        allotted = allot_lots([1, 3, 5], 6, seed=7)
+        self.assertEqual(allotted.sum(), 6)
+        self.assertEqual(allotted[0], 1)
+        self.assertEqual(sorted(allotted[1:]), [2, 3])
+
+    def test_oversubscribed_draw_is_reproducible(self):
+        lots = np.ones(1_000_000, dtype=np.int64)
+        first = allot_lots(lots, 10_000, seed=42)
+        self.assertEqual(int(first.sum()), 10_000)
+        np.testing.assert_array_equal(first, allot_lots(lots, 10_000, seed=42))
+        self.assertFalse(np.array_equal(first, allot_lots(lots, 10_000, seed=43)))
+
+
+class IPOTest(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'applicant{i}') for i in range(5)]
+        self.stock = Stock.objects.create(symbol='NEWHYD', name='New Hydro', sector='Hydropower', current_price=Decimal('100.00'))
+        now = timezone.now()
+        self.ipo = IPO.objects.create(stock=self.stock, issue_price=Money.parse('100.00'), total_units=20,
+                                      opens_at=now - timedelta(hours=1), closes_at=now + timedelta(hours=1))
+
+    def close(self):
+        IPO.objects.filter(pk=self.ipo.pk).update(closes_at=timezone.now() - timedelta(seconds=1))
+        self.ipo.refresh_from_db()
+
+    def test_applications_hold_the_amount(self):
+        self.client.force_login(self.users[0])
+        response = self.client.post(f'/api/ipos/{self.ipo.id}/apply/', json.dumps({'units': 10}), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['ipo']['application']['amount_held'], '1000.00')
+        self.assertEqual(Profile.objects.get(user=self.users[0]).balance, Money.parse('9000.00'))
+
+        self.assertFalse(apply_for_ipo(self.users[0], self.ipo, 10)[0])
+        self.assertFalse(apply_for_ipo(self.users[1], self.ipo, 15)[0])
+        Profile.objects.filter(user=self.users[1]).update(balance=Money.parse('999.00'))
+        self.assertFalse(apply_for_ipo(self.users[1], self.ipo, 10)[0])
+        self.assertEqual(IPOApplication.objects.count(), 1)
+        # A pending hold is not ledger drift
+        self.assertEqual([r for rs in reconcile() for r in rs if r['user_id'] == self.users[0].id], [])
+
+    def test_applications_recheck_the_ipo_inside_the_transaction(self):
+        # Claimed by a draw after the caller loaded it
+        IPO.objects.filter(pk=self.ipo.pk).update(status='ALLOTTING', seed=1)
+        self.assertFalse(apply_for_ipo(self.users[0], self.ipo, 10)[0])
+        self.assertEqual(Profile.objects.get(user=self.users[0]).balance, Money.parse('10000.00'))
+        self.assertFalse(IPOApplication.objects.exists())
+
+    def test_draw_refuses_applications_it_did_not_read(self):
+        for user in self.users[:2]:
+            self.assertTrue(apply_for_ipo(user, self.ipo, 10)[0])
+        self.close()
+
+        def late_draw(ipo):
+            result = draw(ipo)
+            IPOApplication.objects.create(ipo=ipo, user=self.users[2], units=10, amount_held=Money.parse('1000.00'))
+            return result
+        with mock.patch('trading.ipo.draw', side_effect=late_draw):
+            with self.assertRaises(ValueError):
+                draw_ipo(self.ipo, seed=3)
+        self.assertEqual(IPOApplication.objects.filter(status='PENDING').count(), 3)
+        self.assertFalse(Trade.objects.filter(stock=self.stock).exists())
+
+    def test_draw_allots_refunds_and_resumes(self):
+        for user in self.users:
+            self.assertTrue(apply_for_ipo(user, self.ipo, 10)[0])
+        self.close()
+
+        def crash(message):
+            raise RuntimeError('worker lost')
+        with self.assertRaises(RuntimeError):
+            draw_ipo(self.ipo, seed=2024, chunk_size=2, log=crash)
+        self.assertEqual(IPOApplication.objects.filter(status='PENDING').count(), 3)
+
+        self.ipo.refresh_from_db()
+        result = draw_ipo(self.ipo, chunk_size=2)
+        self.assertEqual(result, {'applicants': 5, 'allottees': 2, 'settled': 3})
+        self.ipo.refresh_from_db()
+        self.assertEqual((self.ipo.status, self.ipo.seed), ('ALLOTTED', 2024))
+        self.assertTrue(verify_draw(self.ipo))
+
+        expected = allot_lots([1] * 5, 2, seed=2024)
+        applications = list(IPOApplication.objects.order_by('id'))
+        self.assertEqual([app.units_allotted // 10 for app in applications], list(expected))
+        for app in applications:
+            balance = Profile.objects.get(user_id=app.user_id).balance
+            if app.units_allotted:
+                self.assertEqual((app.status, app.refund, balance), ('ALLOTTED', Money(0), Money.parse('9000.00')))
+                self.assertEqual(Portfolio.objects.get(user_id=app.user_id, stock=self.stock).quantity, 10)
+            else:
+                self.assertEqual((app.status, app.refund, balance), ('NOT_ALLOTTED', Money.parse('1000.00'), Money.parse('10000.00')))
+        self.assertEqual(Trade.objects.filter(stock=self.stock).count(), 2)
+        self.assertEqual([r for rs in reconcile() for r in rs], [])
+
+        with self.assertRaises(ValueError):
+            draw_ipo(self.ipo)
+
+    @override_settings(ANALYTICS_QUEUE='sync')
+    def test_allotment_refreshes_the_winners_analytics(self):
+        for user in self.users:
+            self.assertTrue(apply_for_ipo(user, self.ipo, 10)[0])
+        self.close()
+        with self.captureOnCommitCallbacks(execute=True):
+            draw_ipo(self.ipo, seed=7)
+        winners = IPOApplication.objects.filter(status='ALLOTTED').values_list('user_id', flat=True)
+        snapshots = AnalyticsSnapshot.objects.filter(user_id__in=winners)
+        self.assertEqual([snapshot.data['total_trades'] for snapshot in snapshots], [1, 1])
+        self.assertFalse(any(snapshot.is_stale for snapshot in snapshots))
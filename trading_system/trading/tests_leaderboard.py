@@ -0,0 +1,86 @@
+import json
+import random
+from decimal import Decimal
+
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from trading.models import Stock, Portfolio
+from trading.money import Money
+from trading.leaderboard import OrderStatisticList, Leaderboard, reset_leaderboard
+from trading.views import execute_trade_logic
+
+class OrderStatisticListTest(TestCase):
+    def test_matches_sorted_list(self):
+        rng = random.Random(7)
+        ranking, reference = OrderStatisticList(), []
+        ranking.BUCKET_SIZE = 8     # force plenty of splits and empty buckets
+        for _ in range(2000):
+            key = (rng.randrange(-500, 500), rng.randrange(10_000))
+            if key in reference:
+                continue
+            ranking.insert(key)
+            reference.append(key)
+            if rng.random() < 0.3:
+                victim = reference.pop(rng.randrange(len(reference)))
+                ranking.remove(victim)
+        reference.sort()
+        self.assertEqual(len(ranking), len(reference))
+        self.assertEqual(ranking.select(0, len(reference)), reference)
+        self.assertEqual(ranking.select(10, 15), reference[10:15])
+        for i in range(0, len(reference), 97):
+            self.assertEqual(ranking.rank(reference[i]), i)
+
+
+class LeaderboardTest(TestCase):
+    def setUp(self):
+        self.board = Leaderboard()
+        self.board.build(
+            [(1, Money(1000)), (2, Money(5000)), (3, Money(0))],
+            [(1, 10, 10), (3, 10, 5), (3, 20, 100)],
+            [(10, Money(300), None), (20, Money(10), None)],
+        )
+
+    def test_ticks_move_holders_through_symbol_books(self):
+        # Equity: user 1 = 1000 + 3000, user 2 = 5000, user 3 = 1500 + 1000
+        self.assertEqual([user_id for _, user_id, _ in self.board.top(3)], [2, 1, 3])
+        self.board.on_price(10, Money(350))
+        self.board.on_price(10, Money(1000))     # coalesced with the tick above
+        self.assertEqual(self.board.flush(), 2)
+        self.assertEqual(self.board.top(3), [(1, 1, 11000), (2, 3, 6000), (3, 2, 5000)])
+        self.assertEqual(self.board.market_value(10), Money(15000).paisa)
+
+    def test_trade_changes_cash_and_holdings(self):
+        self.board.on_trade(2, 10, 'BUY', 10, Money(250))
+        # Paid 2500 for shares worth 3000 at the board's price
+        self.assertEqual(self.board.equity[2], 5500)
+        self.assertEqual(self.board.rank(2), 1)
+        self.board.on_price(10, Money(0))
+        self.board.flush()
+        self.assertEqual(self.board.equity[2], 2500)
+
+
+class LeaderboardApiTest(TestCase):
+    def setUp(self):
+        reset_leaderboard()
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.rich = User.objects.create_user(username='rich', password='password123')
+        self.stock = Stock.objects.create(symbol='NABIL', name='Nabil Bank', current_price=Decimal('1000.00'))
+        self.client = Client()
+        self.client.login(username='testuser', password='password123')
+
+    def tearDown(self):
+        reset_leaderboard()
+
+    def test_picks_up_trades_and_prices(self):
+        leaders = json.loads(self.client.get(reverse('leaderboard_api')).content)['leaders']
+        self.assertEqual([entry['equity'] for entry in leaders], ['10000.00', '10000.00'])
+
+        execute_trade_logic(self.user, self.stock, 'BUY', 5, self.stock.current_price)
+        self.stock.current_price = Money.parse('1200.00')
+        self.stock.save()
+
+        data = json.loads(self.client.get(reverse('leaderboard_api')).content)
+        self.assertEqual(data['you'], {'rank': 1, 'equity': '11000.00'})
+        self.assertEqual(data['leaders'][1]['username'], 'rich')
+        self.assertEqual(Portfolio.objects.get(user=self.user).quantity, 5)
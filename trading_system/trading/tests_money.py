@@ -0,0 +1,65 @@
+from decimal import Decimal
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+from trading.models import Stock, Portfolio
+from trading.money import Money, total_value
+from trading.views import execute_trade_logic
+
+class MoneyArithmeticTest(TestCase):
+    def test_parse_and_format(self):
+        self.assertEqual(Money.parse('1250.5').paisa, 125050)
+        self.assertEqual(Money.parse(Decimal('0.125')).paisa, 12)   # half to even
+        self.assertEqual(Money.parse(0.135).paisa, 14)
+        self.assertEqual(Money.parse(12).paisa, 1200)
+        self.assertEqual(str(Money(-5)), '-0.05')
+        self.assertEqual(f"{Money(123456):.2f}", '1234.56')
+
+    def test_exact_arithmetic(self):
+        price = Money.parse('0.10')
+        self.assertEqual(price * 3, Money.parse('0.30'))
+        self.assertEqual(sum([price] * 10, Money(0)), 1)
+        self.assertEqual(Money(250) / 2, Money(125))
+        self.assertEqual(Money(5) / 2, Money(2))
+        self.assertEqual(Money(7) / 2, Money(4))
+        self.assertEqual(Money(150) / Money(100), 1.5)
+        self.assertEqual(Money.parse('1000.00'), Decimal('1000'))
+        self.assertEqual(total_value([(3, Money(101)), (2, Money(50))]), Money(403))
+
+    def test_division_by_plain_numbers(self):
+        self.assertEqual(Money.parse('10.00') / 4.0, Money.parse('2.50'))
+        self.assertEqual(Money.parse('10.00') / Decimal('3'), Money.parse('3.33'))
+        # A number divided by Money is a ratio of rupee amounts
+        self.assertEqual(300 / Money.parse('200.00'), 1.5)
+        self.assertEqual(Decimal('50') / Money.parse('200.00'), 0.25)
+        with self.assertRaises(TypeError):
+            Money(100) / 'x'
+
+    def test_rejects_float_paisa(self):
+        with self.assertRaises(TypeError):
+            Money(1.5)
+
+
+class MoneyFieldTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.stock = Stock.objects.create(symbol='NABIL', name='Nabil Bank', current_price=Decimal('333.33'))
+
+    def test_round_trip_and_assignment(self):
+        self.stock.refresh_from_db()
+        self.assertIsInstance(self.stock.current_price, Money)
+        self.assertEqual(self.stock.current_price.paisa, 33333)
+        self.stock.current_price = '400.005'
+        self.assertEqual(self.stock.current_price, Money(40000))
+        self.assertEqual(Stock.objects.filter(current_price__gte=Decimal('333.33')).count(), 1)
+        self.assertEqual(self.user.profile.balance, Money(1_000_000))
+
+    def test_average_buy_price_rounds_to_paisa(self):
+        execute_trade_logic(self.user, self.stock, 'BUY', 2, self.stock.current_price)
+        self.stock.current_price = Money.parse('333.34')
+        execute_trade_logic(self.user, self.stock, 'BUY', 1, self.stock.current_price)
+
+        item = Portfolio.objects.get(user=self.user, stock=self.stock)
+        self.assertEqual(item.average_buy_price, Money.parse('333.33'))
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.balance, Money.parse('9000.00'))
@@ -0,0 +1,61 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+from trading.models import Stock, Trade, OutboxEvent, OutboxOffset
+from trading.outbox import Dispatcher
+from trading.views import execute_trade_logic
+
+class OutboxTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.stock = Stock.objects.create(symbol='NABIL', name='Nabil Bank', current_price=Decimal('1000.00'))
+        self.received = {'fast': [], 'flaky': []}
+        self.fail = True
+
+    def fast(self, events):
+        self.received['fast'].extend(event.idempotency_key for event in events)
+
+    def flaky(self, events):
+        if self.fail:
+            raise RuntimeError('downstream unavailable')
+        self.received['flaky'].extend(event.idempotency_key for event in events)
+
+    def test_trade_writes_one_event_in_its_transaction(self):
+        success, _, result = execute_trade_logic(self.user, self.stock, 'BUY', 2, self.stock.current_price)
+        self.assertTrue(success)
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.idempotency_key, f"trade:{result['trade'].id}")
+        self.assertEqual(event.payload['symbol'], 'NABIL')
+        self.assertEqual(event.payload['price'], '1000.00')
+
+        # A failure after the trade row rolls back the trade and the balance with it
+        with mock.patch('trading.views.publish_trade', side_effect=RuntimeError('boom')):
+            success, _, _ = execute_trade_logic(self.user, self.stock, 'BUY', 1, self.stock.current_price)
+        self.assertFalse(success)
+        self.assertEqual(Trade.objects.count(), 1)
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.balance, Decimal('8000.00'))
+
+    def test_consumers_keep_their_own_offsets(self):
+        for _ in range(3):
+            execute_trade_logic(self.user, self.stock, 'BUY', 1, self.stock.current_price)
+        dispatcher = Dispatcher({'fast': self.fast, 'flaky': self.flaky}, batch_size=2)
+
+        with self.assertLogs('trading.outbox', 'ERROR'):
+            self.assertEqual(dispatcher.dispatch_once(), 2)
+            self.assertEqual(dispatcher.dispatch_once(), 1)
+        self.assertEqual(len(self.received['fast']), 3)
+        self.assertEqual(self.received['flaky'], [])
+        self.assertEqual(OutboxOffset.objects.get(consumer='flaky').last_event_id, 0)
+
+        # The failed consumer gets the same events again once it recovers
+        self.fail = False
+        while dispatcher.dispatch_once():
+            pass
+        self.assertEqual(self.received['flaky'], self.received['fast'])
+
+        self.assertEqual(dispatcher.prune(retention_seconds=0), 3)
+        self.assertEqual(dispatcher.dispatch_once(), 0)
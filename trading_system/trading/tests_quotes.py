@@ -0,0 +1,44 @@
+from decimal import Decimal
+
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from trading.models import Stock, Watchlist
+
+class QuotesApiTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.nabil = Stock.objects.create(symbol='NABIL', name='Nabil Bank', current_price=Decimal('1000.00'), previous_close=Decimal('990.00'))
+        self.ntc = Stock.objects.create(symbol='NTC', name='Nepal Telecom', current_price=Decimal('880.00'), previous_close=Decimal('880.00'))
+        Stock.objects.create(symbol='API', name='Api Power', current_price=Decimal('160.00'))
+        self.client = Client()
+        self.client.login(username='testuser', password='password123')
+
+    def test_bulk_quotes_in_one_query(self):
+        with self.assertNumQueries(3):  # session, user, quotes
+            response = self.client.get(reverse('quotes_api'), {'symbols': 'ntc,NABIL'})
+        quotes = response.json()['quotes']
+        self.assertEqual([q['symbol'] for q in quotes], ['NABIL', 'NTC'])
+        self.assertEqual(quotes[0]['change'], '10.00')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_conditional_get_returns_304_until_price_changes(self):
+        url = reverse('quotes_api')
+        etag = self.client.get(url, {'symbols': 'NABIL,NTC'})['ETag']
+        response = self.client.get(url, {'symbols': 'NABIL,NTC'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.nabil.current_price = Decimal('1010.00')
+        self.nabil.save()
+        response = self.client.get(url, {'symbols': 'NABIL,NTC'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_watchlist_defaults_quotes(self):
+        self.client.post(reverse('watchlist_toggle'), data={'symbol': 'api'}, content_type='application/json')
+        self.assertTrue(Watchlist.objects.filter(user=self.user, stock__symbol='API').exists())
+        response = self.client.post(reverse('watchlist_toggle'), data='[1]', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        quotes = self.client.get(reverse('quotes_api')).json()['quotes']
+        self.assertEqual([q['symbol'] for q in quotes], ['API'])
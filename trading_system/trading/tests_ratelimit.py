@@ -0,0 +1,53 @@
+import json
+from decimal import Decimal
+
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from trading.models import Stock, Trade
+from trading.ratelimit import gcra, get_bucket_store
+
+class GcraTest(TestCase):
+    def test_burst_then_steady_rate(self):
+        tat = None
+        for _ in range(3):
+            allowed, _, tat = gcra(tat, 1.0, 3, 100.0)
+            self.assertTrue(allowed)
+        allowed, retry_after, tat = gcra(tat, 1.0, 3, 100.0)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, 1.0)
+        allowed, _, _ = gcra(tat, 1.0, 3, 101.0)
+        self.assertTrue(allowed)
+
+
+@override_settings(RATE_LIMIT_BACKEND='local', ORDER_RATE_LIMITS={'trade': (1, 2), 'quick_trade': (1, 2)})
+class OrderRateLimitTest(TestCase):
+    def setUp(self):
+        get_bucket_store().clear()
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.stock = Stock.objects.create(symbol='NABIL', name='Nabil Bank', current_price=Decimal('100.00'))
+        self.client = Client()
+        self.client.login(username='testuser', password='password123')
+
+    def quick_trade(self):
+        return self.client.post(
+            reverse('quick_trade'),
+            data=json.dumps({'stock_id': self.stock.id, 'trade_type': 'BUY', 'quantity': 1}),
+            content_type='application/json',
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+
+    def test_quick_trade_over_budget_gets_429(self):
+        self.assertEqual(self.quick_trade().status_code, 200)
+        self.assertEqual(self.quick_trade().status_code, 200)
+        response = self.quick_trade()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(Trade.objects.count(), 2)
+
+    def test_buckets_are_per_endpoint_and_ignore_reads(self):
+        for _ in range(2):
+            self.quick_trade()
+        self.assertEqual(self.client.get(reverse('trade')).status_code, 200)
+        response = self.client.post(reverse('trade'), {'stock': self.stock.id, 'trade_type': 'BUY', 'quantity': 1})
+        self.assertEqual(response.status_code, 302)
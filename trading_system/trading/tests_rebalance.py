@@ -0,0 +1,76 @@
+import json
+from decimal import Decimal
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+from trading.models import Stock, Trade, Portfolio, OutboxEvent
+from trading.money import Money
+from trading.rebalance import RebalanceError, plan_rebalance, execute_rebalance
+from trading.views import execute_trade_logic
+
+class RebalanceTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='rebalancer')
+        self.nabil = Stock.objects.create(symbol='NABIL', name='Nabil Bank', sector='Commercial Banks', current_price=Decimal('100.00'))
+        self.nica = Stock.objects.create(symbol='NICA', name='NIC Asia Bank', sector='Commercial Banks', current_price=Decimal('50.00'))
+        self.hppl = Stock.objects.create(symbol='HPPL', name='Himalayan Power', sector='Hydropower', current_price=Decimal('20.00'))
+        self.ntc = Stock.objects.create(symbol='NTC', name='Nepal Telecom', sector='Telecom', current_price=Decimal('10.00'))
+        for stock, quantity in ((self.nabil, 20), (self.nica, 20), (self.ntc, 50)):
+            execute_trade_logic(self.user, stock, 'BUY', quantity, stock.current_price)
+
+    def summary(self, plan):
+        return [(order['side'], order['symbol'], order['quantity']) for order in plan['orders']]
+
+    def test_plan_reaches_targets_with_minimal_orders(self):
+        plan = plan_rebalance(self.user, {'commercial banks': 30, 'HPPL': 40, 'cash': 30})
+        # Banks already sit at 30%; the untargeted telecom holding is sold
+        self.assertEqual(self.summary(plan), [('SELL', 'NTC', 50), ('BUY', 'HPPL', 200)])
+        self.assertEqual(plan['cash_after'], Money.parse('3000.00'))
+        self.assertAlmostEqual(plan['weights_after']['HPPL'], 0.4)
+
+        with self.assertRaises(RebalanceError):
+            plan_rebalance(self.user, {'Hydropower': 60, 'NABIL': 50})
+        with self.assertRaises(RebalanceError):
+            plan_rebalance(self.user, {'Finance': 10})
+        for weight in ('NaN', 'sNaN', 'Infinity'):
+            with self.assertRaises(RebalanceError):
+                plan_rebalance(self.user, {'HPPL': weight})
+
+    def test_a_sector_not_held_is_split_equally_over_its_stocks(self):
+        Stock.objects.create(symbol='UPPER', name='Upper Tamakoshi', sector='Hydropower', current_price=Decimal('40.00'))
+        plan = plan_rebalance(self.user, {'commercial banks': 30, 'hydropower': 40, 'cash': 30})
+        self.assertEqual(self.summary(plan), [('SELL', 'NTC', 50), ('BUY', 'HPPL', 100), ('BUY', 'UPPER', 50)])
+        self.assertAlmostEqual(plan['weights_after']['HPPL'], 0.2)
+        self.assertAlmostEqual(plan['weights_after']['UPPER'], 0.2)
+
+    def test_buys_are_lot_rounded_and_fit_the_cash(self):
+        plan = plan_rebalance(self.user, {'commercial banks': 5, 'HPPL': 95})
+        # Bank sells round towards zero, so the full hydro target is not affordable
+        self.assertEqual(self.summary(plan), [
+            ('SELL', 'NABIL', 10), ('SELL', 'NICA', 10), ('SELL', 'NTC', 50), ('BUY', 'HPPL', 420),
+        ])
+        self.assertGreaterEqual(plan['cash_after'], Money(0))
+
+    def test_execute_settles_the_preview_in_one_batch(self):
+        self.client.force_login(self.user)
+        response = self.client.post('/api/rebalance/preview/', json.dumps({'targets': {'commercial banks': 30, 'HPPL': 40}}),
+                                    content_type='application/json')
+        preview = response.json()
+        self.assertEqual(len(preview['orders']), 2)
+        trades_before = Trade.objects.count()
+
+        response = self.client.post('/api/rebalance/execute/', json.dumps({'orders': preview['orders']}),
+                                    content_type='application/json')
+        self.assertEqual(response.json()['new_balance'], '3000.00')
+        self.assertEqual(Trade.objects.count() - trades_before, 2)
+        self.assertEqual(OutboxEvent.objects.filter(payload__symbol__in=['NTC', 'HPPL']).count(), 3)
+        self.assertFalse(Portfolio.objects.filter(user=self.user, stock=self.ntc).exists())
+        self.assertEqual(Portfolio.objects.get(user=self.user, stock=self.hppl).quantity, 200)
+
+        # Orders the holdings no longer cover are refused whole
+        with self.assertRaises(RebalanceError):
+            execute_rebalance(self.user, [
+                {'stock_id': self.hppl.id, 'side': 'SELL', 'quantity': 10},
+                {'stock_id': self.ntc.id, 'side': 'SELL', 'quantity': 1},
+            ])
+        self.assertEqual(Portfolio.objects.get(user=self.user, stock=self.hppl).quantity, 200)
@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth.models import User
+from accounts.models import Profile
+from trading.corporate_actions import apply_corporate_action
+from trading.models import Stock, Portfolio, CorporateAction
+from trading.money import Money
+from trading.reconcile import reconcile, apply_repairs, user_ranges
+from trading.views import execute_trade_logic
+
+class ReconcileTest(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'user{i}') for i in range(5)]
+        self.stock = Stock.objects.create(symbol='NABIL', name='Nabil Bank', current_price=Decimal('100.00'))
+        self.other = Stock.objects.create(symbol='NTC', name='Nepal Telecom', current_price=Decimal('33.33'))
+        for user in self.users:
+            execute_trade_logic(user, self.stock, 'BUY', 10, Decimal('100.00'))
+            execute_trade_logic(user, self.stock, 'BUY', 5, Decimal('101.01'))
+            execute_trade_logic(user, self.other, 'BUY', 3, self.other.current_price)
+            execute_trade_logic(user, self.stock, 'SELL', 4, Decimal('102.00'))
+
+    def run_reconcile(self, **kwargs):
+        return [repair for repairs in reconcile(users_per_range=2, **kwargs) for repair in repairs]
+
+    def test_consistent_ledger_needs_no_repairs(self):
+        self.assertEqual(len(user_ranges('default', 2)), 3)
+        CorporateAction.objects.create(stock=self.stock, action_type='BONUS', ratio_new=1, ratio_held=3,
+                                       ex_date=date.today())
+        apply_corporate_action(CorporateAction.objects.get())
+        execute_trade_logic(self.users[0], self.stock, 'BUY', 2, Decimal('75.00'))
+        self.assertEqual(self.run_reconcile(), [])
+
+    def test_drift_is_planned_then_applied(self):
+        drifted, lost, extra = self.users[0], self.users[1], self.users[2]
+        Profile.objects.filter(user=drifted).update(balance=Money.parse('1.00'))
+        Portfolio.objects.filter(user=drifted, stock=self.stock).update(quantity=99)
+        Portfolio.objects.filter(user=lost, stock=self.other).delete()
+        Portfolio.objects.create(user=extra, stock=Stock.objects.create(symbol='HDL', name='Himalayan Distillery',
+                                 current_price=Decimal('10.00')), quantity=1, average_buy_price=Money.parse('10.00'))
+
+        repairs = self.run_reconcile()
+        self.assertEqual(len(repairs), 4)
+        balance = next(r for r in repairs if r['model'] == 'profile')
+        self.assertEqual(balance['expected'], {'balance': drifted.profile.balance.paisa})
+
+        # A row that changed after the plan was made is left alone
+        Portfolio.objects.filter(user=drifted, stock=self.stock).update(quantity=98)
+        self.assertEqual(apply_repairs(repairs), 3)
+        self.assertEqual(len(self.run_reconcile(apply=True)), 1)
+        self.assertEqual(self.run_reconcile(), [])
+        self.assertEqual(Portfolio.objects.get(user=drifted, stock=self.stock).quantity, 11)
+        self.assertEqual(Portfolio.objects.get(user=lost, stock=self.other).average_buy_price, Money.parse('33.33'))
+        self.assertFalse(Portfolio.objects.filter(user=extra, stock__symbol='HDL').exists())
+
+    def test_command_writes_and_applies_a_plan(self):
+        Profile.objects.filter(user=self.users[3]).update(balance=Money.parse('5.00'))
+        fd, path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        call_command('reconcile_ledger', workers=1, users_per_range=2, plan=path, stdout=StringIO())
+        with open(path) as f:
+            plan = [json.loads(line) for line in f]
+        self.assertEqual([(r['model'], r['user_id']) for r in plan], [('profile', self.users[3].id)])
+
+        out = StringIO()
+        call_command('reconcile_ledger', from_plan=path, stdout=out)
+        self.assertIn('Applied 1 of 1', out.getvalue())
+        self.assertEqual(self.run_reconcile(), [])
@@ -0,0 +1,87 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from accounts.models import Profile
+from trading.models import Stock, Trade, Portfolio, OutboxEvent, RecurringOrder, AnalyticsSnapshot
+from trading.money import Money
+from trading.recurring import next_run_after, run_recurring_orders
+from trading.views import execute_trade_logic
+
+TODAY = date(2025, 1, 31)
+
+class RecurringOrderTest(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'saver{i}') for i in range(3)]
+        self.nabil = Stock.objects.create(symbol='NABIL', name='Nabil Bank', current_price=Decimal('100.00'))
+        self.ntc = Stock.objects.create(symbol='NTC', name='Nepal Telecom', current_price=Decimal('30.00'))
+
+    def plan(self, user, stock, amount, frequency='MONTHLY', next_run_date=TODAY):
+        return RecurringOrder.objects.create(user=user, stock=stock, amount=Money.parse(amount),
+                                             frequency=frequency, next_run_date=next_run_date)
+
+    def test_next_dates(self):
+        self.assertEqual(next_run_after(TODAY, 'MONTHLY', TODAY), date(2025, 2, 28))
+        self.assertEqual(next_run_after(date(2024, 11, 30), 'MONTHLY', TODAY), date(2025, 2, 28))
+        self.assertEqual(next_run_after(date(2025, 1, 20), 'WEEKLY', TODAY), date(2025, 2, 3))
+        self.assertEqual(next_run_after(TODAY, 'DAILY', TODAY), date(2025, 2, 1))
+
+    def test_due_plans_execute_in_bulk_chunks(self):
+        holder, saver, broke = self.users
+        execute_trade_logic(holder, self.nabil, 'BUY', 10, Decimal('90.00'))
+        averaged = self.plan(holder, self.nabil, '250.00')
+        first = self.plan(saver, self.ntc, '100.00', 'WEEKLY')
+        second = self.plan(saver, self.nabil, '99.00')
+        Profile.objects.filter(user=broke).update(balance=Money.parse('50.00'))
+        unpaid = self.plan(broke, self.nabil, '500.00')
+        later = self.plan(saver, self.nabil, '500.00', next_run_date=date(2025, 2, 1))
+        trades_before = Trade.objects.count()
+
+        totals = run_recurring_orders(TODAY, chunk_size=2)
+
+        self.assertEqual(totals, {'executed': 2, 'skipped': 2})
+        for plan in (averaged, first, second, unpaid, later):
+            plan.refresh_from_db()
+        self.assertEqual((averaged.last_status, averaged.last_quantity), ('EXECUTED', 2))
+        self.assertEqual((first.last_status, first.last_quantity, first.next_run_date), ('EXECUTED', 3, date(2025, 2, 7)))
+        self.assertEqual(second.last_status, 'TOO_SMALL')
+        self.assertEqual(unpaid.last_status, 'NO_FUNDS')
+        self.assertIsNone(later.last_run_at)
+        self.assertEqual(Trade.objects.count() - trades_before, 2)
+        self.assertEqual(OutboxEvent.objects.filter(payload__user_id=saver.id).count(), 1)
+
+        holding = Portfolio.objects.get(user=holder, stock=self.nabil)
+        self.assertEqual((holding.quantity, holding.average_buy_price), (12, Money.parse('91.67')))
+        saver.profile.refresh_from_db()
+        self.assertEqual(saver.profile.balance, Money.parse('9910.00'))
+        self.assertEqual(Portfolio.objects.get(user=saver, stock=self.ntc).quantity, 3)
+
+        # Nothing is due again until the next dates
+        self.assertEqual(run_recurring_orders(TODAY), {'executed': 0, 'skipped': 0})
+
+    @override_settings(ANALYTICS_QUEUE='sync')
+    def test_executed_plans_refresh_analytics_after_commit(self):
+        saver = self.users[0]
+        self.plan(saver, self.ntc, '100.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            run_recurring_orders(TODAY)
+        snapshot = AnalyticsSnapshot.objects.get(user=saver)
+        self.assertFalse(snapshot.is_stale)
+        self.assertEqual(snapshot.data['total_trades'], 1)
+
+    def test_api_starts_and_cancels_plans(self):
+        self.client.force_login(self.users[0])
+        response = self.client.post('/api/sips/', json.dumps({'symbol': 'ntc', 'amount': '1000', 'frequency': 'WEEKLY'}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        plan_id = response.json()['plan']['id']
+        self.assertEqual(self.client.get('/api/sips/').json()['plans'][0]['amount'], '1000.00')
+        self.assertTrue(self.client.post(f'/api/sips/{plan_id}/cancel/').json()['success'])
+        self.assertFalse(RecurringOrder.objects.get().is_active)
+
+        for body in ('[1]', json.dumps({'symbol': 'ntc', 'amount': '1000', 'start_date': 5})):
+            response = self.client.post('/api/sips/', body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+        self.assertEqual(RecurringOrder.objects.count(), 1)
@@ -0,0 +1,123 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from decimal import Decimal
+from io import StringIO
+
+from django.test import TestCase, TransactionTestCase, Client, RequestFactory, override_settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management import call_command
+from django.db import connections
+from django.urls import reverse
+from trading.models import Stock, Trade
+from trading_system.db_routers import (
+    ReplicaRouter, replica_reads, use_replica, is_pinned_to_primary, pin_to_primary, PIN_SESSION_KEY,
+)
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_default_to_primary(self):
+        self.assertEqual(self.router.db_for_read(Trade), 'default')
+
+    def test_replica_block_routes_reads_but_not_writes(self):
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Trade), 'replica1')
+            self.assertEqual(self.router.db_for_write(Trade), 'default')
+        self.assertEqual(self.router.db_for_read(Trade), 'default')
+
+    def test_replicas_are_never_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica1', 'trading'))
+        self.assertIsNone(self.router.allow_migrate('default', 'trading'))
+
+    def test_pinned_request_stays_on_primary(self):
+        seen = []
+
+        @use_replica
+        def view(request):
+            seen.append(self.router.db_for_read(Trade))
+
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        view(request)
+        request.session[PIN_SESSION_KEY] = time.time() + 60
+        view(request)
+        self.assertEqual(seen, ['replica1', 'default'])
+
+
+class ReadYourWritesTest(TestCase):
+    def test_trade_pins_user_to_primary(self):
+        user = User.objects.create_user(username='testuser', password='password123')
+        stock = Stock.objects.create(symbol='NABIL', name='Nabil Bank', current_price=Decimal('100.00'))
+        client = Client()
+        client.login(username='testuser', password='password123')
+        client.post(
+            reverse('quick_trade'),
+            data=json.dumps({'stock_id': stock.id, 'trade_type': 'BUY', 'quantity': 1}),
+            content_type='application/json',
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        request = RequestFactory().get('/')
+        request.session = client.session
+        self.assertTrue(is_pinned_to_primary(request))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class SyncReplicasTest(TransactionTestCase):
+    # Not a TestCase: sync_replicas closes the replica connection, which a
+    # wrapping test transaction would not survive. The replica is a real
+    # SQLite file, added to databases so it is flushed after each test.
+    @classmethod
+    def setUpClass(cls):
+        cls.replica_dir = tempfile.mkdtemp()
+        config = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(cls.replica_dir, 'replica1.sqlite3')}
+        connections.settings['replica1'] = connections.configure_settings({'default': {}, 'replica1': config})['replica1']
+        cls.class_databases = cls.databases
+        cls.databases = {*cls.databases, 'replica1'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica1'].close()
+        del connections['replica1']
+        del connections.settings['replica1']
+        cls.databases = cls.class_databases
+        shutil.rmtree(cls.replica_dir)
+
+    def test_copied_rows_are_read_through_use_replica(self):
+        Stock.objects.create(symbol='NABIL', name='Nabil Bank', current_price=Decimal('100.00'))
+        call_command('sync_replicas', stdout=StringIO())
+
+        @use_replica
+        def view(request):
+            return Stock.objects.get(symbol='NABIL')
+
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        stock = view(request)
+        self.assertEqual((stock._state.db, stock.current_price), ('replica1', Decimal('100.00')))
+
+    def test_reads_wait_for_a_sync_after_the_users_last_write(self):
+        Stock.objects.create(symbol='NABIL', name='Nabil Bank', current_price=Decimal('100.00'))
+        call_command('sync_replicas', stdout=StringIO())
+
+        @use_replica
+        def view(request):
+            return Stock.objects.get(symbol='NABIL')
+
+        # Written after the sync, with the sticky window long over
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        pin_to_primary(request, seconds=0)
+        Stock.objects.filter(symbol='NABIL').update(current_price=Decimal('120.00'))
+        self.assertEqual(view(request).current_price, Decimal('120.00'))
+
+        call_command('sync_replicas', stdout=StringIO())
+        stock = view(request)
+        self.assertEqual((stock._state.db, stock.current_price), ('replica1', Decimal('120.00')))
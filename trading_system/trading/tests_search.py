@@ -0,0 +1,54 @@
+from decimal import Decimal
+
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from trading.models import Stock
+from trading.search import StockSearchIndex, reset_stock_index
+
+class StockSearchIndexTest(TestCase):
+    def setUp(self):
+        self.index = StockSearchIndex()
+        self.index.build([
+            (1, 'NABIL', 'Nabil Bank Ltd.'),
+            (2, 'NICA', 'NIC Asia Bank Ltd.'),
+            (3, 'NTC', 'Nepal Telecom'),
+            (4, 'UPPER', 'Upper Tamakoshi Hydropower'),
+        ])
+
+    def symbols(self, query, limit=10):
+        return [symbol for _, symbol, _ in self.index.search(query, limit)]
+
+    def test_symbol_prefix_ranks_before_name_prefix(self):
+        self.assertEqual(self.symbols('n'), ['NABIL', 'NICA', 'NTC'])
+        self.assertEqual(self.symbols('nepal'), ['NTC'])
+        self.assertEqual(self.symbols('bank'), ['NABIL', 'NICA'])
+        self.assertEqual(self.symbols('n', limit=2), ['NABIL', 'NICA'])
+
+    def test_trigram_fallback_for_typos(self):
+        self.assertEqual(self.symbols('tamakosi'), ['UPPER'])
+
+    def test_incremental_add_and_remove(self):
+        self.index.add(5, 'NLIC', 'Nepal Life Insurance')
+        self.assertEqual(self.symbols('nepal'), ['NLIC', 'NTC'])
+        self.index.add(3, 'NTC', 'Nepal Doorsanchar')
+        self.assertEqual(self.symbols('telecom'), [])
+        self.index.remove(5)
+        self.assertEqual(self.symbols('nepal'), ['NTC'])
+
+
+class StockSearchViewTest(TestCase):
+    def setUp(self):
+        reset_stock_index()
+        User.objects.create_user(username='testuser', password='password123')
+        self.client = Client()
+        self.client.login(username='testuser', password='password123')
+
+    def test_search_sees_stocks_saved_after_build(self):
+        Stock.objects.create(symbol='NABIL', name='Nabil Bank', current_price=Decimal('1000.00'))
+        url = reverse('stock_search')
+        self.assertEqual([r['symbol'] for r in self.client.get(url, {'q': 'nab'}).json()['results']], ['NABIL'])
+
+        Stock.objects.create(symbol='NICA', name='NIC Asia Bank', current_price=Decimal('780.00'))
+        results = self.client.get(url, {'q': 'bank'}).json()['results']
+        self.assertEqual([r['symbol'] for r in results], ['NABIL', 'NICA'])
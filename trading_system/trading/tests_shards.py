@@ -0,0 +1,149 @@
+import datetime
+import json
+import os
+import shutil
+import tempfile
+from collections import Counter
+from decimal import Decimal
+
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connections
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import Profile
+from trading.models import Stock, Trade, Portfolio, OutboxEvent
+from trading.leaderboard import Leaderboard
+from trading.money import Money
+from trading.sharding import rebalance, sync_reference_data
+from trading.views import execute_trade_logic
+from django.core.exceptions import ImproperlyConfigured
+from trading_system.db_routers import ShardNotSelected, parse_shard_dbs, shard_for_user, user_shard
+
+SHARDS = ['shard_a', 'shard_b']
+
+
+class ShardedTestCase(TestCase):
+    """TestCase run with two SQLite user shards configured"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Two real SQLite files next to the in-memory test database. Listing
+        # them in databases makes each test run in a rolled-back transaction
+        # on both shards as well.
+        cls.shard_dir = tempfile.mkdtemp()
+        cls.shard_settings = override_settings(DATABASE_SHARDS=SHARDS)
+        cls.shard_settings.enable()
+        cls.class_databases = cls.databases
+        cls.databases = {*cls.databases, *SHARDS}
+        for alias in SHARDS:
+            config = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(cls.shard_dir, f'{alias}.sqlite3')}
+            connections.settings[alias] = connections.configure_settings({'default': {}, alias: config})[alias]
+            call_command('migrate', database=alias, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in SHARDS:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        cls.databases = cls.class_databases
+        cls.shard_settings.disable()
+        shutil.rmtree(cls.shard_dir)
+        super().tearDownClass()
+
+
+class UserShardTest(ShardedTestCase):
+    def setUp(self):
+        self.stock = Stock.objects.create(symbol='NABIL', name='Nabil Bank', current_price=Decimal('100.00'))
+        sync_reference_data()
+        # Only user3 logs in; skipping the other password hashes keeps this fast
+        self.users = [
+            User.objects.create_user(username=f'user{i}', password='password123' if i == 3 else None)
+            for i in range(12)
+        ]
+
+    def test_placement_is_stable_and_spread(self):
+        homes = [shard_for_user(user.pk) for user in self.users]
+        self.assertEqual(homes, [shard_for_user(user.pk) for user in self.users])
+        self.assertEqual(set(homes), set(SHARDS))
+
+        # A third shard only takes users from the others, never swaps them around
+        placements = [(shard_for_user(i, SHARDS), shard_for_user(i, SHARDS + ['shard_c'])) for i in range(3000)]
+        moved = Counter(after for before, after in placements if before != after)
+        self.assertEqual(set(moved), {'shard_c'})
+        self.assertAlmostEqual(moved['shard_c'] / 3000, 1 / 3, delta=0.05)
+
+    def test_shards_are_named_not_numbered(self):
+        shards = parse_shard_dbs('/data/shard_a.sqlite3, east=/data/b.sqlite3')
+        self.assertEqual(shards, [('shard_a', '/data/shard_a.sqlite3'), ('east', '/data/b.sqlite3')])
+        with self.assertRaises(ImproperlyConfigured):
+            parse_shard_dbs('/a/users.sqlite3,/b/users.sqlite3')
+
+        # Dropping or reordering an entry keeps the other shards' users in place
+        names = [alias for alias, _ in parse_shard_dbs('/d/a.db,/d/b.db,/d/c.db')]
+        remaining = [alias for alias, _ in parse_shard_dbs('/d/c.db,/d/a.db')]
+        for user_id in range(500):
+            home = shard_for_user(user_id, names)
+            if home != 'b':
+                self.assertEqual(shard_for_user(user_id, remaining), home)
+
+    def test_trades_are_written_to_the_home_shard(self):
+        for user in self.users:
+            success, _, _ = execute_trade_logic(user, self.stock, 'BUY', 2, self.stock.current_price)
+            self.assertTrue(success)
+
+        for alias in SHARDS:
+            on_shard = {user.pk for user in self.users if shard_for_user(user.pk) == alias}
+            self.assertEqual(set(Trade.objects.using(alias).values_list('user_id', flat=True)), on_shard)
+            self.assertEqual(set(Profile.objects.using(alias).values_list('user_id', flat=True)), on_shard)
+            self.assertEqual(OutboxEvent.objects.using(alias).count(), len(on_shard))
+        self.assertFalse(Trade.objects.using('default').exists())
+
+        with self.assertRaises(ShardNotSelected):
+            Trade.objects.count()
+        user = self.users[0]
+        with user_shard(user.pk):
+            self.assertEqual(Portfolio.objects.get(user=user).quantity, 2)
+        self.assertEqual(user.profile.balance, Money.parse('9800.00'))
+
+        board = Leaderboard.from_database()
+        self.assertEqual(len(board), len(self.users))
+        self.assertEqual(board.market_value(self.stock.id), Money.parse('2400.00').paisa)
+
+    def test_views_read_the_signed_in_users_shard(self):
+        client = Client()
+        client.login(username='user3', password='password123')
+        client.post(
+            reverse('quick_trade'),
+            data=json.dumps({'stock_id': self.stock.id, 'trade_type': 'BUY', 'quantity': 3}),
+            content_type='application/json',
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        trades = json.loads(client.get(reverse('trade_history_api')).content)['trades']
+        self.assertEqual([(row['symbol'], row['quantity']) for row in trades], [('NABIL', 3)])
+        self.assertEqual(client.get(reverse('portfolio')).status_code, 200)
+
+    def test_rebalance_moves_users_off_the_primary(self):
+        # Rows written before sharding was switched on
+        traded_at = timezone.now() - datetime.timedelta(days=30)
+        with override_settings(DATABASE_SHARDS=[]):
+            for user in self.users[:4]:
+                Profile.objects.create(user=user)
+                Portfolio.objects.create(user=user, stock=self.stock, quantity=5, average_buy_price=Decimal('90.00'))
+                Trade.objects.create(user=user, stock=self.stock, trade_type='BUY', quantity=5, price=Decimal('90.00'))
+            Trade.objects.update(timestamp=traded_at)
+        for user in self.users[:4]:
+            Profile.objects.using(shard_for_user(user.pk)).filter(user=user).delete()
+
+        summary = rebalance(['default'])
+        self.assertEqual(sum(summary.values()), 4)
+        self.assertFalse(Trade.objects.using('default').exists())
+        self.assertFalse(Profile.objects.using('default').exists())
+        for user in self.users[:4]:
+            home = shard_for_user(user.pk)
+            trade = Trade.objects.using(home).get(user=user)
+            self.assertEqual((trade.quantity, trade.price, trade.timestamp), (5, Money.parse('90.00'), traded_at))
+            self.assertEqual(Portfolio.objects.using(home).get(user=user).average_buy_price, Money.parse('90.00'))
+        self.assertEqual(rebalance(), {})
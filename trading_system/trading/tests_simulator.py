@@ -0,0 +1,30 @@
+from decimal import Decimal
+
+import numpy as np
+from django.test import TestCase
+from trading.models import Stock
+from trading.simulator import MarketSimulator, write_prices
+
+class MarketSimulatorTest(TestCase):
+    def test_prices_stay_inside_circuit_band(self):
+        sim = MarketSimulator([100.0, 200.0], ['Banking', 'Hydropower'], previous_close=[100.0, 200.0],
+                              volatility=5.0, circuit_limit=0.10, seed=7)
+        for _ in range(20):
+            prices = sim.advance(500)
+            self.assertTrue(np.all(prices >= np.array([90.0, 180.0]) - 1e-9))
+            self.assertTrue(np.all(prices <= np.array([110.0, 220.0]) + 1e-9))
+        self.assertEqual(sim.ticks, 20 * 500 * 2)
+
+    def test_same_sector_shocks_are_correlated(self):
+        sim = MarketSimulator([1.0] * 3, ['Banking', 'Banking', 'Hydropower'], sector_correlation=0.8, seed=1)
+        corr = np.corrcoef(sim.shocks(20000).T)
+        self.assertAlmostEqual(corr[0, 1], 0.8, delta=0.05)
+        self.assertAlmostEqual(corr[0, 2], 0.0, delta=0.05)
+
+    def test_write_prices_updates_changed_stocks(self):
+        Stock.objects.create(symbol='NABIL', name='Nabil Bank', sector='Banking', current_price=Decimal('1000.00'))
+        Stock.objects.create(symbol='API', name='Api Power', sector='Hydropower', current_price=Decimal('160.00'))
+        sim, stocks = MarketSimulator.from_stocks(Stock.objects.order_by('id'), seed=3)
+        changed = write_prices(stocks, np.array([1012.347, 160.0]))
+        self.assertEqual([s.symbol for s in changed], ['NABIL'])
+        self.assertEqual(Stock.objects.get(symbol='NABIL').current_price, Decimal('1012.35'))
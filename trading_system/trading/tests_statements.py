@@ -0,0 +1,86 @@
+import os
+import tempfile
+from datetime import datetime, timezone
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth.models import User
+from trading.models import Stock, Trade
+from trading.money import Money
+from trading.statements import generate_statements, read_statements, fiscal_year_bounds
+
+def at(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+class StatementTest(TestCase):
+    def setUp(self):
+        self.active, self.holder, self.closed = [User.objects.create_user(username=name) for name in ('active', 'holder', 'closed')]
+        self.nabil = Stock.objects.create(symbol='NABIL', name='Nabil Bank', current_price=Decimal('150.00'))
+        self.ntc = Stock.objects.create(symbol='NTC', name='Nepal Telecom', current_price=Decimal('900.00'))
+        for user, stock, trade_type, quantity, price, timestamp in [
+            (self.active, self.nabil, 'BUY', 10, '100.00', at(2024, 1, 10)),
+            (self.active, self.nabil, 'BUY', 10, '120.00', at(2024, 8, 1)),
+            (self.active, self.nabil, 'SELL', 5, '150.00', at(2024, 9, 1)),
+            (self.active, self.ntc, 'BUY', 3, '900.00', at(2025, 3, 1)),
+            (self.active, self.ntc, 'SELL', 3, '880.00', at(2025, 7, 1)),
+            # After the year end: not on the statement
+            (self.active, self.nabil, 'SELL', 15, '200.00', at(2025, 8, 1)),
+            (self.holder, self.ntc, 'BUY', 5, '800.00', at(2023, 12, 1)),
+            (self.closed, self.ntc, 'BUY', 5, '800.00', at(2023, 12, 1)),
+            (self.closed, self.ntc, 'SELL', 5, '810.00', at(2024, 2, 1)),
+        ]:
+            trade = Trade.objects.create(user=user, stock=stock, trade_type=trade_type, quantity=quantity,
+                                         price=Money.parse(price))
+            Trade.objects.filter(pk=trade.pk).update(timestamp=timestamp)
+
+    def statements(self, directory):
+        return {
+            statement['username']: statement
+            for name in sorted(os.listdir(directory)) if name.endswith('.jsonl.gz')
+            for statement in read_statements(os.path.join(directory, name))
+        }
+
+    def test_realized_gains_use_the_average_cost(self):
+        start, end = fiscal_year_bounds(2024)
+        # Shrawan 1 moves between 16 and 17 July
+        self.assertEqual((start.isoformat(), end.isoformat()), ('2024-07-16T00:00:00+05:45', '2025-07-17T00:00:00+05:45'))
+        with self.assertRaises(ValueError):
+            fiscal_year_bounds(2010)
+        with tempfile.TemporaryDirectory() as tmp:
+            directory, totals = generate_statements(2024, output_dir=tmp)
+            self.assertEqual(totals, {'ranges': 1, 'resumed': 0, 'users': 2, 'transactions': 4, 'users_per_range': 2000})
+            statements = self.statements(directory)
+
+        self.assertEqual(set(statements), {'active', 'holder'})
+        active = statements['active']
+        self.assertEqual(active['fiscal_year'], 'FY2024-25')
+        self.assertEqual(active['opening_positions'], [{'symbol': 'NABIL', 'quantity': 10, 'average_cost': '100.00'}])
+        self.assertEqual(active['realized'], [
+            {'symbol': 'NABIL', 'quantity_sold': 5, 'proceeds': '750.00', 'cost': '550.00', 'gain': '200.00'},
+            {'symbol': 'NTC', 'quantity_sold': 3, 'proceeds': '2640.00', 'cost': '2700.00', 'gain': '-60.00'},
+        ])
+        self.assertEqual(active['total_realized_gain'], '140.00')
+        self.assertEqual(active['closing_positions'], [{'symbol': 'NABIL', 'quantity': 15, 'average_cost': '110.00'}])
+        self.assertEqual(active['transactions'][0]['date'], '2024-08-01T05:45:00+05:45')
+        self.assertEqual(statements['holder']['transactions'], [])
+        self.assertEqual(statements['holder']['closing_positions'], statements['holder']['opening_positions'])
+
+    def test_a_stopped_run_resumes_from_its_manifest(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            directory, totals = generate_statements(2024, output_dir=tmp, users_per_range=1)
+            self.assertEqual((totals['ranges'], totals['users']), (4, 2))
+            before = self.statements(directory)
+
+            # Lose one finished range; a new user must not move the recorded ranges
+            os.remove(os.path.join(directory, sorted(n for n in os.listdir(directory) if n.endswith('.gz'))[0]))
+            User.objects.create_user(username='late')
+            directory, totals = generate_statements(2024, output_dir=tmp, users_per_range=1)
+            self.assertEqual((totals['ranges'], totals['resumed'], totals['users']), (4, 3, 1))
+            self.assertEqual(self.statements(directory), before)
+
+            # A different range size cannot apply to a started year
+            err = StringIO()
+            call_command('generate_statements', 2024, output_dir=tmp, users_per_range=500, stdout=StringIO(), stderr=err)
+            self.assertIn('--users-per-range 500 ignored', err.getvalue())
@@ -1,20 +1,40 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
+from django.conf import settings
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.db import transaction
 from django.db.models import Q, Sum, Count, Avg
-from decimal import Decimal
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+import base64
+import csv
+import hashlib
 import json
 from datetime import datetime, timedelta
 import random
 
-from .models import Stock, Trade, Portfolio
+from .models import Stock, Trade, Portfolio, Watchlist, PriceAlert, AnalyticsSnapshot, RecurringOrder, IPO, IPOApplication
+from .money import Money, ZERO, total_value
 from .forms import TradeForm
+from .analytics import load_analytics, refresh_user_analytics
+from .corporate_actions import PriceAdjuster
+from .search import get_stock_index
+from .leaderboard import get_leaderboard
+from .ratelimit import rate_limited
+from .outbox import publish_trade
+from .auction import market_phase, market_now, queue_auction_order
+from .rebalance import RebalanceError, plan_rebalance, execute_rebalance
+from .ipo import apply_for_ipo
+from trading_system.db_routers import PRIMARY_DB, use_replica, read_db_for, user_shard
 
 # Helper Functions
 def validate_trade(user, stock, trade_type, quantity, price):
     """Validate if a trade can be executed"""
-    total_cost = Decimal(str(quantity)) * Decimal(str(price))
+    total_cost = Money.parse(price) * quantity
     
     if trade_type == 'BUY':
         if user.profile.balance < total_cost:
@@ -32,96 +52,151 @@ def validate_trade(user, stock, trade_type, quantity, price):
 def execute_trade_logic(user, stock, trade_type, quantity, price):
     """Execute the trade logic (Update balance, portfolio, create record)"""
     try:
-        total_value = Decimal(str(quantity)) * Decimal(str(price))
-        profit_loss = Decimal('0.00')
+        # Balance, holdings, trade and outbox event commit or roll back
+        # together, on the user's shard
+        with user_shard(user.pk) as db, transaction.atomic(using=db):
+            price = Money.parse(price)
+            total_value = price * quantity
+            profit_loss = ZERO
         
-        if trade_type == 'BUY':
-            # Double check validation to be safe
-            if user.profile.balance < total_value:
-                return False, "Insufficient balance", None
-
-            # Update balance
-            user.profile.balance -= total_value
-            user.profile.save()
+            if trade_type == 'BUY':
+                # Double check validation to be safe
+                if user.profile.balance < total_value:
+                    return False, "Insufficient balance", None
+
+                # Update balance
+                user.profile.balance -= total_value
+                user.profile.save()
             
-            # Update Portfolio
-            portfolio_item, created = Portfolio.objects.get_or_create(
-                user=user,
-                stock=stock,
-                defaults={'quantity': 0, 'average_buy_price': 0}
-            )
+                # Update Portfolio
+                portfolio_item, created = Portfolio.objects.get_or_create(
+                    user=user,
+                    stock=stock,
+                    defaults={'quantity': 0, 'average_buy_price': 0}
+                )
             
-            # Calculate new average price
-            current_total_value = portfolio_item.quantity * portfolio_item.average_buy_price
-            new_total_value = current_total_value + total_value
-            new_quantity = portfolio_item.quantity + quantity
+                # Calculate new average price
+                current_total_value = portfolio_item.quantity * portfolio_item.average_buy_price
+                new_total_value = current_total_value + total_value
+                new_quantity = portfolio_item.quantity + quantity
             
-            if new_quantity > 0:
-                new_avg_price = new_total_value / new_quantity
-            else:
-                new_avg_price = price # Should not happen for buy
+                if new_quantity > 0:
+                    new_avg_price = new_total_value / new_quantity
+                else:
+                    new_avg_price = price # Should not happen for buy
                 
-            portfolio_item.quantity = new_quantity
-            portfolio_item.average_buy_price = new_avg_price
-            portfolio_item.save()
+                portfolio_item.quantity = new_quantity
+                portfolio_item.average_buy_price = new_avg_price
+                portfolio_item.save()
             
-            message = f"Bought {quantity} shares of {stock.symbol} at Rs.{price:.2f}"
+                message = f"Bought {quantity} shares of {stock.symbol} at Rs.{price:.2f}"
             
-        else: # SELL
-            portfolio_item = Portfolio.objects.get(user=user, stock=stock)
-            if portfolio_item.quantity < quantity:
-                return False, "Insufficient shares", None
+            else: # SELL
+                portfolio_item = Portfolio.objects.get(user=user, stock=stock)
+                if portfolio_item.quantity < quantity:
+                    return False, "Insufficient shares", None
                 
-            # Calculate profit/loss
-            profit_loss = (Decimal(str(price)) - portfolio_item.average_buy_price) * quantity
+                # Calculate profit/loss
+                profit_loss = (price - portfolio_item.average_buy_price) * quantity
             
-            # Update Portfolio
-            portfolio_item.quantity -= quantity
-            if portfolio_item.quantity == 0:
-                portfolio_item.delete()
-            else:
-                portfolio_item.save()
+                # Update Portfolio
+                portfolio_item.quantity -= quantity
+                if portfolio_item.quantity == 0:
+                    portfolio_item.delete()
+                else:
+                    portfolio_item.save()
                 
-            # Update Balance
-            user.profile.balance += total_value
-            user.profile.save()
+                # Update Balance
+                user.profile.balance += total_value
+                user.profile.save()
             
-            pl_text = "profit" if profit_loss >= 0 else "loss"
-            message = f"Sold {quantity} shares of {stock.symbol} at Rs.{price:.2f} (Rs.{abs(profit_loss):.2f} {pl_text})"
-
-        # Create Trade Record
-        trade = Trade.objects.create(
-            user=user,
-            stock=stock,
-            trade_type=trade_type,
-            quantity=quantity,
-            price=price
-        )
-        
-        return True, message, {'trade': trade, 'profit_loss': profit_loss}
+                pl_text = "profit" if profit_loss >= 0 else "loss"
+                message = f"Sold {quantity} shares of {stock.symbol} at Rs.{price:.2f} (Rs.{abs(profit_loss):.2f} {pl_text})"
+
+            # Create Trade Record and its outbox event
+            trade = Trade.objects.create(
+                user=user,
+                stock=stock,
+                trade_type=trade_type,
+                quantity=quantity,
+                price=price
+            )
+            publish_trade(trade, profit_loss)
+
+            return True, message, {'trade': trade, 'profit_loss': profit_loss}
 
     except Exception as e:
         return False, str(e), None
 
 
+TRADE_HISTORY_PAGE_SIZE = 50
+TRADE_HISTORY_MAX_PAGE_SIZE = 500
+TRADE_EXPORT_CHUNK_SIZE = 2000
+
+def encode_trade_cursor(trade):
+    """Encode the (timestamp, id) position of a trade as an opaque cursor"""
+    raw = f"{trade.timestamp.isoformat()}|{trade.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_trade_cursor(cursor):
+    """Decode a cursor back into (timestamp, id), or raise ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp_str, trade_id = raw.rsplit('|', 1)
+        timestamp = parse_datetime(timestamp_str)
+        trade_id = int(trade_id)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+    if timestamp is None:
+        raise ValueError('Invalid cursor')
+    return timestamp, trade_id
+
+def trades_before(queryset, cursor):
+    """Keyset filter: trades strictly older than the cursor in (timestamp, id) order"""
+    timestamp, trade_id = decode_trade_cursor(cursor)
+    return queryset.filter(
+        Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=trade_id)
+    )
+
+DEFAULT_WATCHLIST = ['NABIL', 'NTC', 'HDL', 'NICA', 'SHPC']
+MAX_QUOTE_SYMBOLS = 100
+STOCK_SEARCH_MAX_RESULTS = 20
+LEADERBOARD_MAX_RESULTS = 100
+
+def watchlist_symbols(user, held_symbols=()):
+    """Symbols the user watches, falling back to their holdings plus the default list"""
+    symbols = list(Watchlist.objects.filter(user=user).values_list('stock__symbol', flat=True))
+    if symbols:
+        return symbols
+    held_symbols = list(held_symbols)
+    return held_symbols + [symbol for symbol in DEFAULT_WATCHLIST if symbol not in held_symbols]
+
+def quotes_etag(quotes):
+    """Strong validator over the symbol set and each quote's price version"""
+    digest = hashlib.md5()
+    for quote in quotes:
+        digest.update(f"{quote['symbol']}:{quote['last_updated'].timestamp()};".encode())
+    return f'"{digest.hexdigest()}"'
+
+class Echo:
+    """File-like object that hands back what is written, for streaming csv.writer output"""
+    def write(self, value):
+        return value
+
+
 @login_required
+@use_replica
 def dashboard(request):
     """Enhanced dashboard with portfolio overview"""
-    # Get user's portfolio
-    portfolio_items = Portfolio.objects.filter(user=request.user).select_related('stock')
-    
-    # Calculate portfolio statistics
-    total_invested = Decimal('0.00')
-    total_current = Decimal('0.00')
-    total_profit_loss = Decimal('0.00')
-    todays_pl = Decimal('0.00')
+    # Get user's portfolio (stocks prefetched, so live prices come from the
+    # primary even when holdings sit on a user shard)
+    portfolio_items = Portfolio.objects.filter(user=request.user).prefetch_related('stock')
     
-    for item in portfolio_items:
-        # We access properties directly instead of assigning them
-        total_invested += item.invested_value
-        total_current += item.current_value
-        total_profit_loss += item.profit_loss
-        todays_pl += item.todays_change
+    # Calculate portfolio statistics (summed as integer paisa)
+    total_invested = total_value((item.quantity, item.average_buy_price) for item in portfolio_items)
+    total_current = total_value((item.quantity, item.stock.current_price) for item in portfolio_items)
+    total_profit_loss = total_current - total_invested
+    todays_pl = total_value((item.quantity, item.stock.todays_change) for item in portfolio_items)
     
     # Get recent trades
     recent_trades = Trade.objects.filter(user=request.user).order_by('-timestamp')[:5]
@@ -137,28 +212,29 @@ def dashboard(request):
         {'title': 'SEBON approves new IPOs', 'time': '4 hours ago', 'impact': 'positive'},
     ]
     
-    # Get watchlist
+    # Get watchlist (portfolio_items is already evaluated above)
     watchlist_stocks = Stock.objects.filter(
-        Q(symbol__in=[item.stock.symbol for item in portfolio_items]) | 
-        Q(symbol__in=['NABIL', 'NTC', 'HDL', 'NICA', 'SHPC'])
-    ).distinct()[:8]
+        symbol__in=watchlist_symbols(request.user, [item.stock.symbol for item in portfolio_items])
+    )[:8]
     
     context = {
         'portfolio_items': portfolio_items,
         'total_invested': total_invested,
         'total_current': total_current,
         'total_profit_loss': total_profit_loss,
-        'total_profit_loss_percentage': (total_profit_loss / total_invested * 100) if total_invested > 0 else Decimal('0.00'),
+        'total_profit_loss_percentage': (total_profit_loss / total_invested * 100) if total_invested > 0 else 0,
         'todays_pl': todays_pl,
         'balance': request.user.profile.balance,
         'recent_trades': recent_trades,
         'market_news': market_news,
         'watchlist_stocks': watchlist_stocks,
+        'watchlist_symbols': ','.join(stock.symbol for stock in watchlist_stocks),
         'all_stocks': all_stocks,
     }
     return render(request, 'trading/dashboard.html', context)
 
 @login_required
+@rate_limited('trade')
 def trade_view(request):
     """Trade page with buy/sell functionality"""
     if request.method == 'POST':
@@ -171,12 +247,28 @@ def trade_view(request):
             quantity = trade_data['quantity']
             price = stock.current_price # Use current price
             
+            phase = market_phase()
+            if phase == 'CLOSED':
+                messages.error(request, 'The market is closed')
+                return redirect('trade')
+            
             # Validate
-            is_valid, error_msg = validate_trade(request.user, stock, trade_type, quantity, price)
+            limit_price = trade_data.get('limit_price')
+            check_price = price if phase == 'CONTINUOUS' or limit_price is None else limit_price
+            is_valid, error_msg = validate_trade(request.user, stock, trade_type, quantity, check_price)
             if not is_valid:
                 messages.error(request, error_msg)
                 return redirect('trade')
             
+            if phase == 'PRE_OPEN':
+                # Filled by the opening auction
+                success, message, _ = queue_auction_order(request.user, stock, trade_type, quantity, limit_price)
+                if success:
+                    messages.success(request, message)
+                    return redirect('dashboard')
+                messages.error(request, message)
+                return redirect('trade')
+            
             # Execute
             success, message, result = execute_trade_logic(request.user, stock, trade_type, quantity, price)
             
@@ -197,32 +289,32 @@ def trade_view(request):
         else:
             form = TradeForm()
     
-    stocks = Stock.objects.all()
-    user_portfolio = Portfolio.objects.filter(user=request.user).select_related('stock')
+    user_portfolio = Portfolio.objects.filter(user=request.user).prefetch_related('stock')
+    # Only the user's holdings and watchlist are listed; anything else is found via search
+    stocks = Stock.objects.filter(
+        symbol__in=watchlist_symbols(request.user, [item.stock.symbol for item in user_portfolio])
+    ).order_by('symbol')
     
     context = {
         'form': form,
+        'selected_stock': form.initial.get('stock'),
         'stocks': stocks,
         'user_portfolio': user_portfolio,
         'balance': request.user.profile.balance,
+        'market_phase': market_phase(),
     }
     return render(request, 'trading/trade.html', context)
 
 @login_required
+@use_replica
 def portfolio_view(request):
     """Portfolio management page"""
-    portfolio_items = Portfolio.objects.filter(user=request.user).select_related('stock')
+    portfolio_items = Portfolio.objects.filter(user=request.user).prefetch_related('stock')
     
-    # Calculate totals
-    total_invested = Decimal('0.00')
-    total_current = Decimal('0.00')
-    todays_pl = Decimal('0.00')
-    
-    for item in portfolio_items:
-        # Access properties directly
-        total_invested += item.invested_value
-        total_current += item.current_value
-        todays_pl += item.todays_change
+    # Calculate totals (summed as integer paisa)
+    total_invested = total_value((item.quantity, item.average_buy_price) for item in portfolio_items)
+    total_current = total_value((item.quantity, item.stock.current_price) for item in portfolio_items)
+    todays_pl = total_value((item.quantity, item.stock.todays_change) for item in portfolio_items)
     
     total_pl = total_current - total_invested
     total_pl_percentage = (total_pl / total_invested * 100) if total_invested > 0 else 0
@@ -254,46 +346,30 @@ def portfolio_view(request):
     return render(request, 'trading/portfolio.html', context)
 
 @login_required
+@use_replica
 def analytics_view(request):
-    """Trading analytics page"""
-    # Get all trades
-    trades = Trade.objects.filter(user=request.user).order_by('-timestamp')
-    
-    # Calculate basic stats
-    total_trades = trades.count()
-    buy_trades = trades.filter(trade_type='BUY').count()
-    sell_trades = trades.filter(trade_type='SELL').count()
-    
-    # Calculate profit/loss from sells
-    profitable_trades = 0
-    total_profit = Decimal('0.00')
-    
-    for trade in trades.filter(trade_type='SELL'):
-        try:
-            # Find corresponding buy (simplified)
-            buy_trade = Trade.objects.filter(
-                user=request.user,
-                stock=trade.stock,
-                trade_type='BUY',
-                timestamp__lt=trade.timestamp
-            ).order_by('-timestamp').first()
-            
-            if buy_trade:
-                profit = (trade.price - buy_trade.price) * trade.quantity
-                total_profit += profit
-                if profit > 0:
-                    profitable_trades += 1
-        except:
-            pass
-    
-    win_rate = (profitable_trades / sell_trades * 100) if sell_trades > 0 else 0
+    """Trading analytics page, served from the precomputed snapshot"""
+    # The snapshot decides whether to recompute, so read it where the worker writes it
+    snapshot = AnalyticsSnapshot.objects.using(PRIMARY_DB).filter(user=request.user).first()
+    if snapshot is None or snapshot.data is None:
+        # First visit: nothing cached yet, so compute once inline
+        analytics = refresh_user_analytics(request.user.id)
+        computed_at = timezone.now()
+        refreshing = False
+    elif snapshot.is_stale and snapshot.requested_at and (
+        snapshot.requested_at < timezone.now() - timedelta(seconds=settings.ANALYTICS_INLINE_AFTER)
+    ):
+        # Nothing picked the refresh up (no worker running?): compute it here rather than wait forever
+        analytics = refresh_user_analytics(request.user.id)
+        computed_at = timezone.now()
+        refreshing = False
+    else:
+        analytics = snapshot.data
+        computed_at = snapshot.computed_at
+        refreshing = snapshot.is_stale
+    analytics = load_analytics(analytics)
     
-    # Portfolio performance
-    portfolio_items = Portfolio.objects.filter(user=request.user)
-    total_invested = sum(item.quantity * item.average_buy_price for item in portfolio_items)
-    total_current = sum(item.quantity * item.stock.current_price for item in portfolio_items)
-    portfolio_return = total_current - total_invested
-    portfolio_return_percentage = (portfolio_return / total_invested * 100) if total_invested > 0 else 0
+    trades = Trade.objects.filter(user=request.user).select_related('stock').order_by('-timestamp')
     
     # Monthly performance (simulated)
     months = []
@@ -307,29 +383,26 @@ def analytics_view(request):
             'color': 'success' if performance > 0 else 'danger'
         })
     
-    # Most traded stocks
-    most_traded = trades.values('stock__symbol').annotate(
-        count=Count('id'),
-        total_volume=Sum('quantity')
-    ).order_by('-count')[:5]
-    
     context = {
         'trades': trades[:20],
-        'total_trades': total_trades,
-        'buy_trades': buy_trades,
-        'sell_trades': sell_trades,
-        'win_rate': win_rate,
-        'total_profit': total_profit,
-        'profit_loss': portfolio_return,
-        'profit_loss_percentage': portfolio_return_percentage,
-        'total_portfolio_value': total_current + request.user.profile.balance,
+        'total_trades': analytics['total_trades'],
+        'buy_trades': analytics['buy_trades'],
+        'sell_trades': analytics['sell_trades'],
+        'win_rate': analytics['win_rate'],
+        'total_profit': analytics['total_profit'],
+        'profit_loss': analytics['profit_loss'],
+        'profit_loss_percentage': analytics['profit_loss_percentage'],
+        'total_portfolio_value': analytics['total_current'] + request.user.profile.balance,
         'months': months,
-        'most_traded': most_traded,
+        'most_traded': analytics['most_traded'],
         'balance': request.user.profile.balance,
+        'computed_at': computed_at,
+        'refreshing': refreshing,
     }
     return render(request, 'trading/analytics.html', context)
 
 @login_required
+@rate_limited('quick_trade')
 def quick_trade(request):
     """Handle quick trades via AJAX"""
     if request.method == 'POST' and request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -342,11 +415,24 @@ def quick_trade(request):
             stock = get_object_or_404(Stock, id=stock_id)
             price = stock.current_price
             
+            phase = market_phase()
+            if phase == 'CLOSED':
+                return JsonResponse({'success': False, 'error': 'The market is closed'})
+            
             # Validate
-            is_valid, error_msg = validate_trade(request.user, stock, trade_type, quantity, price)
+            limit_price = Money.parse(data.get('limit_price') or None)
+            check_price = price if phase == 'CONTINUOUS' or limit_price is None else limit_price
+            is_valid, error_msg = validate_trade(request.user, stock, trade_type, quantity, check_price)
             if not is_valid:
                 return JsonResponse({'success': False, 'error': error_msg})
             
+            if phase == 'PRE_OPEN':
+                # Filled by the opening auction
+                success, message, order = queue_auction_order(request.user, stock, trade_type, quantity, limit_price)
+                if not success:
+                    return JsonResponse({'success': False, 'error': message})
+                return JsonResponse({'success': True, 'queued': True, 'order_id': order.id, 'message': message})
+            
             # Execute
             success, message, result = execute_trade_logic(request.user, stock, trade_type, quantity, price)
             
@@ -366,4 +452,362 @@ def quick_trade(request):
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)})
     
-    return JsonResponse({'success': False, 'error': 'Invalid request'})
\ No newline at end of file
+    return JsonResponse({'success': False, 'error': 'Invalid request'})
+
+@login_required
+@use_replica
+def trade_history_api(request):
+    """Cursor-paginated JSON trade history, newest first"""
+    try:
+        limit = int(request.GET.get('limit', TRADE_HISTORY_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid limit'}, status=400)
+    limit = max(1, min(limit, TRADE_HISTORY_MAX_PAGE_SIZE))
+    
+    trades = Trade.objects.filter(user=request.user).select_related('stock').order_by('-timestamp', '-id')
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            trades = trades_before(trades, cursor)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    # Fetch one extra row to know whether another page exists
+    page = list(trades[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    # Prices as traded, plus the same trade restated after later bonus issues and splits
+    adjuster = PriceAdjuster.for_stocks({trade.stock_id for trade in page})
+    
+    return JsonResponse({
+        'success': True,
+        'trades': [
+            {
+                'id': trade.id,
+                'timestamp': trade.timestamp.isoformat(),
+                'symbol': trade.stock.symbol,
+                'trade_type': trade.trade_type,
+                'quantity': trade.quantity,
+                'price': str(trade.price),
+                'total_value': str(trade.total_value),
+                'adjusted_quantity': adjuster.quantity(trade.stock_id, trade.timestamp, trade.quantity),
+                'adjusted_price': str(adjuster.price(trade.stock_id, trade.timestamp, trade.price)),
+            }
+            for trade in page
+        ],
+        'next_cursor': encode_trade_cursor(page[-1]) if has_more else None,
+    })
+
+@login_required
+def export_trades_csv(request):
+    """Stream the user's full trade history as CSV without loading it into memory"""
+    # The response is consumed after the view returns, so bind the database up front
+    trades = Trade.objects.using(read_db_for(request, Trade)).filter(user=request.user).order_by('-timestamp', '-id').values_list(
+        'timestamp', 'stock__symbol', 'trade_type', 'quantity', 'price'
+    )
+    writer = csv.writer(Echo())
+    
+    def rows():
+        yield writer.writerow(['Timestamp', 'Symbol', 'Type', 'Quantity', 'Price', 'Total'])
+        for timestamp, symbol, trade_type, quantity, price in trades.iterator(chunk_size=TRADE_EXPORT_CHUNK_SIZE):
+            yield writer.writerow([timestamp.isoformat(), symbol, trade_type, quantity, price, quantity * price])
+    
+    response = StreamingHttpResponse(rows(), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="trade_history.csv"'
+    return response
+
+@login_required
+@use_replica
+def quotes_api(request):
+    """Bulk quotes for ?symbols=A,B,C (default: the user's watchlist) with ETag/Last-Modified"""
+    symbols_param = request.GET.get('symbols')
+    if symbols_param:
+        symbols = [symbol.strip().upper() for symbol in symbols_param.split(',') if symbol.strip()]
+    else:
+        symbols = watchlist_symbols(request.user)
+    symbols = symbols[:MAX_QUOTE_SYMBOLS]
+    
+    quotes = list(
+        Stock.objects.filter(symbol__in=symbols).order_by('symbol')
+        .values('symbol', 'name', 'current_price', 'previous_close', 'last_updated')
+    )
+    etag = quotes_etag(quotes)
+    last_modified = int(max(q['last_updated'] for q in quotes).timestamp()) if quotes else None
+    
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = JsonResponse({
+            'success': True,
+            'quotes': [
+                {
+                    'symbol': q['symbol'],
+                    'name': q['name'],
+                    'price': str(q['current_price']),
+                    'previous_close': str(q['previous_close']),
+                    'change': str(q['current_price'] - q['previous_close']),
+                    'last_updated': q['last_updated'].isoformat(),
+                }
+                for q in quotes
+            ],
+        })
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Let clients keep the payload but revalidate on every poll
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+@login_required
+def watchlist_toggle(request):
+    """Add or remove a symbol from the user's watchlist via AJAX"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request'})
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid request'})
+    if not isinstance(data, dict):
+        return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
+    
+    stock = get_object_or_404(Stock, symbol=str(data.get('symbol', '')).upper())
+    if data.get('action') == 'remove':
+        Watchlist.objects.filter(user=request.user, stock=stock).delete()
+        watching = False
+    else:
+        Watchlist.objects.get_or_create(user=request.user, stock=stock)
+        watching = True
+    return JsonResponse({'success': True, 'symbol': stock.symbol, 'watching': watching})
+
+@login_required
+def stock_search(request):
+    """Autocomplete over stock symbols and names, served from the in-memory index"""
+    try:
+        limit = min(int(request.GET.get('limit', 10)), STOCK_SEARCH_MAX_RESULTS)
+    except ValueError:
+        limit = 10
+    matches = get_stock_index().search(request.GET.get('q', ''), limit)
+    return JsonResponse({
+        'results': [
+            {'id': stock_id, 'symbol': symbol, 'name': name}
+            for stock_id, symbol, name in matches
+        ]
+    })
+
+@login_required
+def leaderboard_api(request):
+    """Top users by equity plus the requesting user's own rank"""
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 10)), LEADERBOARD_MAX_RESULTS))
+        offset = max(0, int(request.GET.get('offset', 0)))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid limit'}, status=400)
+    
+    board = get_leaderboard()
+    entries = board.top(limit, offset)
+    usernames = dict(User.objects.filter(id__in=[user_id for _, user_id, _ in entries]).values_list('id', 'username'))
+    equity = board.equity.get(request.user.id)
+    return JsonResponse({
+        'success': True,
+        'total_users': len(board),
+        'leaders': [
+            {'rank': rank, 'username': usernames.get(user_id, ''), 'equity': str(Money(paisa))}
+            for rank, user_id, paisa in entries
+        ],
+        'you': {
+            'rank': board.rank(request.user.id),
+            'equity': str(Money(equity)) if equity is not None else None,
+        },
+    })
+
+def serialize_rebalance_plan(plan):
+    return {
+        'orders': [
+            {
+                'stock_id': order['stock_id'],
+                'symbol': order['symbol'],
+                'side': order['side'],
+                'quantity': order['quantity'],
+                'price': str(order['price']),
+                'value': str(order['quantity'] * order['price']),
+            }
+            for order in plan['orders']
+        ],
+        'equity': str(plan['equity']),
+        'cash_before': str(plan['cash_before']),
+        'cash_after': str(plan['cash_after']),
+        'weights_before': {symbol: round(weight, 4) for symbol, weight in plan['weights_before'].items()},
+        'weights_after': {symbol: round(weight, 4) for symbol, weight in plan['weights_after'].items()},
+    }
+
+@login_required
+def rebalance_preview(request):
+    """Orders that would bring holdings to the posted target weights (nothing is traded)"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'POST required'}, status=405)
+    try:
+        data = json.loads(request.body)
+        plan = plan_rebalance(request.user, data.get('targets') or {})
+    except (ValueError, AttributeError) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    return JsonResponse({'success': True, **serialize_rebalance_plan(plan)})
+
+@login_required
+@rate_limited('rebalance')
+def rebalance_execute(request):
+    """Execute previewed rebalance orders as one batch, all or nothing"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'POST required'}, status=405)
+    if market_phase() != 'CONTINUOUS':
+        return JsonResponse({'success': False, 'error': 'Rebalancing needs continuous trading'})
+    try:
+        data = json.loads(request.body)
+        trades = execute_rebalance(request.user, data.get('orders') or [])
+    except (ValueError, AttributeError) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    request.user.profile.refresh_from_db()
+    return JsonResponse({
+        'success': True,
+        'trades': [
+            {'id': trade.id, 'symbol': trade.stock.symbol, 'side': trade.trade_type,
+             'quantity': trade.quantity, 'price': str(trade.price)}
+            for trade in trades
+        ],
+        'new_balance': str(request.user.profile.balance),
+    })
+
+def serialize_alert(alert):
+    return {
+        'id': alert.id,
+        'symbol': alert.stock.symbol,
+        'direction': alert.direction,
+        'threshold': str(alert.threshold),
+        'is_active': alert.is_active,
+        'triggered_at': alert.triggered_at.isoformat() if alert.triggered_at else None,
+        'triggered_price': str(alert.triggered_price) if alert.triggered_price is not None else None,
+    }
+
+@login_required
+def alerts_api(request):
+    """List the user's price alerts (GET) or create one (POST)"""
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            direction = data.get('direction')
+            threshold = Money.parse(str(data.get('threshold')))
+        except (ValueError, ArithmeticError, AttributeError, TypeError):
+            return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
+        if direction not in dict(PriceAlert.DIRECTIONS) or threshold <= 0:
+            return JsonResponse({'success': False, 'error': 'Invalid alert'}, status=400)
+        
+        stock = get_object_or_404(Stock, symbol=str(data.get('symbol', '')).upper())
+        # An alert the current price already satisfies would fire on the next tick
+        if threshold <= stock.current_price if direction == 'ABOVE' else threshold >= stock.current_price:
+            return JsonResponse({
+                'success': False,
+                'error': f"{stock.symbol} is already {direction.lower()} Rs.{threshold:.2f} (now Rs.{stock.current_price:.2f})",
+            }, status=400)
+        alert = PriceAlert.objects.create(user=request.user, stock=stock, direction=direction, threshold=threshold)
+        return JsonResponse({'success': True, 'alert': serialize_alert(alert)}, status=201)
+    
+    alerts = PriceAlert.objects.filter(user=request.user).select_related('stock').order_by('-created_at')[:100]
+    return JsonResponse({'success': True, 'alerts': [serialize_alert(alert) for alert in alerts]})
+
+@login_required
+def alert_cancel(request, alert_id):
+    """Deactivate one of the user's price alerts"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request'})
+    updated = PriceAlert.objects.filter(id=alert_id, user=request.user, is_active=True).update(is_active=False)
+    return JsonResponse({'success': bool(updated)})
+
+def serialize_recurring_order(plan):
+    return {
+        'id': plan.id,
+        'symbol': plan.stock.symbol,
+        'amount': str(plan.amount),
+        'frequency': plan.frequency,
+        'next_run_date': plan.next_run_date.isoformat(),
+        'is_active': plan.is_active,
+        'last_run_at': plan.last_run_at.isoformat() if plan.last_run_at else None,
+        'last_status': plan.last_status,
+        'last_quantity': plan.last_quantity,
+    }
+
+@login_required
+def recurring_orders_api(request):
+    """List the user's recurring (SIP) orders (GET) or start one (POST)"""
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            frequency = data.get('frequency', 'MONTHLY')
+            amount = Money.parse(str(data.get('amount')))
+            start = data.get('start_date')
+            start = datetime.strptime(start, '%Y-%m-%d').date() if start else market_now().date()
+        except (ValueError, ArithmeticError, AttributeError, TypeError):
+            return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
+        if frequency not in dict(RecurringOrder.FREQUENCIES) or amount <= 0:
+            return JsonResponse({'success': False, 'error': 'Invalid plan'}, status=400)
+        
+        stock = get_object_or_404(Stock, symbol=str(data.get('symbol', '')).upper())
+        plan = RecurringOrder.objects.create(
+            user=request.user, stock=stock, amount=amount, frequency=frequency, next_run_date=start
+        )
+        return JsonResponse({'success': True, 'plan': serialize_recurring_order(plan)}, status=201)
+    
+    plans = RecurringOrder.objects.filter(user=request.user).select_related('stock').order_by('-created_at')[:100]
+    return JsonResponse({'success': True, 'plans': [serialize_recurring_order(plan) for plan in plans]})
+
+@login_required
+def recurring_order_cancel(request, plan_id):
+    """Stop one of the user's recurring orders"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request'})
+    updated = RecurringOrder.objects.filter(id=plan_id, user=request.user, is_active=True).update(is_active=False)
+    return JsonResponse({'success': bool(updated)})
+
+def serialize_ipo(ipo, application=None):
+    return {
+        'id': ipo.id,
+        'symbol': ipo.stock.symbol,
+        'name': ipo.stock.name,
+        'issue_price': str(ipo.issue_price),
+        'total_units': ipo.total_units,
+        'lot_units': ipo.lot_units,
+        'max_units': ipo.max_units,
+        'opens_at': ipo.opens_at.isoformat(),
+        'closes_at': ipo.closes_at.isoformat(),
+        'status': ipo.status,
+        'application': None if application is None else {
+            'units': application.units,
+            'amount_held': str(application.amount_held),
+            'status': application.status,
+            'units_allotted': application.units_allotted,
+            'refund': str(application.refund),
+        },
+    }
+
+@login_required
+def ipos_api(request):
+    """Current and recent IPOs, with the user's application to each"""
+    ipos = list(IPO.objects.filter(closes_at__gte=timezone.now() - timedelta(days=30)).select_related('stock').order_by('closes_at'))
+    applications = {
+        application.ipo_id: application
+        for application in IPOApplication.objects.filter(user=request.user, ipo__in=ipos)
+    }
+    return JsonResponse({'success': True, 'ipos': [serialize_ipo(ipo, applications.get(ipo.id)) for ipo in ipos]})
+
+@login_required
+@rate_limited('ipo_apply')
+def ipo_apply(request, ipo_id):
+    """Apply for an IPO, holding the amount from the user's balance"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request'})
+    try:
+        units = int(json.loads(request.body).get('units'))
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
+    ipo = get_object_or_404(IPO.objects.select_related('stock'), id=ipo_id)
+    success, message, application = apply_for_ipo(request.user, ipo, units)
+    if not success:
+        return JsonResponse({'success': False, 'error': message})
+    return JsonResponse({'success': True, 'message': message, 'ipo': serialize_ipo(ipo, application)}, status=201)
@@ -0,0 +1,244 @@
+import hashlib
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+
+PRIMARY_DB = 'default'
+PIN_SESSION_KEY = '_db_primary_until'
+LAST_WRITE_SESSION_KEY = '_db_last_write'
+
+_state = threading.local()
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+def replica_synced_at(alias):
+    """
+    When sync_replicas last started copying the primary into alias (it
+    stamps the file's mtime with that moment), or None if unknown.
+    """
+    try:
+        return os.path.getmtime(connections.settings[alias]['NAME'])
+    except (KeyError, OSError, TypeError):
+        return None
+
+def choose_replica(replicas=None):
+    """Pick one of replicas (default: all), falling back to the primary when there are none"""
+    replicas = replica_aliases() if replicas is None else replicas
+    return random.choice(replicas) if replicas else PRIMARY_DB
+
+@contextmanager
+def replica_reads(replicas=None):
+    """Route reads made inside this block to a replica"""
+    previous = getattr(_state, 'read_db', None)
+    _state.read_db = choose_replica(replicas)
+    try:
+        yield _state.read_db
+    finally:
+        _state.read_db = previous
+
+@contextmanager
+def primary_reads():
+    """Route reads made inside this block to the primary, even within replica_reads()"""
+    previous = getattr(_state, 'read_db', None)
+    _state.read_db = PRIMARY_DB
+    try:
+        yield
+    finally:
+        _state.read_db = previous
+
+def pin_to_primary(request, seconds=None):
+    """Keep this user's reads on the primary for a short window after a write"""
+    if seconds is None:
+        seconds = settings.REPLICA_STICKY_SECONDS
+    now = time.time()
+    request.session[PIN_SESSION_KEY] = now + seconds
+    request.session[LAST_WRITE_SESSION_KEY] = now
+
+def is_pinned_to_primary(request):
+    session = getattr(request, 'session', None)
+    if session is None:
+        return False
+    return session.get(PIN_SESSION_KEY, 0) > time.time()
+
+def replicas_for(request):
+    """
+    Replicas this request may read: none while pinned, otherwise those synced
+    since the user's last write, so a replica fed by periodic full copies
+    never hides it once the pin has expired.
+    """
+    if is_pinned_to_primary(request):
+        return []
+    replicas = replica_aliases()
+    written = getattr(request, 'session', {}).get(LAST_WRITE_SESSION_KEY)
+    if written is None:
+        return replicas
+    return [alias for alias in replicas if (replica_synced_at(alias) or 0) >= written]
+
+def read_db_for(request, model=None):
+    """Alias that read-only work for this request (on model, if given) may use"""
+    if model is not None and shard_aliases() and is_sharded(model):
+        return shard_for_user(request.user.pk)
+    return choose_replica(replicas_for(request))
+
+def use_replica(view_func):
+    """Serve a read-only view from a replica unless the user has written since it was synced"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads(replicas_for(request)):
+            return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+# Per-user trading data. With DATABASE_SHARDS set, these live on the owning
+# user's shard; everything else stays on the primary, which acts as the
+# reference database. Stock is also copied onto every shard (sync_shards) so
+# joins from sharded rows work; live prices are always read from the primary.
+SHARDED_MODELS = {
+    'accounts.profile',
+    'trading.portfolio',
+    'trading.trade',
+    # Written in the trade's transaction, so they sit beside the trades
+    'trading.outboxevent',
+    'trading.outboxoffset',
+    # Marks the holdings on each database that a corporate action has scaled
+    'trading.corporateactionshard',
+}
+SHARD_REFERENCE_MODELS = {'trading.stock'}
+
+
+class ShardNotSelected(RuntimeError):
+    pass
+
+
+def parse_shard_dbs(value):
+    """
+    [(alias, path)] from TMS_SHARD_DBS: comma-separated paths, each optionally
+    written name=path. Unnamed shards take the file's name without extension,
+    so an alias (and the users hashed to it) never depends on list position.
+    """
+    shards = []
+    for entry in filter(None, (part.strip() for part in value.split(','))):
+        name, sep, path = entry.partition('=')
+        if not sep:
+            name, path = os.path.splitext(os.path.basename(entry))[0], entry
+        if not name.isidentifier() or name in {alias for alias, _ in shards} or name == PRIMARY_DB:
+            raise ImproperlyConfigured(f"TMS_SHARD_DBS: shard name {name!r} must be a unique identifier")
+        shards.append((name, path))
+    return shards
+
+def shard_aliases():
+    return list(getattr(settings, 'DATABASE_SHARDS', []))
+
+def data_aliases():
+    """Every database holding sharded rows: the shards, or the primary when unsharded"""
+    return shard_aliases() or [PRIMARY_DB]
+
+def is_sharded(model):
+    return model._meta.label_lower in SHARDED_MODELS
+
+def shard_for_user(user_id, shards=None):
+    """
+    Home shard of a user, by rendezvous hashing the user id against each alias.
+    Stable across processes, and adding a shard only moves the users it wins.
+    """
+    shards = shard_aliases() if shards is None else shards
+    if not shards:
+        return PRIMARY_DB
+    key = str(user_id).encode()
+    return max(shards, key=lambda alias: hashlib.blake2b(key, digest_size=8, key=alias.encode()).digest())
+
+@contextmanager
+def on_shard(alias):
+    """Route sharded models that carry no user hint to this shard"""
+    previous = getattr(_state, 'shard', None)
+    _state.shard = alias
+    try:
+        yield alias
+    finally:
+        _state.shard = previous
+
+def user_shard(user_id):
+    """on_shard() for a user's home shard"""
+    return on_shard(shard_for_user(user_id))
+
+
+class ShardRouter:
+    """
+    Sharded models go to a shard taken from, in order: the instance being
+    saved or followed (its user, or the shard it was loaded from), then the
+    enclosing on_shard() / user_shard() block, which UserShardMiddleware
+    opens for every signed-in request. Queries that name no user outside
+    such a block raise ShardNotSelected rather than silently reading one
+    shard; cross-user jobs loop over data_aliases() with .using().
+
+    Without DATABASE_SHARDS every method returns None and routing is left to
+    the next router.
+    """
+    def _shard_for(self, model, hints):
+        instance = hints.get('instance')
+        if instance is not None:
+            if instance._meta.label_lower == settings.AUTH_USER_MODEL.lower():
+                return shard_for_user(instance.pk)
+            if instance._state.db in shard_aliases():
+                return instance._state.db
+            if getattr(instance, 'user_id', None) is not None:
+                return shard_for_user(instance.user_id)
+        shard = getattr(_state, 'shard', None)
+        if shard is None:
+            raise ShardNotSelected(f"No shard selected for {model._meta.label}: use user_shard() or .using()")
+        return shard
+
+    def db_for_read(self, model, **hints):
+        if shard_aliases() and is_sharded(model):
+            return self._shard_for(model, hints)
+        return None
+
+    def db_for_write(self, model, **hints):
+        if shard_aliases() and is_sharded(model):
+            return self._shard_for(model, hints)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Users and stocks on the primary relate to rows on any shard
+        if shard_aliases():
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db not in shard_aliases():
+            return None
+        if model_name is None:
+            return False
+        label = f"{app_label}.{model_name}"
+        return label in SHARDED_MODELS or label in SHARD_REFERENCE_MODELS
+
+
+class ReplicaRouter:
+    """
+    Reads go to a replica only inside replica_reads() / @use_replica.
+    Everything else, including all writes, stays on the primary.
+    """
+    def db_for_read(self, model, **hints):
+        return getattr(_state, 'read_db', None) or PRIMARY_DB
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas are copies of the primary, so objects can relate across them
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are refreshed from the primary, never migrated directly
+        if db in replica_aliases():
+            return False
+        return None
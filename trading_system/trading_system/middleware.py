@@ -1,6 +1,8 @@
 from django.shortcuts import redirect
 from django.urls import reverse
 
+from .db_routers import pin_to_primary, shard_aliases, user_shard
+
 class LoginRequiredMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -14,4 +16,28 @@ class LoginRequiredMiddleware:
             return redirect(f'{reverse("login")}?next={request.path}')
         
         response = self.get_response(request)
-        return response
\ No newline at end of file
+        return response
+
+class ReadYourWritesMiddleware:
+    """Pin a user's reads to the primary database for a short window after any write request"""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and request.user.is_authenticated:
+            pin_to_primary(request)
+        
+        return response
+
+class UserShardMiddleware:
+    """Route the signed-in user's sharded rows to their shard for the whole request"""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if shard_aliases() and request.user.is_authenticated:
+            with user_shard(request.user.pk):
+                return self.get_response(request)
+        return self.get_response(request)
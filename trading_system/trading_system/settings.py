@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 import os
 
+from .db_routers import parse_shard_dbs
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -51,6 +53,7 @@ INSTALLED_APPS = [
 ]
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'trading_system.staticfiles.StaticAssetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -58,6 +61,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'trading_system.middleware.LoginRequiredMiddleware',
+    'trading_system.middleware.UserShardMiddleware',
+    'trading_system.middleware.ReadYourWritesMiddleware',
 ]
 
 ROOT_URLCONF = 'trading_system.urls'
@@ -88,9 +93,51 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Background workers write concurrently: take the write lock when a
+        # transaction starts and wait for it instead of failing
+        'OPTIONS': {'timeout': 20, 'transaction_mode': 'IMMEDIATE'},
     }
 }
 
+# Read replicas for read-only views and reporting queries.
+# TMS_REPLICA_DBS is a comma-separated list of SQLite files kept in sync with
+# `python manage.py sync_replicas`; with none configured, reads use 'default'.
+DATABASE_REPLICAS = []
+for i, replica_path in enumerate(filter(None, os.environ.get('TMS_REPLICA_DBS', '').split(','))):
+    alias = f'replica{i + 1}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': replica_path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+# User shards for per-user trading data (Profile, Portfolio, Trade, outbox).
+# TMS_SHARD_DBS is a comma-separated list of SQLite files, each optionally
+# named as name=path; unnamed shards are named after the file (shard_a.sqlite3
+# -> shard_a). A user's rows live on the shard chosen by hashing their id
+# against these names, so keep a shard's name when reordering the list or
+# removing another shard. The primary keeps users, stocks and everything
+# else. Create a shard with `python manage.py migrate --database <name>`,
+# refresh its Stock copy with `sync_shards`, and after adding or removing
+# shards move users with `rebalance_shards`. Unset: no sharding.
+DATABASE_SHARDS = []
+for alias, shard_path in parse_shard_dbs(os.environ.get('TMS_SHARD_DBS', '')):
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': shard_path,
+        'OPTIONS': {'timeout': 20, 'transaction_mode': 'IMMEDIATE'},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_SHARDS.append(alias)
+
+DATABASE_ROUTERS = ['trading_system.db_routers.ShardRouter', 'trading_system.db_routers.ReplicaRouter']
+
+# Seconds a user's reads stay on the primary after they submit a write. This
+# window covers streaming replication lag only; replicas fed by sync_replicas
+# are also skipped for a user until a sync that started after their last write.
+REPLICA_STICKY_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -129,6 +176,16 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+# `python manage.py collectstatic` minifies app CSS/JS, fingerprints every
+# file and writes .gz/.br copies into STATIC_ROOT; StaticAssetMiddleware then
+# serves them with immutable caching. Before collectstatic has run, templates
+# get plain names and DEBUG serves the source files as usual.
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'trading_system.staticfiles.PrecompressedManifestStaticFilesStorage'},
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -142,4 +199,99 @@ CRISPY_TEMPLATE_PACK = 'bootstrap5'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGIN_URL = 'login'
 # LOGOUT_REDIRECT_URL = 'login'
-SESSION_EXPIRE_AT_BROWSER_CLOSE = True
\ No newline at end of file
+SESSION_EXPIRE_AT_BROWSER_CLOSE = True
+# Trade archival
+TRADE_ARCHIVE_DIR = os.path.join(BASE_DIR, 'archive')
+TRADE_ARCHIVE_CHUNK_SIZE = 50000
+
+# Stock autocomplete: full rebuild interval for the in-process search index
+STOCK_SEARCH_REBUILD_SECONDS = 300
+
+# Caches: local memory by default; point 'default' at Redis/Memcached in
+# production so rate-limit buckets are shared between worker processes
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Order admission control: (orders per second, burst) per user and endpoint
+ORDER_RATE_LIMITS = {
+    'trade': (2, 10),
+    'quick_trade': (2, 10),
+    'rebalance': (0.2, 3),
+    'ipo_apply': (1, 5),
+}
+# 'cache' keeps buckets in CACHES[RATE_LIMIT_CACHE_ALIAS]; 'local' keeps them in-process
+RATE_LIMIT_BACKEND = 'cache'
+RATE_LIMIT_CACHE_ALIAS = 'default'
+
+# Analytics precomputation: 'db' (run_analytics_worker drains the snapshot
+# table), 'local' (in-process ProcessPoolExecutor) or 'sync' (inline)
+ANALYTICS_QUEUE = 'db'
+ANALYTICS_WORKERS = 2
+# The analytics page recomputes inline once a refresh has waited this many
+# seconds, so a stale snapshot is never shown for long without a worker
+ANALYTICS_INLINE_AFTER = 30
+
+# Leaderboard: full rebuild interval for the in-process equity ranking
+LEADERBOARD_REBUILD_SECONDS = 600
+
+# Trade event outbox: consumers run by `python manage.py run_outbox_dispatcher`
+# ({name: dotted path to a callable taking a list of OutboxEvent}; renaming a
+# consumer restarts it from the oldest retained event)
+OUTBOX_CONSUMERS = {
+    'audit-log': 'trading.outbox.log_trade_events',
+}
+# Delivered events are kept this long so new consumers can replay them
+OUTBOX_RETENTION_SECONDS = 7 * 24 * 3600
+# Only hand out events at least this old. SQLite serialises writers, so ids
+# commit in order; on databases with concurrent writers set a few seconds so
+# a slow transaction's lower id is not skipped
+OUTBOX_SETTLE_SECONDS = 0
+
+# Market sessions, advanced by `python manage.py run_market_sessions`. Days are
+# Python weekdays (0 = Monday; NEPSE trades Sunday to Thursday) and times are
+# in MARKET_TIME_ZONE. Orders placed during pre-open are filled by the opening
+# call auction, uncrossed by up to AUCTION_WORKERS processes
+MARKET_TIME_ZONE = 'Asia/Kathmandu'
+MARKET_SCHEDULE = {
+    'days': [6, 0, 1, 2, 3],
+    'pre_open': '10:30',
+    'open': '11:00',
+    'close': '15:00',
+}
+AUCTION_WORKERS = 4
+
+# Target-weight rebalancing: orders are whole board lots, and positions within
+# REBALANCE_TOLERANCE (a fraction of equity) of their target are left alone
+REBALANCE_LOT_SIZE = 10
+REBALANCE_TOLERANCE = 0.005
+
+# Recurring (SIP) orders: due plans executed per transaction by `run_recurring_orders`
+SIP_CHUNK_SIZE = 1000
+
+# IPO allotment: applications settled per transaction by `run_ipo_allotment`
+IPO_CHUNK_SIZE = 5000
+
+# Admin changelists on large tables count at most this many rows (trading.changelist)
+ADMIN_COUNT_CAP = 10000
+
+# Capital-gains statements (`generate_statements`): the fiscal year starts on
+# Shrawan 1 in MARKET_TIME_ZONE, which falls on 16 or 17 July depending on the
+# Bikram Sambat calendar. (month, day) per Gregorian year; add each new year
+# from the published calendar before generating its statements.
+FISCAL_YEAR_STARTS = {
+    2016: (7, 16),
+    2017: (7, 16),
+    2018: (7, 17),
+    2019: (7, 17),
+    2020: (7, 16),
+    2021: (7, 16),
+    2022: (7, 17),
+    2023: (7, 17),
+    2024: (7, 16),
+    2025: (7, 17),
+    2026: (7, 17),
+}
+STATEMENT_DIR = os.path.join(BASE_DIR, 'statements')
@@ -0,0 +1,149 @@
+"""
+Static asset pipeline.
+
+collectstatic with PrecompressedManifestStaticFilesStorage:
+  1. minifies the app's own CSS/JS (vendored *.min.* files are left alone)
+     when rcssmin / rjsmin are installed,
+  2. fingerprints every file and rewrites url() references, recording them
+     in staticfiles.json (ManifestStaticFilesStorage),
+  3. writes .gz, and .br when brotli is installed, next to each text asset.
+
+StaticAssetMiddleware serves STATIC_ROOT for deployments without a front web
+server. Fingerprinted names never change content, so they are sent with a
+one-year immutable Cache-Control; the smallest precompressed variant the
+client accepts is used.
+"""
+import gzip
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.json', '.svg', '.ttf', '.txt', '.html')
+MIN_COMPRESS_SIZE = 512
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MUTABLE_CACHE_CONTROL = 'public, max-age=60'
+
+
+def minify(name, data):
+    """Minified text for app CSS/JS, or None to keep the file as is"""
+    if '.min.' in name:
+        return None
+    if name.endswith('.css') and rcssmin:
+        return rcssmin.cssmin(data)
+    if name.endswith('.js') and rjsmin:
+        return rjsmin.jsmin(data)
+    return None
+
+
+class PrecompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def stored_name(self, name):
+        if not self.hashed_files:
+            # No manifest yet (collectstatic has not run): plain names, served by the finders
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            yield from super().post_process(paths, dry_run, **options)
+            return
+
+        # Minify the collected copies before they are hashed, and hash those copies
+        paths = dict(paths)
+        for name in paths:
+            if not name.endswith(('.css', '.js')):
+                continue
+            with self.open(name) as f:
+                original = f.read().decode('utf-8')
+            minified = minify(name, original)
+            if minified is not None and minified != original:
+                self.delete(name)
+                self._save(name, ContentFile(minified.encode('utf-8')))
+                paths[name] = (self, name)
+
+        yield from super().post_process(paths, dry_run, **options)
+
+        for hashed_name in set(self.hashed_files.values()):
+            self.compress(hashed_name)
+
+    def compress(self, name):
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS) or not self.exists(name):
+            return
+        with self.open(name) as f:
+            data = f.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli:
+            variants['.br'] = brotli.compress(data, quality=11)
+        for suffix, compressed in variants.items():
+            # Keep a variant only when it actually saves bytes
+            if len(compressed) < len(data):
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(compressed))
+
+
+class StaticAssetMiddleware:
+    """Serve collected static files with long-lived caching and precompressed variants"""
+    ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.root = settings.STATIC_ROOT
+        self.immutable = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+    def __call__(self, request):
+        if self.root and request.method in ('GET', 'HEAD') and request.path.startswith(self.prefix):
+            response = self.serve(request, request.path[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        stat = os.stat(path)
+        response = get_conditional_response(request, last_modified=int(stat.st_mtime))
+        if response is None:
+            content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            accepted = request.headers.get('Accept-Encoding', '')
+            serve_path, encoding = path, None
+            for candidate, suffix in self.ENCODINGS:
+                if candidate in accepted and os.path.isfile(path + suffix):
+                    serve_path, encoding = path + suffix, candidate
+                    break
+            response = FileResponse(open(serve_path, 'rb'), content_type=content_type)
+            if encoding:
+                response['Content-Encoding'] = encoding
+            response['Last-Modified'] = http_date(stat.st_mtime)
+
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if name in self.immutable else MUTABLE_CACHE_CONTROL
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
@@ -37,5 +37,19 @@ urlpatterns = [
 
     # API endpoints
     path('api/quick-trade/', trading_views.quick_trade, name='quick_trade'),
+    path('api/rebalance/preview/', trading_views.rebalance_preview, name='rebalance_preview'),
+    path('api/rebalance/execute/', trading_views.rebalance_execute, name='rebalance_execute'),
+    path('api/trades/', trading_views.trade_history_api, name='trade_history_api'),
+    path('api/quotes/', trading_views.quotes_api, name='quotes_api'),
+    path('api/stocks/search/', trading_views.stock_search, name='stock_search'),
+    path('api/leaderboard/', trading_views.leaderboard_api, name='leaderboard_api'),
+    path('api/watchlist/', trading_views.watchlist_toggle, name='watchlist_toggle'),
+    path('api/alerts/', trading_views.alerts_api, name='alerts_api'),
+    path('api/alerts/<int:alert_id>/cancel/', trading_views.alert_cancel, name='alert_cancel'),
+    path('api/sips/', trading_views.recurring_orders_api, name='recurring_orders_api'),
+    path('api/ipos/', trading_views.ipos_api, name='ipos_api'),
+    path('api/ipos/<int:ipo_id>/apply/', trading_views.ipo_apply, name='ipo_apply'),
+    path('api/sips/<int:plan_id>/cancel/', trading_views.recurring_order_cancel, name='recurring_order_cancel'),
+    path('trades/export/', trading_views.export_trades_csv, name='export_trades'),
 ]
 